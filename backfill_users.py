@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+One-off Firestore backfill for broadcast audiences.
+
+Broadcast audiences query `users` by `active`, `last_seen_day` and `courses`.
+Users saved before these fields existed have none of them and would never
+receive a broadcast. This sets `active` and `last_seen_day` where they are
+missing and adds the courses each user registered for. Running it again is
+harmless. The SQLite backend needs no backfill.
+
+    python backfill_users.py
+    python backfill_users.py --dry-run
+"""
+
+import logging
+import argparse
+from collections import defaultdict
+
+from repository import init_firestore, firestore, current_day, FIRESTORE_BATCH_LIMIT
+
+logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def stream_pages(db, collection, fields, page_size=1000):
+    """Yield projected documents of a collection in document id order"""
+    cursor = None
+    while True:
+        query = db.collection(collection).select(fields).order_by('__name__').limit(page_size)
+        if cursor is not None:
+            query = query.start_after({'__name__': cursor})
+        docs = list(query.stream())
+        yield from docs
+        if len(docs) < page_size:
+            return
+        cursor = docs[-1].id
+
+
+def commit_in_batches(db, writes, dry_run):
+    """Apply (document ref, data) merges in batches, return the count"""
+    if dry_run:
+        return len(writes)
+    for start in range(0, len(writes), FIRESTORE_BATCH_LIMIT):
+        batch = db.batch()
+        for ref, data in writes[start:start + FIRESTORE_BATCH_LIMIT]:
+            batch.set(ref, data, merge=True)
+        batch.commit()
+    return len(writes)
+
+
+def backfill(db, dry_run=False):
+    """Backfill audience fields, return (users activated, users with courses)"""
+    today = current_day()
+    activity = []
+    for doc in stream_pages(db, 'users', ['active', 'last_interaction']):
+        data = doc.to_dict()
+        if 'active' in data:
+            continue
+        last_interaction = data.get('last_interaction')
+        day = int(last_interaction.timestamp() // 86400) if last_interaction else today
+        activity.append((doc.reference, {'active': True, 'last_seen_day': day}))
+
+    courses = defaultdict(set)
+    for doc in stream_pages(db, 'registrations', ['tg_id', 'course_id']):
+        data = doc.to_dict()
+        if data.get('tg_id') is not None and data.get('course_id'):
+            courses[data['tg_id']].add(data['course_id'])
+    enrolments = [
+        (db.collection('users').document(str(tg_id)),
+         {'user_id': tg_id, 'courses': firestore.ArrayUnion(sorted(course_ids))})
+        for tg_id, course_ids in courses.items()
+    ]
+
+    return commit_in_batches(db, activity, dry_run), commit_in_batches(db, enrolments, dry_run)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dry-run', action='store_true', help="Only count what would be written")
+    args = parser.parse_args()
+
+    activated, enrolled = backfill(init_firestore(), args.dry_run)
+    prefix = "Yoziladi" if args.dry_run else "Yangilandi"
+    print(f"✅ {prefix}: {activated} ta foydalanuvchi faol deb belgilandi, "
+          f"{enrolled} ta foydalanuvchiga kurslar qo'shildi")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Send lanes benchmark: reply latency and failures while a broadcast runs.
+
+A local Bot API stub enforces Telegram's global limit (a 30 messages per
+second bucket) and answers with 429 RetryAfter above it. A broadcast is sent
+with the real broadcast engine while users get replies at --reply-rate.
+
+    shared  one transport, no global budget (previous behaviour)
+    lanes   interactive and bulk lanes sharing the global budget (lanes.py)
+
+    python bench_lanes.py
+    python bench_lanes.py --recipients 1000 --reply-rate 10 --api-latency-ms 80
+"""
+
+import json
+import time
+import asyncio
+import argparse
+import logging
+import itertools
+
+from telegram import Bot
+from telegram.error import RetryAfter
+from telegram.request import BaseRequest
+
+from broadcast import BroadcastEngine, BROADCAST_CONCURRENCY
+from lanes import SendLanes, is_rate_limited, INTERACTIVE_POOL_SIZE, BULK_POOL_SIZE
+from bench_load import percentile
+
+TOKEN = '123456:BENCHMARK'
+TELEGRAM_RATE = 30
+
+
+class TelegramStub:
+    """Bot API side: global message budget and counters"""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.tokens = TELEGRAM_RATE
+        self.updated = time.monotonic()
+        self.rejected = 0
+        self._message_ids = itertools.count(1)
+
+    def accept(self):
+        now = time.monotonic()
+        self.tokens = min(TELEGRAM_RATE, self.tokens + (now - self.updated) * TELEGRAM_RATE)
+        self.updated = now
+        if self.tokens < 1:
+            self.rejected += 1
+            return False
+        self.tokens -= 1
+        return True
+
+    def message(self, params):
+        return {
+            'message_id': next(self._message_ids), 'date': int(time.time()),
+            'chat': {'id': int(params.get('chat_id', 0)), 'type': 'private'}, 'text': params.get('text', ''),
+        }
+
+
+class PooledRequest(BaseRequest):
+    """Transport to the stub with a limited number of connections"""
+
+    def __init__(self, telegram, pool_size):
+        self.telegram = telegram
+        self.pool = asyncio.Semaphore(pool_size)
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None):
+        api_method = url.rsplit('/', 1)[-1]
+        params = request_data.parameters if request_data is not None else {}
+        async with self.pool:
+            await asyncio.sleep(self.telegram.latency)
+            if api_method == 'getMe':
+                result = {'id': 42, 'is_bot': True, 'first_name': 'Bench', 'username': 'bench_bot'}
+            elif not is_rate_limited(api_method):
+                result = True
+            elif self.telegram.accept():
+                result = self.telegram.message(params)
+            else:
+                return 429, json.dumps({
+                    'ok': False, 'error_code': 429, 'description': 'Too Many Requests: retry after 1',
+                    'parameters': {'retry_after': 1},
+                }).encode()
+        return 200, json.dumps({'ok': True, 'result': result}).encode()
+
+
+def build_bots(mode, telegram):
+    if mode == 'shared':
+        request = PooledRequest(telegram, INTERACTIVE_POOL_SIZE)
+        bot = Bot(TOKEN, request=request)
+        return bot, bot
+    lanes = SendLanes()
+    interactive = Bot(TOKEN, request=lanes.interactive(PooledRequest(telegram, INTERACTIVE_POOL_SIZE)))
+    bulk = Bot(TOKEN, request=lanes.bulk(PooledRequest(telegram, BULK_POOL_SIZE)))
+    return interactive, bulk
+
+
+async def run_mode(mode, args):
+    telegram = TelegramStub(args.api_latency_ms / 1000)
+    interactive, bulk = build_bots(mode, telegram)
+    await interactive.initialize()
+    await bulk.initialize()
+
+    engine = BroadcastEngine(None, None)
+    semaphore = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+    payload = {'kind': 'text', 'text': 'Benchmark e\'loni'}
+    latencies = []
+    failed_replies = 0
+
+    async def reply(user_id):
+        nonlocal failed_replies
+        start = time.perf_counter()
+        try:
+            await interactive.send_message(chat_id=user_id, text='Javob')
+            latencies.append(time.perf_counter() - start)
+        except RetryAfter:
+            failed_replies += 1
+
+    start = time.perf_counter()
+    broadcast = asyncio.gather(*(
+        engine._send_one(bulk, semaphore, 100000 + i, payload) for i in range(args.recipients)
+    ))
+    replies = []
+    # Replies arrive while the broadcast is running
+    for i in itertools.count():
+        if broadcast.done():
+            break
+        replies.append(asyncio.create_task(reply(200000 + i)))
+        await asyncio.sleep(1 / args.reply_rate)
+    results = await broadcast
+    broadcast_seconds = time.perf_counter() - start
+    await asyncio.gather(*replies)
+
+    await interactive.shutdown()
+    await bulk.shutdown()
+    return {
+        'mode': mode,
+        'replies': len(replies),
+        'reply_p50_ms': percentile(latencies, 50) * 1000,
+        'reply_p95_ms': percentile(latencies, 95) * 1000,
+        'reply_p99_ms': percentile(latencies, 99) * 1000,
+        'failed_replies': failed_replies,
+        'broadcast_sent': results.count('sent'),
+        'broadcast_seconds': broadcast_seconds,
+        'rejected_429': telegram.rejected,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--recipients', type=int, default=500, help="Broadcast recipients")
+    parser.add_argument('--reply-rate', type=float, default=10, help="Replies per second during the broadcast")
+    parser.add_argument('--api-latency-ms', type=float, default=50, help="Per Bot API call")
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    results = [asyncio.run(run_mode(mode, args)) for mode in ('shared', 'lanes')]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'mode':<8}{'replies':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'failed':>8}"
+          f"{'sent':>7}{'bcast s':>9}{'429s':>6}")
+    for r in results:
+        print(f"{r['mode']:<8}{r['replies']:>8}{r['reply_p50_ms']:>9.1f}{r['reply_p95_ms']:>9.1f}"
+              f"{r['reply_p99_ms']:>9.1f}{r['failed_replies']:>8}{r['broadcast_sent']:>7}"
+              f"{r['broadcast_seconds']:>9.2f}{r['rejected_429']:>6}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Offline load test: drives the real bot.py handlers with synthetic updates.
+
+Firestore is replaced by the in-memory fake from fake_firestore.py (or the
+bot runs on the SQLite backend with --storage sqlite) and the Telegram Bot API
+by a stub transport, so nothing leaves the machine. Each scenario is run for
+--users concurrent users and reports handler latency percentiles, updates per
+second and billed Firestore reads/writes and Bot API calls per update.
+
+    python bench_load.py --users 200
+    python bench_load.py --users 500 --db-latency-ms 20 --api-latency-ms 50 --json
+    python bench_load.py --users 500 --storage sqlite
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+import itertools
+import statistics
+
+from telegram import Update
+from telegram.request import BaseRequest
+
+import repository
+from fake_firestore import FakeFirestore, FakeStats
+
+ADMIN_ID = 1
+USER_ID_BASE = 100000
+
+
+class StubRequest(BaseRequest):
+    """Bot API transport that answers locally and counts calls"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+        self.methods = {}
+        self.user_messages = 0
+        self._message_ids = itertools.count(1)
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def _message(self, params):
+        return {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': int(params.get('chat_id', 0)), 'type': 'private'},
+            'text': params.get('text', ''),
+        }
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None):
+        api_method = url.rsplit('/', 1)[-1]
+        params = request_data.parameters if request_data is not None else {}
+        self.calls += 1
+        self.methods[api_method] = self.methods.get(api_method, 0) + 1
+        if api_method == 'sendMessage' and int(params.get('chat_id', 0)) != ADMIN_ID:
+            self.user_messages += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if api_method == 'getMe':
+            result = {'id': 42, 'is_bot': True, 'first_name': 'Bench', 'username': 'bench_bot'}
+        elif api_method in ('sendMessage', 'editMessageText', 'sendPhoto', 'sendVideo',
+                            'sendDocument', 'copyMessage'):
+            result = self._message(params)
+        elif api_method == 'getChatMember':
+            result = {'status': 'member',
+                      'user': {'id': int(params['user_id']), 'is_bot': False, 'first_name': 'User'}}
+        else:
+            result = True
+        return 200, json.dumps({'ok': True, 'result': result}).encode()
+
+
+class UpdateFactory:
+    """Builds Bot API update payloads"""
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+
+    def _user(self, user_id):
+        return {'id': user_id, 'is_bot': False, 'first_name': f'User{user_id}', 'username': f'user{user_id}'}
+
+    def message(self, user_id, text=None, contact=None):
+        message = {
+            'message_id': next(self._ids),
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': self._user(user_id),
+        }
+        if text is not None:
+            message['text'] = text
+            if text.startswith('/'):
+                message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+        if contact is not None:
+            message['contact'] = {'phone_number': contact, 'first_name': f'User{user_id}', 'user_id': user_id}
+        return {'update_id': next(self._ids), 'message': message}
+
+    def callback(self, user_id, data):
+        return {
+            'update_id': next(self._ids),
+            'callback_query': {
+                'id': str(next(self._ids)),
+                'from': self._user(user_id),
+                'chat_instance': str(user_id),
+                'data': data,
+                'message': {
+                    'message_id': next(self._ids),
+                    'date': int(time.time()),
+                    'chat': {'id': user_id, 'type': 'private'},
+                    'text': 'menu',
+                },
+            },
+        }
+
+
+def sample_courses(count):
+    return [
+        {
+            'name': f'Kurs {i}', 'key': f'kurs-{i}', 'duration_weeks': 6,
+            'price': 400000 + i * 1000, 'description': 'Amaliy mashg\'ulotlar bilan kurs',
+        }
+        for i in range(count)
+    ]
+
+
+def seed_courses(db, count):
+    for i, course in enumerate(sample_courses(count)):
+        db.collection('courses').document(f'course-{i}').set(course)
+
+
+def percentile(samples, q):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+class Bench:
+    def __init__(self, bot_module, app, stats, request):
+        self.bot = bot_module
+        self.app = app
+        self.stats = stats
+        self.request = request
+        self.updates = UpdateFactory()
+
+    async def process(self, payload, latencies):
+        update = Update.de_json(payload, self.app.bot)
+        start = time.perf_counter()
+        await self.app.process_update(update)
+        latencies.append(time.perf_counter() - start)
+
+    async def run(self, name, flows):
+        """Run one update flow per user concurrently, updates of a user in order"""
+        latencies = []
+        db_before = self.stats.snapshot()
+        api_before = self.request.calls
+
+        async def run_flow(flow):
+            for payload in flow:
+                await self.process(payload, latencies)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(run_flow(flow) for flow in flows))
+        elapsed = time.perf_counter() - start
+        return self.result(name, latencies, elapsed, db_before, api_before)
+
+    def result(self, name, latencies, elapsed, db_before, api_before):
+        db_after = self.stats.snapshot()
+        count = len(latencies) or 1
+        return {
+            'scenario': name,
+            'updates': len(latencies),
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p95_ms': percentile(latencies, 95) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+            'mean_ms': (statistics.fmean(latencies) if latencies else 0) * 1000,
+            'updates_per_s': len(latencies) / elapsed if elapsed else 0,
+            'reads_per_update': (db_after['reads'] - db_before['reads']) / count,
+            'writes_per_update': (db_after['writes'] - db_before['writes']) / count,
+            'api_calls_per_update': (self.request.calls - api_before) / count,
+        }
+
+    def user_ids(self, users):
+        return [USER_ID_BASE + i for i in range(users)]
+
+    async def start_scenario(self, users):
+        flows = [[self.updates.message(user_id, '/start')] for user_id in self.user_ids(users)]
+        result = await self.run('start', flows)
+        # Buffered interaction writes belong to this scenario
+        db_before = self.stats.snapshot()
+        await self.bot.interaction_buffer.flush()
+        db_after = self.stats.snapshot()
+        result['writes_per_update'] += (db_after['writes'] - db_before['writes']) / max(1, result['updates'])
+        return result
+
+    async def registration_scenario(self, users):
+        emoji = self.bot.EMOJI
+        course_id = self.bot.course_catalog.all()[0]['id']
+        flows = [
+            [
+                self.updates.message(user_id, f"{emoji['register']} Ro'yxatdan o'tish"),
+                self.updates.message(user_id, 'Ali Valiyev'),
+                self.updates.message(user_id, '20'),
+                self.updates.message(user_id, contact='+998901234567'),
+                self.updates.callback(user_id, course_id),
+            ]
+            for user_id in self.user_ids(users)
+        ]
+        return await self.run('reg_conv', flows)
+
+    async def list_courses_scenario(self, users):
+        text = f"{self.bot.EMOJI['courses']} Kurslar ro'yxati"
+        flows = [[self.updates.message(user_id, text)] for user_id in self.user_ids(users)]
+        return await self.run('list_courses', flows)
+
+    async def admin_stats_scenario(self, repeat):
+        text = f"{self.bot.EMOJI['stats']} Statistika"
+        flows = [[self.updates.message(ADMIN_ID, text) for _ in range(repeat)]]
+        return await self.run('admin_stats', flows)
+
+    async def broadcast_scenario(self):
+        """Admin starts a broadcast to all active users; measured until every user got the message"""
+        flow = [
+            self.updates.message(ADMIN_ID, f"{self.bot.EMOJI['broadcast']} E'lon yuborish"),
+            self.updates.callback(ADMIN_ID, 'aud:all'),
+            self.updates.message(ADMIN_ID, 'Benchmark e\'loni'),
+        ]
+        latencies = []
+        db_before = self.stats.snapshot()
+        api_before = self.request.calls
+        delivered_before = self.request.user_messages
+        start = time.perf_counter()
+        for payload in flow:
+            await self.process(payload, latencies)
+        while self.bot.broadcast_engine._tasks:
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - start
+        result = self.result('broadcast', latencies, elapsed, db_before, api_before)
+        result['delivered'] = self.request.user_messages - delivered_before
+        result['seconds'] = elapsed
+        return result
+
+
+async def run_bench(args):
+    if args.storage == 'sqlite':
+        # Billed operations stay at zero
+        stats = FakeStats()
+        os.environ['STORAGE'] = 'sqlite'
+        os.environ['STORAGE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='bench_load_'), 'bot.sqlite3')
+        import bot
+        await bot.storage.courses.bulk_upsert(sample_courses(args.courses), {})
+    else:
+        db = FakeFirestore(latency=args.db_latency_ms / 1000)
+        stats = db.stats
+        seed_courses(db, args.courses)
+        # bot.py creates its Firestore client through repository.create_client
+        repository.create_client = lambda: db
+        import bot
+
+    request = StubRequest(latency=args.api_latency_ms / 1000)
+    app = bot.build_application(request=request)
+    await app.initialize()
+    await app.post_init(app)
+
+    bench = Bench(bot, app, stats, request)
+    results = []
+    try:
+        results.append(await bench.start_scenario(args.users))
+        results.append(await bench.registration_scenario(args.users))
+        results.append(await bench.list_courses_scenario(args.users))
+        results.append(await bench.admin_stats_scenario(args.admin_repeat))
+        results.append(await bench.broadcast_scenario())
+    finally:
+        await app.post_stop(app)
+        await app.shutdown()
+        await app.post_shutdown(app)
+    return results
+
+
+def print_table(results):
+    print(f"{'scenario':<14}{'updates':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'upd/s':>10}{'reads/u':>9}{'writes/u':>9}{'api/u':>7}")
+    for r in results:
+        print(f"{r['scenario']:<14}{r['updates']:>8}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}"
+              f"{r['updates_per_s']:>10.0f}{r['reads_per_update']:>9.2f}{r['writes_per_update']:>9.2f}"
+              f"{r['api_calls_per_update']:>7.2f}")
+    for r in results:
+        if 'delivered' in r:
+            print(f"broadcast: {r['delivered']} messages in {r['seconds']:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=200, help="Concurrent synthetic users")
+    parser.add_argument('--courses', type=int, default=30)
+    parser.add_argument('--admin-repeat', type=int, default=20, help="admin_stats requests")
+    parser.add_argument('--db-latency-ms', type=float, default=0, help="Added per Firestore round-trip")
+    parser.add_argument('--api-latency-ms', type=float, default=0, help="Added per Bot API call")
+    parser.add_argument('--storage', choices=['firestore', 'sqlite'], default='firestore',
+                        help="Storage backend (default: Firestore fake)")
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    args = parser.parse_args()
+
+    # Offline configuration, must be set before bot.py is imported
+    os.environ['BOT_TOKEN'] = '123456:BENCHMARK'
+    os.environ['ADMIN_CHAT_ID'] = str(ADMIN_ID)
+    os.environ['PERSISTENCE'] = 'none'
+    os.environ.setdefault('BROADCAST_RATE', '100000')
+    os.environ.setdefault('SEND_RATE', '100000')
+    os.environ.setdefault('BROADCAST_PROGRESS_INTERVAL', '0.5')
+    logging.disable(logging.WARNING)
+
+    results = asyncio.run(run_bench(args))
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        print_table(results)
+
+
+if __name__ == '__main__':
+    main()
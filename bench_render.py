@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Micro-benchmark: CPU time spent rendering keyboards and texts per update,
+rebuilding everything on each call (old behaviour) vs the render cache.
+
+    python bench_render.py --courses 30 --updates 20000
+"""
+
+import time
+import argparse
+
+from telegram import ReplyKeyboardMarkup, InlineKeyboardButton, InlineKeyboardMarkup
+
+from catalog import CourseCatalog
+from render import (
+    EMOJI, create_main_keyboard, create_admin_keyboard, CourseRenderCache,
+    build_course_list_text, USER_WELCOME_TEMPLATE,
+)
+
+
+def naive_main_keyboard():
+    keyboard = [
+        [f'{EMOJI["register"]} Ro\'yxatdan o\'tish', f'{EMOJI["courses"]} Kurslar ro\'yxati'],
+        [f'{EMOJI["contact"]} Bog\'lanish', f'{EMOJI["info"]} Ma\'lumot']
+    ]
+    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=False)
+
+
+def naive_admin_keyboard():
+    keyboard = [
+        [f'{EMOJI["add"]} Kurs qo\'shish', f'{EMOJI["edit"]} Kurs tahrirlash'],
+        [f'{EMOJI["delete"]} Kurs o\'chirish', f'{EMOJI["broadcast"]} E\'lon yuborish'],
+        [f'{EMOJI["stats"]} Statistika', f'{EMOJI["back"]} Asosiy menu']
+    ]
+    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=False)
+
+
+def naive_course_keyboard(courses):
+    buttons = []
+    for course in courses:
+        course_name = course.get('name', 'Noma\'lum kurs')
+        buttons.append([InlineKeyboardButton(f"{EMOJI['course']} {course_name}", callback_data=course['id'])])
+    buttons.append([InlineKeyboardButton(f"{EMOJI['cancel']} Bekor qilish", callback_data='cancel')])
+    return InlineKeyboardMarkup(buttons)
+
+
+def naive_welcome(user_name):
+    return f"""
+{EMOJI['welcome']} <b>IT Center botiga xush kelibsiz, {user_name}!</b>
+
+{EMOJI['info']} Bu bot orqali siz:
+• Kurslarimizga ro'yxatdan o'ta olasiz
+• Barcha kurslar haqida ma'lumot olasiz
+• Biz bilan bog'lana olasiz
+
+Kerakli bo'limni tanlang:
+"""
+
+
+def make_catalog(count):
+    catalog = CourseCatalog(repo=None)
+    for i in range(count):
+        catalog.put({
+            'id': f'course{i:04d}', 'name': f'Kurs {i}', 'duration_weeks': 6,
+            'price': 400000 + i * 1000, 'description': 'Amaliy mashg\'ulotlar bilan kurs',
+        })
+    return catalog
+
+
+def run_naive(catalog, updates):
+    """One update = /start reply + course list + course keyboard + admin keyboard"""
+    for i in range(updates):
+        naive_welcome('Ali')
+        naive_main_keyboard()
+        courses = catalog.all()
+        build_course_list_text(courses)
+        naive_course_keyboard(courses)
+        naive_admin_keyboard()
+
+
+def run_cached(render_cache, updates):
+    for i in range(updates):
+        USER_WELCOME_TEMPLATE.format(user_name='Ali')
+        create_main_keyboard()
+        render_cache.list_text()
+        render_cache.keyboard('register')
+        create_admin_keyboard()
+
+
+def measure(func, *args):
+    start = time.process_time()
+    func(*args)
+    return time.process_time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--courses', type=int, default=30)
+    parser.add_argument('--updates', type=int, default=20000)
+    args = parser.parse_args()
+
+    catalog = make_catalog(args.courses)
+    render_cache = CourseRenderCache(catalog)
+
+    naive = measure(run_naive, catalog, args.updates)
+    cached = measure(run_cached, render_cache, args.updates)
+
+    print(f"Courses: {args.courses}, updates: {args.updates}")
+    print(f"Rebuild every call: {naive / args.updates * 1e6:8.1f} us/update")
+    print(f"Render cache:       {cached / args.updates * 1e6:8.1f} us/update")
+    print(f"Speedup:            {naive / cached:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
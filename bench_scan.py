@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Scan benchmark: bytes and time of full-document reads vs field projections
+and key-only queries on the paths that page through whole collections
+(broadcast recipients, /registrations pages, /export).
+
+Runs against the in-memory Firestore fake. Bytes follow Firestore's document
+size rules; time includes a simulated link of --bandwidth-mbps plus
+--latency-ms per round-trip. --extra-bytes pads every user profile to show how
+the gap grows as profiles gain fields.
+
+    python bench_scan.py --users 20000 --registrations 5000
+    python bench_scan.py --extra-bytes 2000 --bandwidth-mbps 20
+"""
+
+import time
+import argparse
+from datetime import datetime, timezone
+
+from fake_firestore import FakeFirestore
+from repository import (
+    FirestoreUserRepository, FirestoreRegistrationRepository, KEY_ONLY, current_day,
+)
+from render import REGISTRATION_PAGE_FIELDS
+from export import EXPORT_FIELDS
+
+PAGE_SIZE = 500
+
+
+def seed(db, users, registrations, extra_bytes):
+    now = datetime.now(timezone.utc)
+    for i in range(users):
+        user_id = 100000 + i
+        db._data.setdefault('users', {})[str(user_id)] = {
+            'user_id': user_id, 'username': f'user{user_id}', 'first_name': f'Foydalanuvchi {i}',
+            'last_interaction': now, 'last_seen_day': current_day(), 'active': True,
+            'subscribed': i % 2 == 0, 'subscription_date': now, 'courses': [f'course-{i % 7}'],
+            'profile': 'x' * extra_bytes,
+        }
+    for i in range(registrations):
+        user_id = 100000 + i
+        db._data.setdefault('registrations', {})[f'{user_id}_course-{i % 7}_20000'] = {
+            'tg_id': user_id, 'username': f'user{user_id}', 'fullName': f'Ism Familiya {i}', 'age': 20,
+            'phone': f'+99890{i:07d}', 'course': f'Kurs {i % 7}', 'course_id': f'course-{i % 7}',
+            'created_at': now, 'source': 'bot', 'notes': 'x' * (extra_bytes // 4),
+        }
+
+
+def page_through(fetch):
+    """Call fetch(cursor) until an empty page, return the row count"""
+    rows = 0
+    cursor = None
+    while True:
+        page = fetch(cursor)
+        if not page:
+            return rows
+        rows += len(page)
+        cursor = page[-1][0]
+
+
+def users_full(db, cursor):
+    """Broadcast recipients, reading whole user documents (previous behaviour)"""
+    query = db.collection('users').order_by('__name__').limit(PAGE_SIZE)
+    if cursor is not None:
+        query = query.start_after({'__name__': cursor})
+    return [(doc.id, doc.to_dict()['user_id']) for doc in query.stream()]
+
+
+def users_projected(db, cursor):
+    """Broadcast recipients, reading only user_id"""
+    query = db.collection('users').select(['user_id']).order_by('__name__').limit(PAGE_SIZE)
+    if cursor is not None:
+        query = query.start_after({'__name__': cursor})
+    return [(doc.id, doc.to_dict()['user_id']) for doc in query.stream()]
+
+
+def users_key_only(db, cursor):
+    """Broadcast recipients, document names only"""
+    query = db.collection('users').select(KEY_ONLY).order_by('__name__').limit(PAGE_SIZE)
+    if cursor is not None:
+        query = query.start_after({'__name__': cursor})
+    return [(doc.id, int(doc.id)) for doc in query.stream()]
+
+
+def registrations_full(db, cursor):
+    """Export pages, reading whole registration documents"""
+    query = db.collection('registrations').order_by('__name__').limit(PAGE_SIZE)
+    if cursor is not None:
+        query = query.start_after({'__name__': cursor})
+    return [(doc.id, doc.to_dict()) for doc in query.stream()]
+
+
+def measure(db, name, func):
+    before = db.stats.snapshot()
+    start = time.perf_counter()
+    rows = func()
+    elapsed = time.perf_counter() - start
+    after = db.stats.snapshot()
+    return {
+        'scan': name, 'rows': rows, 'reads': after['reads'] - before['reads'],
+        'kb': (after['bytes'] - before['bytes']) / 1024, 'seconds': elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--registrations', type=int, default=5000)
+    parser.add_argument('--extra-bytes', type=int, default=300, help="Extra profile data per user")
+    parser.add_argument('--bandwidth-mbps', type=float, default=50)
+    parser.add_argument('--latency-ms', type=float, default=20, help="Per Firestore round-trip")
+    args = parser.parse_args()
+
+    db = FakeFirestore(latency=args.latency_ms / 1000, bandwidth=args.bandwidth_mbps * 1e6 / 8)
+    seed(db, args.users, args.registrations, args.extra_bytes)
+    users = FirestoreUserRepository(db)
+    registrations = FirestoreRegistrationRepository(db)
+
+    def registrations_page(fields):
+        return lambda: len(registrations._page(None, None, None, None, None, 11, fields))
+
+    results = [
+        measure(db, 'broadcast: full documents', lambda: page_through(lambda c: users_full(db, c))),
+        measure(db, 'broadcast: select(user_id)', lambda: page_through(lambda c: users_projected(db, c))),
+        measure(db, 'broadcast: key-only', lambda: page_through(lambda c: users._page_ids(c, PAGE_SIZE, {}))),
+        measure(db, 'export: full documents', lambda: page_through(lambda c: registrations_full(db, c))),
+        measure(db, 'export: select(fields)',
+                lambda: page_through(lambda c: registrations._scan(EXPORT_FIELDS, c, PAGE_SIZE))),
+        measure(db, '/registrations page: full', registrations_page(None)),
+        measure(db, '/registrations page: select', registrations_page(REGISTRATION_PAGE_FIELDS)),
+    ]
+    assert page_through(lambda c: users_key_only(db, c)) == args.users
+
+    print(f"Users: {args.users}, registrations: {args.registrations}, extra profile bytes: {args.extra_bytes}, "
+          f"link: {args.bandwidth_mbps:g} Mbit/s + {args.latency_ms:g} ms")
+    print(f"{'scan':<32}{'rows':>8}{'reads':>8}{'KB':>10}{'seconds':>9}")
+    for r in results:
+        print(f"{r['scan']:<32}{r['rows']:>8}{r['reads']:>8}{r['kb']:>10.0f}{r['seconds']:>9.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Micro-benchmark: course search per inline query keystroke, scanning and
+folding every course on each query vs the prefix index, and the cost of an
+incremental index update vs a full rebuild.
+
+    python bench_search.py --courses 1000
+"""
+
+import time
+import random
+import argparse
+
+from search import CourseSearchIndex, tokenize
+
+SUBJECTS = [
+    'Python dasturlash', 'Frontend (JavaScript)', 'Kompyuter savodxonligi', 'Ingliz tili', 'Rus tili',
+    'Grafik dizayn', 'Data Science', 'Mobil dasturlash (Flutter)', 'Kiberxavfsizlik', 'Excel va hisobot',
+]
+QUERIES = ['pyth', 'питон', 'java', 'savodx', 'саводхон', 'ingliz t', 'dizayn 3', 'excel', 'kiber', 'flutter 12']
+
+
+def sample_courses(count):
+    rng = random.Random(1)
+    return [
+        {
+            'id': f'course{i:05d}', 'name': f'{rng.choice(SUBJECTS)} {i % 50 + 1}-guruh',
+            'description': 'Amaliy mashg\'ulotlar, loyiha va sertifikat',
+        }
+        for i in range(count)
+    ]
+
+
+def scan_search(courses, text):
+    """Previous approach: fold every course on every query"""
+    query_tokens = tokenize(text)
+    matches = []
+    for course in courses:
+        tokens = tokenize(f"{course['name']} {course.get('description', '')}")
+        if all(any(token.startswith(query_token) for token in tokens) for query_token in query_tokens):
+            matches.append(course['id'])
+    return matches
+
+
+def per_query_us(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for query in QUERIES:
+            func(query)
+    return (time.perf_counter() - start) / (repeat * len(QUERIES)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--courses', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    courses = sample_courses(args.courses)
+    index = CourseSearchIndex()
+    start = time.perf_counter()
+    index.rebuild(courses)
+    rebuild_ms = (time.perf_counter() - start) * 1000
+
+    for query in QUERIES:
+        assert set(index.search(query)) == set(scan_search(courses, query)), query
+
+    scan = per_query_us(lambda query: scan_search(courses, query), max(1, args.repeat // 10))
+    indexed = per_query_us(index.search, args.repeat)
+
+    start = time.perf_counter()
+    for course in courses[:100]:
+        index.put(dict(course, name=course['name'] + ' (yangi)'))
+    update_us = (time.perf_counter() - start) / 100 * 1e6
+
+    print(f"Courses: {args.courses}, queries: {', '.join(QUERIES)}")
+    print(f"Scan and fold every course: {scan:10.1f} us/query")
+    print(f"Prefix index:               {indexed:10.1f} us/query ({scan / indexed:.0f}x)")
+    print(f"Full rebuild:               {rebuild_ms * 1000:10.1f} us")
+    print(f"Incremental course update:  {update_us:10.1f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Startup-time benchmark.
+
+Each run is a fresh interpreter, so import costs are real cold-ish starts
+(the OS file cache stays warm). Measures the time to import bot.py, build the
+Application, and get through initialize() + post_init() against the in-memory
+Firestore fake and stub Bot API from bench_load.py. The deferred cost of
+importing the Firestore client library is reported separately.
+
+    python bench_startup.py --runs 5
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+PHASES_SCRIPT = r'''
+import os, sys, time, json, asyncio, logging, warnings
+start = time.perf_counter()
+warnings.simplefilter('ignore')
+import bot
+imported = time.perf_counter()
+firebase_loaded = any(name.startswith('google.cloud.firestore') for name in sys.modules)
+
+import bench_load
+from fake_firestore import FakeFirestore
+
+logging.disable(logging.WARNING)
+db = FakeFirestore()
+bench_load.seed_courses(db, 30)
+bot.db._factory = lambda: db
+
+async def run():
+    begin = time.perf_counter()
+    app = bot.build_application(request=bench_load.StubRequest())
+    built = time.perf_counter()
+    await app.initialize()
+    await app.post_init(app)
+    ready = time.perf_counter()
+    await app.post_stop(app)
+    await app.shutdown()
+    return built - begin, ready - built
+
+build, init = asyncio.run(run())
+print(json.dumps({
+    'import_bot': imported - start,
+    'build_application': build,
+    'initialize_post_init': init,
+    'total': imported - start + build + init,
+    'firestore_imported_by_bot': firebase_loaded,
+}))
+'''
+
+FIRESTORE_IMPORT_SCRIPT = r'''
+import time, json
+start = time.perf_counter()
+import firebase_admin.firestore
+print(json.dumps({'import_firestore': time.perf_counter() - start}))
+'''
+
+
+def run_script(script):
+    env = dict(os.environ, BOT_TOKEN='123456:BENCHMARK', ADMIN_CHAT_ID='1', PERSISTENCE='none')
+    output = subprocess.run(
+        [sys.executable, '-c', script], env=env, check=True, capture_output=True, text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    args = parser.parse_args()
+
+    runs = [run_script(PHASES_SCRIPT) for _ in range(args.runs)]
+    deferred = [run_script(FIRESTORE_IMPORT_SCRIPT)['import_firestore'] for _ in range(args.runs)]
+
+    result = {
+        phase: statistics.median(run[phase] for run in runs) * 1000
+        for phase in ('import_bot', 'build_application', 'initialize_post_init', 'total')
+    }
+    result['deferred_import_firestore'] = statistics.median(deferred) * 1000
+    result['firestore_imported_by_bot'] = any(run['firestore_imported_by_bot'] for run in runs)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"Median of {args.runs} runs (ms):")
+    for phase in ('import_bot', 'build_application', 'initialize_post_init', 'total'):
+        print(f"  {phase:<22}{result[phase]:8.0f}")
+    print(f"  {'deferred Firestore import':<22}{result['deferred_import_firestore']:8.0f}  "
+          f"(imported at bot import: {result['firestore_imported_by_bot']})")
+
+
+if __name__ == '__main__':
+    main()
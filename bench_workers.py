@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Worker throughput benchmark: updates per second with 1..N worker processes.
+
+Every synthetic user sends /start and goes through the registration
+conversation. Updates are dispatched as Telegram would deliver them, users
+interleaved, each user's updates in order. Each worker runs the real handlers
+on its own in-memory Firestore fake and stub Bot API (users are sharded, so a
+user's data stays on one worker). Measured from the first dispatch until all
+workers have processed their queues and stopped.
+
+    python bench_workers.py --workers 1,2,4 --users 2000
+    python bench_workers.py --db-latency-ms 5 --api-latency-ms 20
+"""
+
+import os
+import time
+import asyncio
+import argparse
+import logging
+import warnings
+import multiprocessing
+
+from telegram import Bot, Update
+
+from workers import WorkerPool
+from bench_load import ADMIN_ID, USER_ID_BASE, UpdateFactory, StubRequest, seed_courses
+
+TOKEN = '123456:BENCHMARK'
+
+
+def bench_worker(index, workers, queue, ready, results, courses, db_latency, api_latency):
+    """Worker process: real handlers on an in-memory Firestore and stub Bot API"""
+    logging.disable(logging.WARNING)
+    warnings.simplefilter('ignore')
+    import repository
+    from fake_firestore import FakeFirestore
+    db = FakeFirestore(latency=db_latency)
+    seed_courses(db, courses)
+    repository.create_client = lambda: db
+    import bot
+
+    request = StubRequest(latency=api_latency)
+    bot.run_worker(index, workers, queue, ready, request=request)
+    results.put({
+        'worker': index,
+        'registrations': len(db._data.get('registrations', {})),
+        'api_calls': request.calls,
+    })
+
+
+def user_flows(users, course_id):
+    factory = UpdateFactory()
+    return [
+        [
+            factory.message(user_id, '/start'),
+            factory.message(user_id, "📝 Ro'yxatdan o'tish"),
+            factory.message(user_id, 'Ali Valiyev'),
+            factory.message(user_id, '20'),
+            factory.message(user_id, contact='+998901234567'),
+            factory.callback(user_id, course_id),
+        ]
+        for user_id in range(USER_ID_BASE, USER_ID_BASE + users)
+    ]
+
+
+async def dispatch_all(pool, updates):
+    for update in updates:
+        await pool.dispatch(update)
+
+
+def run(workers, args):
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    pool = WorkerPool(bench_worker, workers, args=(
+        results, args.courses, args.db_latency_ms / 1000, args.api_latency_ms / 1000,
+    ))
+    pool.start()
+
+    # Users interleaved, each user's updates in order
+    bot = Bot(TOKEN)
+    flows = user_flows(args.users, 'course-0')
+    updates = [Update.de_json(flow[step], bot) for step in range(len(flows[0])) for flow in flows]
+
+    start = time.perf_counter()
+    asyncio.run(dispatch_all(pool, updates))
+    pool.stop(timeout=600)
+    elapsed = time.perf_counter() - start
+
+    reports = [results.get() for _ in range(workers)]
+    return {
+        'workers': workers,
+        'updates': len(updates),
+        'seconds': elapsed,
+        'updates_per_s': len(updates) / elapsed,
+        'registrations': sum(r['registrations'] for r in reports),
+        'per_worker': sorted(r['registrations'] for r in reports),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', default='1,2,4', help="Comma separated worker counts")
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--courses', type=int, default=30)
+    parser.add_argument('--db-latency-ms', type=float, default=0, help="Added per Firestore round-trip")
+    parser.add_argument('--api-latency-ms', type=float, default=0, help="Added per Bot API call")
+    args = parser.parse_args()
+
+    # Offline configuration, inherited by the worker processes
+    os.environ['BOT_TOKEN'] = TOKEN
+    os.environ['ADMIN_CHAT_ID'] = str(ADMIN_ID)
+    os.environ['STORAGE'] = 'firestore'
+    os.environ['PERSISTENCE'] = 'none'
+    os.environ['METRICS_PORT'] = '0'
+    os.environ.setdefault('SEND_RATE', '100000')
+    os.environ.setdefault('FLOOD_USER_LIMIT', '100000')
+    logging.disable(logging.WARNING)
+
+    print(f"{'workers':>8}{'updates':>9}{'seconds':>9}{'upd/s':>9}{'speedup':>9}  registrations per worker")
+    baseline = None
+    for workers in [int(value) for value in args.workers.split(',')]:
+        r = run(workers, args)
+        baseline = baseline or r['updates_per_s']
+        print(f"{r['workers']:>8}{r['updates']:>9}{r['seconds']:>9.2f}{r['updates_per_s']:>9.0f}"
+              f"{r['updates_per_s'] / baseline:>8.2f}x  {r['registrations']} {r['per_worker']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -8,23 +8,54 @@ Python 3.13 + python-telegram-bot 21.x
 
 import os
 import re
+import asyncio
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 
 # Telegram imports (v21)
 from telegram import (
-    Update, KeyboardButton, ReplyKeyboardMarkup, ReplyKeyboardRemove,
-    InlineKeyboardButton, InlineKeyboardMarkup,
+    Bot, Update, ReplyKeyboardRemove, InlineKeyboardButton, InlineKeyboardMarkup,
 )
 from telegram.ext import (
     ApplicationBuilder, CommandHandler, MessageHandler, CallbackQueryHandler,
-    ContextTypes, ConversationHandler, filters,
+    ChatMemberHandler, ContextTypes, ConversationHandler, TypeHandler, InlineQueryHandler, filters,
 )
 
-# Firebase Admin
-import firebase_admin
-from firebase_admin import credentials, firestore
+# Data access layer
+from repository import LazyFirestore, credentials_path, run_blocking, shutdown_executor, current_day
+from storage import create_storage, STORAGE
+from catalog import CourseCatalog
+from cache import TTLCache
+from broadcast import BroadcastEngine, payload_from_message
+from update_processor import PerUserUpdateProcessor
+from persistence import create_persistence, PERSISTENCE
+from writebehind import InteractionBuffer
+from validation import (
+    parse_course_name, parse_course_duration, parse_course_price, parse_course_description,
+    COURSE_FIELD_PARSERS, course_key,
+)
+from render import (
+    EMOJI, create_main_keyboard, create_admin_keyboard, create_subscription_keyboard,
+    create_phone_keyboard, CourseRenderCache,
+    subscription_required_text, subscription_not_found_text, SUBSCRIPTION_SUCCESS_TEXT,
+    ADMIN_WELCOME_TEMPLATE, USER_WELCOME_TEMPLATE, BACK_TO_MAIN_TEMPLATE,
+    REG_NAME_TEXT, REG_AGE_TEXT, REG_AGE_ERROR_TEXT, REG_PHONE_TEXT, REG_COURSE_TEXT,
+    ADD_COURSE_NAME_TEXT, ADD_COURSE_DURATION_TEXT, ADD_COURSE_PRICE_TEXT, ADD_COURSE_DESC_TEXT,
+    EDIT_COURSE_SELECT_TEXT, DELETE_COURSE_SELECT_TEXT, BROADCAST_AUDIENCE_TEXT, BROADCAST_START_TEXT,
+    AUDIENCE_LABELS, course_audience_label,
+    CONTACT_TEXT, ABOUT_TEXT, build_registrations_page, registration_digest_header, REGISTRATION_PAGE_FIELDS,
+    BTN_REGISTER, BTN_COURSES, BTN_CONTACT, BTN_ABOUT, BTN_ADD_COURSE, BTN_EDIT_COURSE,
+    BTN_DELETE_COURSE, BTN_BROADCAST, BTN_STATS, BTN_BACK,
+)
+from webserver import WebServer, webhook_handler, health_handler, run_webhook
+from metrics import MetricsRequest, instrument_application, metrics_handler
+from router import ButtonRouter
+from export import RegistrationExporter
+from notify import AdminNotifier
+from flood import FloodControl
+from lanes import SendLanes, SEND_RATE, INTERACTIVE_POOL_SIZE, BULK_POOL_SIZE
+from workers import WorkerPool, serve_queue, shard_of, WORKERS
 
 # Configure logging
 logging.basicConfig(
@@ -39,63 +70,48 @@ BOT_TOKEN = os.getenv("BOT_TOKEN")
 ADMIN_CHAT_ID = int(os.getenv("ADMIN_CHAT_ID", "0"))
 REQUIRED_CHANNEL = os.getenv("REQUIRED_CHANNEL", "@ITCenter_01")  # Kanal username yoki ID
 
-# Firebase setup
-try:
-    cred_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "service-account.json")
-    logger.info(f"Firebase credential file: {cred_path}")
-
-    if not os.path.exists(cred_path):
-        raise FileNotFoundError(f"Firebase credential file not found: {cred_path}")
-
-    cred = credentials.Certificate(cred_path)
-
-    if not firebase_admin._apps:
-        firebase_admin.initialize_app(cred)
-        logger.info("Firebase app initialized successfully")
-
-    db = firestore.client()
-    logger.info("Firestore client created successfully")
-
-    # Test connection
-    test_collection = db.collection('test').limit(1)
-    list(test_collection.stream())
-    logger.info("Firestore connection successful!")
-
-except Exception as e:
-    logger.error(f"Firebase setup error: {e}")
-    raise
-
-# Emojis and design elements
-EMOJI = {
-    'welcome': '🎉',
-    'register': '📝',
-    'courses': '📚',
-    'contact': '☎️',
-    'success': '✅',
-    'error': '❌',
-    'info': 'ℹ️',
-    'phone': '📱',
-    'age': '🎂',
-    'name': '👤',
-    'course': '🎓',
-    'time': '⏰',
-    'money': '💰',
-    'location': '📍',
-    'new': '🆕',
-    'cancel': '❌',
-    'admin': '👑',
-    'add': '➕',
-    'edit': '✏️',
-    'delete': '🗑️',
-    'broadcast': '📢',
-    'stats': '📊',
-    'back': '⬅️',
-    'save': '💾',
-    'announce': '📣',
-    'subscribe': '🔔',
-    'warning': '⚠️',
-    'check': '✔️',
-}
+# Subscription cache settings (seconds)
+SUBSCRIPTION_CACHE_SIZE = int(os.getenv("SUBSCRIPTION_CACHE_SIZE", "10000"))
+SUBSCRIPTION_TTL = int(os.getenv("SUBSCRIPTION_TTL", "600"))
+SUBSCRIPTION_NEGATIVE_TTL = int(os.getenv("SUBSCRIPTION_NEGATIVE_TTL", "30"))
+
+# Update delivery: "polling" or "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # Public base URL, e.g. https://bot.example.com
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "16"))
+REGISTRATIONS_PAGE_SIZE = int(os.getenv("REGISTRATIONS_PAGE_SIZE", "10"))
+FIRESTORE_STARTUP_TIMEOUT = float(os.getenv("FIRESTORE_STARTUP_TIMEOUT", "15"))
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # Polling mode /metrics server, 0 = off
+INLINE_CACHE_TIME = int(os.getenv("INLINE_CACHE_TIME", "300"))  # Seconds Telegram caches inline results
+INLINE_PAGE_SIZE = 20  # Telegram allows up to 50 results per answer
+# Webhook mode serves /metrics on the webhook server instead
+metrics_port = METRICS_PORT if BOT_MODE != 'webhook' else 0
+
+# Firebase setup: the client is created on first use, in a worker thread
+db = LazyFirestore()
+storage = create_storage(db=db)
+
+courses_repo = storage.courses
+users_repo = storage.users
+registrations_repo = storage.registrations
+broadcasts_repo = storage.broadcasts
+course_catalog = CourseCatalog(courses_repo)
+course_render = CourseRenderCache(course_catalog)
+subscription_cache = TTLCache(maxsize=SUBSCRIPTION_CACHE_SIZE)
+broadcast_engine = BroadcastEngine(broadcasts_repo, users_repo)
+interaction_buffer = InteractionBuffer(users_repo)
+registration_exporter = RegistrationExporter(registrations_repo)
+admin_notifier = AdminNotifier(ADMIN_CHAT_ID, registration_digest_header)
+flood_control = FloodControl(exempt=[ADMIN_CHAT_ID])
+send_lanes = SendLanes()
+bulk_bot = None  # Broadcasts, admin notifications and exports, see build_application
+metrics_server = None
+storage_loader = None
+runs_broadcasts = True  # With WORKERS > 1 only the admin's worker, see run_worker
 
 # Conversation states
 FULLNAME, AGE, PHONE, COURSE = range(4)
@@ -103,45 +119,61 @@ ADD_COURSE_NAME, ADD_COURSE_DURATION, ADD_COURSE_PRICE, ADD_COURSE_DESC = range(
 EDIT_COURSE_SELECT, EDIT_COURSE_FIELD, EDIT_COURSE_VALUE = range(105, 108)
 BROADCAST_MESSAGE = 108
 DELETE_COURSE_SELECT = 109
+BROADCAST_AUDIENCE = 110
 
 # Helper functions
 def is_admin(user_id):
     """Check if user is admin"""
     return user_id == ADMIN_CHAT_ID
 
+SUBSCRIBED_STATUSES = ('member', 'administrator', 'creator')
+
+def cache_subscription(user_id, subscribed):
+    """Remember membership status with separate TTLs for positive and negative results"""
+    ttl = SUBSCRIPTION_TTL if subscribed else SUBSCRIPTION_NEGATIVE_TTL
+    subscription_cache.set(user_id, subscribed, ttl)
+
 async def check_subscription(context: ContextTypes.DEFAULT_TYPE, user_id: int):
     """Check if user is subscribed to required channel"""
+    cached = subscription_cache.get(user_id)
+    if cached is not None:
+        return cached
+
     try:
         chat_member = await context.bot.get_chat_member(REQUIRED_CHANNEL, user_id)
-        return chat_member.status in ['member', 'administrator', 'creator']
+        subscribed = chat_member.status in SUBSCRIBED_STATUSES
     except Exception as e:
+        # Errors are not cached so the next message retries
         logger.error(f"Error checking subscription: {e}")
         return False
 
-def create_subscription_keyboard():
-    """Create subscription keyboard"""
-    keyboard = [
-        [InlineKeyboardButton(f'{EMOJI["subscribe"]} Kanalga obuna bo\'lish', url=f'https://t.me/{REQUIRED_CHANNEL.replace("@", "")}')],
-        [InlineKeyboardButton(f'{EMOJI["check"]} Obunani tekshirish', callback_data='check_subscription')]
-    ]
-    return InlineKeyboardMarkup(keyboard)
+    cache_subscription(user_id, subscribed)
+    return subscribed
 
-async def subscription_required_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Send subscription required message"""
-    subscription_text = f"""
-{EMOJI['warning']} <b>Diqqat!</b>
+def is_required_channel(chat):
+    """Check if chat is the required channel"""
+    if str(chat.id) == REQUIRED_CHANNEL:
+        return True
+    return bool(chat.username) and f'@{chat.username}'.lower() == REQUIRED_CHANNEL.lower()
 
-{EMOJI['info']} Botdan to'liq foydalanish uchun bizning kanalimizga obuna bo'ling!
+async def channel_member_update(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Refresh subscription cache from chat_member updates of the required channel"""
+    member_update = update.chat_member
+    if not is_required_channel(member_update.chat):
+        return
 
-{EMOJI['subscribe']} <b>Kanal:</b> {REQUIRED_CHANNEL}
+    user_id = member_update.new_chat_member.user.id
+    subscribed = member_update.new_chat_member.status in SUBSCRIBED_STATUSES
+    cache_subscription(user_id, subscribed)
 
-{EMOJI['check']} Obuna bo'lgandan so'ng "Obunani tekshirish" tugmasini bosing.
-"""
+async def subscription_required_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Send subscription required message"""
+    subscription_text = subscription_required_text(REQUIRED_CHANNEL)
     
     await update.message.reply_text(
         subscription_text,
         parse_mode='HTML',
-        reply_markup=create_subscription_keyboard()
+        reply_markup=create_subscription_keyboard(REQUIRED_CHANNEL)
     )
 
 async def check_subscription_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -150,38 +182,26 @@ async def check_subscription_callback(update: Update, context: ContextTypes.DEFA
     await query.answer()
     
     user_id = update.effective_user.id
-    
-    if await check_subscription(context, user_id):
-        success_text = f"""
-{EMOJI['success']} <b>Rahmat!</b>
 
-{EMOJI['check']} Siz muvaffaqiyatli obuna bo'ldingiz!
-Endi botdan to'liq foydalanishingiz mumkin.
+    # User asked for a fresh check, cached negative result must not win
+    subscription_cache.invalidate(user_id)
 
-{EMOJI['info']} Asosiy menyuga o'tish uchun /start buyrug'ini bosing.
-"""
+    if await check_subscription(context, user_id):
+        success_text = SUBSCRIPTION_SUCCESS_TEXT
         await query.edit_message_text(success_text, parse_mode='HTML')
         
         # Save subscription status
         try:
-            user_ref = db.collection('users').document(str(user_id))
-            user_ref.update({'subscribed': True, 'subscription_date': firestore.SERVER_TIMESTAMP})
+            await users_repo.set_subscribed(user_id)
         except Exception as e:
             logger.error(f"Error updating subscription status: {e}")
             
     else:
-        error_text = f"""
-{EMOJI['error']} <b>Obuna topilmadi!</b>
-
-{EMOJI['warning']} Iltimos, avval kanalga obuna bo'ling:
-{REQUIRED_CHANNEL}
-
-{EMOJI['info']} Keyin qaytadan "Obunani tekshirish" tugmasini bosing.
-"""
+        error_text = subscription_not_found_text(REQUIRED_CHANNEL)
         await query.edit_message_text(
             error_text, 
             parse_mode='HTML',
-            reply_markup=create_subscription_keyboard()
+            reply_markup=create_subscription_keyboard(REQUIRED_CHANNEL)
         )
 
 def is_valid_age(age_text):
@@ -209,39 +229,6 @@ def is_valid_phone(phone):
     """Validate phone number"""
     return re.match(r'^[\+]?[0-9\s\-\(\)]{9,15}$', phone)
 
-def create_main_keyboard():
-    """Create main keyboard"""
-    keyboard = [
-        [f'{EMOJI["register"]} Ro\'yxatdan o\'tish', f'{EMOJI["courses"]} Kurslar ro\'yxati'],
-        [f'{EMOJI["contact"]} Bog\'lanish', f'{EMOJI["info"]} Ma\'lumot']
-    ]
-    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=False)
-
-def create_admin_keyboard():
-    """Create admin keyboard"""
-    keyboard = [
-        [f'{EMOJI["add"]} Kurs qo\'shish', f'{EMOJI["edit"]} Kurs tahrirlash'],
-        [f'{EMOJI["delete"]} Kurs o\'chirish', f'{EMOJI["broadcast"]} E\'lon yuborish'],
-        [f'{EMOJI["stats"]} Statistika', f'{EMOJI["back"]} Asosiy menu']
-    ]
-    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=False)
-
-async def save_user_interaction(user_id, username, first_name):
-    """Save user interaction data"""
-    try:
-        user_data = {
-            'user_id': user_id,
-            'username': username or '',
-            'first_name': first_name or '',
-            'last_interaction': firestore.SERVER_TIMESTAMP
-        }
-
-        user_ref = db.collection('users').document(str(user_id))
-        user_ref.set(user_data, merge=True)
-
-    except Exception as e:
-        logger.error(f"Error saving user interaction: {e}")
-
 # Subscription check decorator
 async def require_subscription(func):
     """Decorator to check subscription before allowing access"""
@@ -266,21 +253,8 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     user_name = user.first_name or "Foydalanuvchi"
 
-    await save_user_interaction(user.id, user.username, user.first_name)
-
     if is_admin(user.id):
-        welcome_text = f"""
-{EMOJI['admin']} <b>Admin panelga xush kelibsiz, {user_name}!</b>
-
-{EMOJI['info']} Admin sifatida siz:
-• Kurslarni boshqara olasiz
-• E'lonlar yuborish mumkin
-• Statistika ko'ra olasiz
-• Oddiy foydalanuvchi funksiyalarini ham ishlatish mumkin
-• Obuna bo'lish talabidan ozod
-
-Kerakli bo'limni tanlang:
-"""
+        welcome_text = ADMIN_WELCOME_TEMPLATE.format(user_name=user_name)
         await update.message.reply_text(
             welcome_text,
             reply_markup=create_admin_keyboard(),
@@ -292,16 +266,7 @@ Kerakli bo'limni tanlang:
             await subscription_required_message(update, context)
             return
         
-        welcome_text = f"""
-{EMOJI['welcome']} <b>IT Center botiga xush kelibsiz, {user_name}!</b>
-
-{EMOJI['info']} Bu bot orqali siz:
-• Kurslarimizga ro'yxatdan o'ta olasiz
-• Barcha kurslar haqida ma'lumot olasiz
-• Biz bilan bog'lana olasiz
-
-Kerakli bo'limni tanlang:
-"""
+        welcome_text = USER_WELCOME_TEMPLATE.format(user_name=user_name)
         await update.message.reply_text(
             welcome_text,
             reply_markup=create_main_keyboard(),
@@ -318,13 +283,7 @@ async def reg_entry(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await subscription_required_message(update, context)
             return
     
-    welcome_reg = f"""
-{EMOJI['register']} <b>Ro'yxatdan o'tish</b>
-
-{EMOJI['name']} Iltimos, <b>ism va familiyangizni</b> to'liq kiriting:
-
-<i>Masalan: Ahmadjon Valiyev</i>
-"""
+    welcome_reg = REG_NAME_TEXT
     await update.message.reply_text(
         welcome_reg,
         reply_markup=ReplyKeyboardRemove(),
@@ -349,11 +308,7 @@ async def reg_fullname(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     context.user_data['fullName'] = fullname
 
-    age_text = f"""
-{EMOJI['age']} <b>Yoshingizni kiriting:</b>
-
-{EMOJI['info']} <i>Faqat raqam kiriting (5-100 oralig'ida)</i>
-"""
+    age_text = REG_AGE_TEXT
     await update.message.reply_text(age_text, parse_mode='HTML')
     return AGE
 
@@ -361,32 +316,17 @@ async def reg_age(update: Update, context: ContextTypes.DEFAULT_TYPE):
     age_input = update.message.text.strip()
 
     if not is_valid_age(age_input):
-        error_text = f"""
-{EMOJI['error']} <b>Noto'g'ri yosh!</b>
-
-{EMOJI['info']} Iltimos:
-• Faqat raqam kiriting
-• 5 dan 100 gacha bo'lgan yoshni kiriting
-
-<i>Masalan: 25</i>
-"""
+        error_text = REG_AGE_ERROR_TEXT
         await update.message.reply_text(error_text, parse_mode='HTML')
         return AGE
 
     context.user_data['age'] = age_input
 
-    phone_kb = [[KeyboardButton(f'{EMOJI["phone"]} Telefonni yuborish', request_contact=True)]]
-    phone_text = f"""
-{EMOJI['phone']} <b>Telefon raqamingizni yuboring:</b>
-
-{EMOJI['info']} Ikki usuldan birini tanlang:
-• Pastdagi tugmani bosing
-• Yoki qo'lda kiriting (+998901234567)
-"""
+    phone_text = REG_PHONE_TEXT
 
     await update.message.reply_text(
         phone_text,
-        reply_markup=ReplyKeyboardMarkup(phone_kb, one_time_keyboard=True, resize_keyboard=True),
+        reply_markup=create_phone_keyboard(),
         parse_mode='HTML'
     )
     return PHONE
@@ -406,18 +346,7 @@ async def reg_phone(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data['phone'] = format_phone(phone)
 
     try:
-        logger.info("Getting courses from Firestore...")
-        courses_ref = db.collection('courses')
-        courses_docs = courses_ref.stream()
-        courses = []
-
-        for doc in courses_docs:
-            course_data = doc.to_dict()
-            course_data['id'] = doc.id
-            courses.append(course_data)
-            logger.info(f"Found course: {course_data.get('name', 'Unknown')}")
-
-        if not courses:
+        if not len(course_catalog):
             logger.warning("No courses found")
             await update.message.reply_text(
                 f'{EMOJI["error"]} Hozircha kurslar mavjud emas. Keyinroq urinib ko\'ring.\n'
@@ -426,23 +355,11 @@ async def reg_phone(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             return ConversationHandler.END
 
-        buttons = []
-        for course in courses:
-            course_name = course.get('name', 'Noma\'lum kurs')
-            course_text = f"{EMOJI['course']} {course_name}"
-            buttons.append([InlineKeyboardButton(course_text, callback_data=course['id'])])
-
-        buttons.append([InlineKeyboardButton(f"{EMOJI['cancel']} Bekor qilish", callback_data='cancel')])
-
-        course_selection_text = f"""
-{EMOJI['course']} <b>Kursni tanlang:</b>
-
-{EMOJI['info']} <i>Quyidagi kurslardan birini tanlang:</i>
-"""
+        course_selection_text = REG_COURSE_TEXT
 
         await update.message.reply_text(
             course_selection_text,
-            reply_markup=InlineKeyboardMarkup(buttons),
+            reply_markup=course_render.keyboard('register'),
             parse_mode='HTML'
         )
         return COURSE
@@ -474,14 +391,13 @@ async def reg_course(update: Update, context: ContextTypes.DEFAULT_TYPE):
         course_id = query.data
         logger.info(f"Selected course ID: {course_id}")
 
-        course_doc = db.collection('courses').document(course_id).get()
+        course_data = course_catalog.get(course_id)
 
-        if not course_doc.exists:
+        if course_data is None:
             logger.error(f"Course not found: {course_id}")
             await query.edit_message_text(f'{EMOJI["error"]} Kurs topilmadi!')
             return ConversationHandler.END
 
-        course_data = course_doc.to_dict()
         course_name = course_data.get('name', 'Noma\'lum kurs')
         logger.info(f"Course data: {course_name}")
 
@@ -493,12 +409,25 @@ async def reg_course(update: Update, context: ContextTypes.DEFAULT_TYPE):
             'phone': context.user_data['phone'],
             'course': course_name,
             'course_id': course_id,
-            'created_at': firestore.SERVER_TIMESTAMP,
         }
 
         logger.info(f"Registration data: {registration_data}")
-        doc_ref = db.collection('registrations').add(registration_data)
-        logger.info(f"Registration saved successfully: {doc_ref}")
+        registration_id, created = await registrations_repo.register(registration_data)
+        if not created:
+            # Double tap or repeated registration for the same course
+            logger.info(f"Duplicate registration ignored: {registration_id}")
+            await query.edit_message_text(
+                f'{EMOJI["info"]} Siz <b>{course_name}</b> kursiga allaqachon ro\'yxatdan o\'tgansiz.\n'
+                f'{EMOJI["time"]} Operatorlarimiz tez orada siz bilan bog\'lanishadi!',
+                parse_mode='HTML'
+            )
+            await context.bot.send_message(
+                chat_id=update.effective_chat.id,
+                text=f'{EMOJI["info"]} Asosiy menyuga qaytdingiz.',
+                reply_markup=create_main_keyboard()
+            )
+            return ConversationHandler.END
+        logger.info(f"Registration saved successfully: {registration_id}")
 
         success_text = f"""
 {EMOJI['success']} <b>Tabriklaymiz!</b>
@@ -534,16 +463,13 @@ async def reg_course(update: Update, context: ContextTypes.DEFAULT_TYPE):
 {EMOJI['info']} <b>Telegram:</b> @{registration_data['username'] or 'username yo\'q'}
 🆔 <b>ID:</b> {registration_data['tg_id']}
 """
+            admin_summary = (
+                f"{EMOJI['name']} {registration_data['fullName']}, {registration_data['phone']} — "
+                f"{course_name} (🆔 {registration_data['tg_id']})"
+            )
 
-            try:
-                await context.bot.send_message(
-                    chat_id=ADMIN_CHAT_ID,
-                    text=admin_text,
-                    parse_mode='HTML'
-                )
-                logger.info("Admin notification sent")
-            except Exception as e:
-                logger.error(f"Error sending admin notification: {e}")
+            # Delivered by the notifier worker, the user doesn't wait for it
+            admin_notifier.notify(admin_text, admin_summary)
 
         return ConversationHandler.END
 
@@ -570,25 +496,19 @@ async def admin_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     try:
-        users_count = len(list(db.collection('users').stream()))
-        registrations_count = len(list(db.collection('registrations').stream()))
-        courses_count = len(list(db.collection('courses').stream()))
-
-        # Count subscribed users
-        subscribed_count = 0
-        for doc in db.collection('users').stream():
-            user_data = doc.to_dict()
-            if user_data.get('subscribed', False):
-                subscribed_count += 1
-
-        week_ago = datetime.now() - timedelta(days=7)
-        recent_registrations = 0
-
-        for doc in db.collection('registrations').stream():
-            reg_data = doc.to_dict()
-            if 'created_at' in reg_data and reg_data['created_at']:
-                if reg_data['created_at'].replace(tzinfo=None) > week_ago:
-                    recent_registrations += 1
+        week_ago = datetime.now(timezone.utc) - timedelta(days=7)
+
+        # Aggregation queries cost a constant number of reads, run them in parallel
+        (
+            users_count, registrations_count,
+            subscribed_count, recent_registrations,
+        ) = await asyncio.gather(
+            users_repo.count(),
+            registrations_repo.count(),
+            users_repo.count_subscribed(),
+            registrations_repo.count_since(week_ago),
+        )
+        courses_count = len(course_catalog)
 
         stats_text = f"""
 {EMOJI['stats']} <b>Bot statistikasi:</b>
@@ -615,19 +535,153 @@ async def admin_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
             reply_markup=create_admin_keyboard()
         )
 
+# Registration browsing (admin)
+REGISTRATIONS_USAGE = f"""
+{EMOJI['info']} <b>Arizalarni ko'rish:</b>
+
+/registrations — barcha arizalar
+/registrations &lt;kurs nomi&gt; — kurs bo'yicha
+/registrations_user &lt;Telegram ID&gt; — foydalanuvchi bo'yicha
+/registrations_phone &lt;telefon&gt; — telefon raqami bo'yicha
+/registrations_range &lt;kk.oo.yyyy&gt; [kk.oo.yyyy] — sana oralig'i (UTC)
+/export — barcha arizalar CSV faylda
+"""
+
+def parse_date(text):
+    """Parse dd.mm.yyyy as UTC midnight"""
+    return datetime.strptime(text, '%d.%m.%Y').replace(tzinfo=timezone.utc)
+
+async def fetch_registrations_page(browse):
+    """Read one page (plus one row to detect the next page) and remember its end cursor"""
+    spec, page = browse['spec'], browse['page']
+    cursor = browse['cursors'][page]
+    rows = await registrations_repo.page(
+        field=spec.get('field'), value=spec.get('value'),
+        since=spec.get('since'), until=spec.get('until'),
+        after=(cursor['created_at'], cursor['id']) if cursor else None, limit=REGISTRATIONS_PAGE_SIZE + 1,
+        fields=REGISTRATION_PAGE_FIELDS,
+    )
+    has_next = len(rows) > REGISTRATIONS_PAGE_SIZE
+    rows = rows[:REGISTRATIONS_PAGE_SIZE]
+    if has_next and len(browse['cursors']) == page + 1:
+        last_id, last = rows[-1]
+        # A map, not a pair: persisted user_data must not hold nested arrays (Firestore)
+        browse['cursors'].append({'created_at': last['created_at'], 'id': last_id})
+    return build_registrations_page(rows, spec['title'], page, page > 0, has_next)
+
+async def start_registrations_browse(update: Update, context: ContextTypes.DEFAULT_TYPE, spec):
+    """Show the first page of a registrations query"""
+    browse = {'spec': spec, 'cursors': [None], 'page': 0}
+    context.user_data['registrations'] = browse
+    try:
+        text, keyboard = await fetch_registrations_page(browse)
+    except Exception as e:
+        logger.error(f"Error getting registrations: {e}")
+        await update.message.reply_text(f'{EMOJI["error"]} Arizalarni olishda xatolik yuz berdi.')
+        return
+    await update.message.reply_text(text, parse_mode='HTML', reply_markup=keyboard)
+
+async def registrations_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/registrations [course]"""
+    if not is_admin(update.effective_user.id):
+        return
+
+    if not context.args:
+        await start_registrations_browse(update, context, {'title': "Barcha arizalar"})
+        return
+
+    course = course_catalog.find(' '.join(context.args))
+    if course is None:
+        await update.message.reply_text(f'{EMOJI["error"]} Kurs topilmadi!\n{REGISTRATIONS_USAGE}', parse_mode='HTML')
+        return
+    await start_registrations_browse(update, context, {
+        'title': f"Kurs: {course.get('name', '')}", 'field': 'course_id', 'value': course['id'],
+    })
+
+async def registrations_user_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/registrations_user <tg_id>"""
+    if not is_admin(update.effective_user.id):
+        return
+
+    if len(context.args) != 1 or not context.args[0].isdigit():
+        await update.message.reply_text(REGISTRATIONS_USAGE, parse_mode='HTML')
+        return
+    tg_id = int(context.args[0])
+    await start_registrations_browse(update, context, {'title': f"ID: {tg_id}", 'field': 'tg_id', 'value': tg_id})
+
+async def registrations_phone_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/registrations_phone <phone>"""
+    if not is_admin(update.effective_user.id):
+        return
+
+    phone = ' '.join(context.args)
+    if not is_valid_phone(phone):
+        await update.message.reply_text(REGISTRATIONS_USAGE, parse_mode='HTML')
+        return
+    phone = format_phone(phone)
+    await start_registrations_browse(update, context, {'title': f"Telefon: {phone}", 'field': 'phone', 'value': phone})
+
+async def registrations_range_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/registrations_range <from> [to]"""
+    if not is_admin(update.effective_user.id):
+        return
+
+    try:
+        if not 1 <= len(context.args) <= 2:
+            raise ValueError
+        since = parse_date(context.args[0])
+        last_day = parse_date(context.args[-1])
+    except ValueError:
+        await update.message.reply_text(REGISTRATIONS_USAGE, parse_mode='HTML')
+        return
+    await start_registrations_browse(update, context, {
+        'title': f"{since:%d.%m.%Y} — {last_day:%d.%m.%Y}",
+        'since': since, 'until': last_day + timedelta(days=1),
+    })
+
+async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/export: send all registrations as CSV (runs in the background)"""
+    if not is_admin(update.effective_user.id):
+        return
+
+    if not registration_exporter.start(bulk_bot, update.effective_chat.id):
+        await update.message.reply_text(f'{EMOJI["warning"]} Eksport allaqachon bajarilmoqda.')
+        return
+    await update.message.reply_text(f'{EMOJI["time"]} Eksport boshlandi, tayyor bo\'lgach fayl yuboriladi.')
+
+async def registrations_page_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Next/previous registrations page"""
+    query = update.callback_query
+    await query.answer()
+    if not is_admin(update.effective_user.id):
+        return
+
+    browse = context.user_data.get('registrations')
+    if browse is None:
+        await query.edit_message_text(f'{EMOJI["error"]} Sahifa eskirgan, buyruqni qaytadan yuboring.')
+        return
+
+    if query.data == 'regs:next' and browse['page'] + 1 < len(browse['cursors']):
+        browse['page'] += 1
+    elif query.data == 'regs:prev' and browse['page'] > 0:
+        browse['page'] -= 1
+    else:
+        return
+
+    try:
+        text, keyboard = await fetch_registrations_page(browse)
+        await query.edit_message_text(text, parse_mode='HTML', reply_markup=keyboard)
+    except Exception as e:
+        logger.error(f"Error getting registrations: {e}")
+        await query.edit_message_text(f'{EMOJI["error"]} Arizalarni olishda xatolik yuz berdi.')
+
 # Course management functions (existing functions remain the same)
 async def add_course_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Start adding course"""
     if not is_admin(update.effective_user.id):
         return
 
-    text = f"""
-{EMOJI['add']} <b>Yangi kurs qo'shish</b>
-
-{EMOJI['course']} <b>Kurs nomini kiriting:</b>
-
-{EMOJI['info']} <i>Masalan: Python dasturlash</i>
-"""
+    text = ADD_COURSE_NAME_TEXT
 
     await update.message.reply_text(
         text,
@@ -638,21 +692,15 @@ async def add_course_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def add_course_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Get course name"""
-    course_name = update.message.text.strip()
-
-    if len(course_name) < 3:
-        await update.message.reply_text(
-            f"{EMOJI['error']} Kurs nomi juda qisqa! Kamida 3 ta harf bo'lishi kerak."
-        )
+    try:
+        course_name = parse_course_name(update.message.text)
+    except ValueError as e:
+        await update.message.reply_text(f"{EMOJI['error']} {e}")
         return ADD_COURSE_NAME
 
     context.user_data['new_course_name'] = course_name
 
-    text = f"""
-{EMOJI['time']} <b>Kurs davomiyligini kiriting (oyda):</b>
-
-{EMOJI['info']} <i>Faqat raqam kiriting. Masalan: 6</i>
-"""
+    text = ADD_COURSE_DURATION_TEXT
 
     await update.message.reply_text(text, parse_mode='HTML')
     return ADD_COURSE_DURATION
@@ -660,25 +708,14 @@ async def add_course_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def add_course_duration(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Get course duration"""
     try:
-        duration = int(update.message.text.strip())
-        if duration < 1 or duration > 24:
-            await update.message.reply_text(
-                f"{EMOJI['error']} Davomiylik 1 dan 24 oygacha bo'lishi kerak!"
-            )
-            return ADD_COURSE_DURATION
-    except ValueError:
-        await update.message.reply_text(
-            f"{EMOJI['error']} Iltimos, faqat raqam kiriting!"
-        )
+        duration = parse_course_duration(update.message.text)
+    except ValueError as e:
+        await update.message.reply_text(f"{EMOJI['error']} {e}")
         return ADD_COURSE_DURATION
 
     context.user_data['new_course_duration'] = duration
 
-    text = f"""
-{EMOJI['money']} <b>Kurs narxini kiriting (so'mda):</b>
-
-{EMOJI['info']} <i>Faqat raqam kiriting. Masalan: 500000</i>
-"""
+    text = ADD_COURSE_PRICE_TEXT
 
     await update.message.reply_text(text, parse_mode='HTML')
     return ADD_COURSE_PRICE
@@ -686,48 +723,35 @@ async def add_course_duration(update: Update, context: ContextTypes.DEFAULT_TYPE
 async def add_course_price(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Get course price"""
     try:
-        price = int(update.message.text.strip())
-        if price < 0:
-            await update.message.reply_text(
-                f"{EMOJI['error']} Narx manfiy bo'lishi mumkin emas!"
-            )
-            return ADD_COURSE_PRICE
-    except ValueError:
-        await update.message.reply_text(
-            f"{EMOJI['error']} Iltimos, faqat raqam kiriting!"
-        )
+        price = parse_course_price(update.message.text)
+    except ValueError as e:
+        await update.message.reply_text(f"{EMOJI['error']} {e}")
         return ADD_COURSE_PRICE
 
     context.user_data['new_course_price'] = price
 
-    text = f"""
-{EMOJI['info']} <b>Kurs tavsifini kiriting:</b>
-
-{EMOJI['info']} <i>Kurs haqida qisqacha ma'lumot yozing yoki "yo'q" deb yozing</i>
-"""
+    text = ADD_COURSE_DESC_TEXT
 
     await update.message.reply_text(text, parse_mode='HTML')
     return ADD_COURSE_DESC
 
 async def add_course_desc(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Get course description and save"""
-    description = update.message.text.strip()
-
-    if description.lower() == "yo'q":
-        description = ""
+    description = parse_course_description(update.message.text)
 
     try:
         course_data = {
             'name': context.user_data['new_course_name'],
+            'key': course_key(context.user_data['new_course_name']),
             'duration_weeks': context.user_data['new_course_duration'],
             'price': context.user_data['new_course_price'],
             'description': description,
-            'created_at': firestore.SERVER_TIMESTAMP,
             'created_by': update.effective_user.id
         }
 
-        doc_ref = db.collection('courses').add(course_data)
-        logger.info(f"New course added: {doc_ref}")
+        course_id = await courses_repo.add(course_data)
+        course_catalog.put(dict(course_data, id=course_id))
+        logger.info(f"New course added: {course_id}")
 
         success_text = f"""
 {EMOJI['success']} <b>Kurs muvaffaqiyatli qo'shildi!</b>
@@ -762,38 +786,18 @@ async def edit_course_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     try:
-        courses_ref = db.collection('courses')
-        courses_docs = courses_ref.stream()
-        courses = []
-
-        for doc in courses_docs:
-            course_data = doc.to_dict()
-            course_data['id'] = doc.id
-            courses.append(course_data)
-
-        if not courses:
+        if not len(course_catalog):
             await update.message.reply_text(
                 f'{EMOJI["error"]} Hech qanday kurs mavjud emas.',
                 reply_markup=create_admin_keyboard()
             )
             return ConversationHandler.END
 
-        buttons = []
-        for course in courses:
-            course_name = course.get('name', 'Noma\'lum kurs')
-            buttons.append([InlineKeyboardButton(course_name, callback_data=f"edit_{course['id']}")])
-
-        buttons.append([InlineKeyboardButton(f"{EMOJI['cancel']} Bekor qilish", callback_data='cancel_edit')])
-
-        text = f"""
-{EMOJI['edit']} <b>Qaysi kursni tahrirlash kerak?</b>
-
-{EMOJI['info']} <i>Tahrirlash kerak bo'lgan kursni tanlang:</i>
-"""
+        text = EDIT_COURSE_SELECT_TEXT
 
         await update.message.reply_text(
             text,
-            reply_markup=InlineKeyboardMarkup(buttons),
+            reply_markup=course_render.keyboard('edit'),
             parse_mode='HTML'
         )
         return EDIT_COURSE_SELECT
@@ -826,12 +830,11 @@ async def edit_course_select(update: Update, context: ContextTypes.DEFAULT_TYPE)
     context.user_data['edit_course_id'] = course_id
 
     try:
-        course_doc = db.collection('courses').document(course_id).get()
-        if not course_doc.exists:
+        course_data = course_catalog.get(course_id)
+        if course_data is None:
             await query.edit_message_text(f'{EMOJI["error"]} Kurs topilmadi!')
             return ConversationHandler.END
 
-        course_data = course_doc.to_dict()
         context.user_data['edit_course_data'] = course_data
 
         buttons = [
@@ -908,47 +911,20 @@ async def edit_course_value(update: Update, context: ContextTypes.DEFAULT_TYPE):
     course_id = context.user_data.get('edit_course_id')
 
     # Validate input
-    if field == 'duration_weeks':
-        try:
-            new_value = int(new_value)
-            if new_value < 1 or new_value > 24:
-                await update.message.reply_text(
-                    f"{EMOJI['error']} Davomiylik 1 dan 24 oygacha bo'lishi kerak!"
-                )
-                return EDIT_COURSE_VALUE
-        except ValueError:
-            await update.message.reply_text(
-                f"{EMOJI['error']} Iltimos, faqat raqam kiriting!"
-            )
-            return EDIT_COURSE_VALUE
-
-    elif field == 'price':
-        try:
-            new_value = int(new_value)
-            if new_value < 0:
-                await update.message.reply_text(
-                    f"{EMOJI['error']} Narx manfiy bo'lishi mumkin emas!"
-                )
-                return EDIT_COURSE_VALUE
-        except ValueError:
-            await update.message.reply_text(
-                f"{EMOJI['error']} Iltimos, faqat raqam kiriting!"
-            )
-            return EDIT_COURSE_VALUE
-
-    elif field == 'name' and len(new_value) < 3:
-        await update.message.reply_text(
-            f"{EMOJI['error']} Kurs nomi juda qisqa! Kamida 3 ta harf bo'lishi kerak."
-        )
+    parser = COURSE_FIELD_PARSERS.get(field)
+    try:
+        if parser is not None:
+            new_value = parser(new_value)
+    except ValueError as e:
+        await update.message.reply_text(f"{EMOJI['error']} {e}")
         return EDIT_COURSE_VALUE
 
     try:
-        course_ref = db.collection('courses').document(course_id)
-        course_ref.update({
+        await courses_repo.update(course_id, {
             field: new_value,
-            'updated_at': firestore.SERVER_TIMESTAMP,
             'updated_by': update.effective_user.id
         })
+        course_catalog.update(course_id, {field: new_value})
 
         success_text = f"""
 {EMOJI['success']} <b>Kurs muvaffaqiyatli yangilandi!</b>
@@ -981,38 +957,18 @@ async def delete_course_start(update: Update, context: ContextTypes.DEFAULT_TYPE
         return
 
     try:
-        courses_ref = db.collection('courses')
-        courses_docs = courses_ref.stream()
-        courses = []
-
-        for doc in courses_docs:
-            course_data = doc.to_dict()
-            course_data['id'] = doc.id
-            courses.append(course_data)
-
-        if not courses:
+        if not len(course_catalog):
             await update.message.reply_text(
                 f'{EMOJI["error"]} Hech qanday kurs mavjud emas.',
                 reply_markup=create_admin_keyboard()
             )
             return ConversationHandler.END
 
-        buttons = []
-        for course in courses:
-            course_name = course.get('name', 'Noma\'lum kurs')
-            buttons.append([InlineKeyboardButton(f"{EMOJI['delete']} {course_name}", callback_data=f"delete_{course['id']}")])
-
-        buttons.append([InlineKeyboardButton(f"{EMOJI['cancel']} Bekor qilish", callback_data='cancel_delete')])
-
-        text = f"""
-{EMOJI['delete']} <b>Qaysi kursni o'chirish kerak?</b>
-
-{EMOJI['error']} <b>Diqqat!</b> <i>O'chirilgan kursni tiklash mumkin emas!</i>
-"""
+        text = DELETE_COURSE_SELECT_TEXT
 
         await update.message.reply_text(
             text,
-            reply_markup=InlineKeyboardMarkup(buttons),
+            reply_markup=course_render.keyboard('delete'),
             parse_mode='HTML'
         )
         return DELETE_COURSE_SELECT
@@ -1044,15 +1000,15 @@ async def delete_course_select(update: Update, context: ContextTypes.DEFAULT_TYP
     course_id = query.data.replace('delete_', '')
 
     try:
-        course_doc = db.collection('courses').document(course_id).get()
-        if not course_doc.exists:
+        course_data = course_catalog.get(course_id)
+        if course_data is None:
             await query.edit_message_text(f'{EMOJI["error"]} Kurs topilmadi!')
             return ConversationHandler.END
 
-        course_data = course_doc.to_dict()
         course_name = course_data.get('name', 'Noma\'lum kurs')
 
-        db.collection('courses').document(course_id).delete()
+        await courses_repo.delete(course_id)
+        course_catalog.remove(course_id)
 
         success_text = f"""
 {EMOJI['success']} <b>Kurs muvaffaqiyatli o'chirildi!</b>
@@ -1079,121 +1035,102 @@ async def delete_course_select(update: Update, context: ContextTypes.DEFAULT_TYP
 
 # Broadcast functions
 async def broadcast_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Start broadcasting"""
+    """Start broadcasting: choose the audience"""
     if not is_admin(update.effective_user.id):
         return
 
-    text = f"""
-{EMOJI['broadcast']} <b>Barcha foydalanuvchilarga e'lon yuborish</b>
+    await update.message.reply_text(
+        BROADCAST_AUDIENCE_TEXT,
+        parse_mode='HTML',
+        reply_markup=course_render.audience_keyboard()
+    )
+    return BROADCAST_AUDIENCE
+
+def parse_audience(data):
+    """Callback data -> (audience, label), or None for an unknown course"""
+    key = data[len('aud:'):]
+    if key.startswith('course:'):
+        course = course_catalog.get(key[len('course:'):])
+        if course is None:
+            return None
+        return {'course_id': course['id']}, course_audience_label(course.get('name', ''))
+    if key == 'sub':
+        return {'subscribed': True}, AUDIENCE_LABELS[key]
+    if key.startswith('days:'):
+        return {'active_since_day': current_day() - int(key[len('days:'):]) + 1}, AUDIENCE_LABELS[key]
+    return {}, AUDIENCE_LABELS['all']
+
+async def broadcast_audience(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Remember the chosen audience and ask for the message"""
+    query = update.callback_query
+    await query.answer()
 
-{EMOJI['announce']} <b>E'lon matnini yozing:</b>
+    if query.data == 'cancel_broadcast':
+        await query.edit_message_text(f'{EMOJI["cancel"]} E\'lon yuborish bekor qilindi.')
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id,
+            text=f'{EMOJI["info"]} Admin paneliga qaytdingiz.',
+            reply_markup=create_admin_keyboard()
+        )
+        return ConversationHandler.END
 
-{EMOJI['info']} <i>Matn, rasm, video va boshqa formatlarni yuborish mumkin.
-HTML formatini ishlatish mumkin: <b>qalin</b>, <i>qiya</i></i>
-"""
+    parsed = parse_audience(query.data)
+    if parsed is None:
+        await query.edit_message_text(f'{EMOJI["error"]} Kurs topilmadi!')
+        return ConversationHandler.END
 
-    await update.message.reply_text(
-        text,
+    audience, label = parsed
+    context.user_data['broadcast_audience'] = {'audience': audience, 'label': label}
+    await query.edit_message_text(f'{EMOJI["name"]} Auditoriya: {label}')
+    await query.message.reply_text(
+        BROADCAST_START_TEXT,
         parse_mode='HTML',
         reply_markup=ReplyKeyboardRemove()
     )
     return BROADCAST_MESSAGE
 
 async def broadcast_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Send broadcast to all users"""
+    """Start background broadcast to the chosen audience"""
     try:
-        users_ref = db.collection('users')
-        users_docs = users_ref.stream()
-        users = []
+        payload = payload_from_message(update.message)
+        if payload is None:
+            await update.message.reply_text(
+                f'{EMOJI["error"]} Bu turdagi xabarni yuborib bo\'lmaydi. Matn, rasm, video yoki fayl yuboring.'
+            )
+            return BROADCAST_MESSAGE
 
-        for doc in users_docs:
-            user_data = doc.to_dict()
-            users.append(user_data['user_id'])
+        chosen = context.user_data.pop('broadcast_audience', None) or {'audience': {}, 'label': AUDIENCE_LABELS['all']}
+        total = await users_repo.count_audience(chosen['audience'])
 
-        if not users:
+        if not total:
             await update.message.reply_text(
                 f'{EMOJI["error"]} Hech qanday foydalanuvchi topilmadi.',
                 reply_markup=create_admin_keyboard()
             )
             return ConversationHandler.END
 
-        message = update.message
-        sent_count = 0
-        failed_count = 0
-
         status_msg = await update.message.reply_text(
             f'{EMOJI["broadcast"]} E\'lon yuborilmoqda...\n'
-            f'Jami foydalanuvchilar: {len(users)}\n'
+            f'Auditoriya: {chosen["label"]}\n'
+            f'Jami foydalanuvchilar: {total}\n'
             f'Yuborildi: 0\n'
             f'Xatolik: 0'
         )
 
-        for user_id in users:
-            try:
-                if user_id == update.effective_user.id:
-                    continue
-
-                if message.text:
-                    await context.bot.send_message(
-                        chat_id=user_id,
-                        text=f'{EMOJI["announce"]} <b>E\'LON</b>\n\n{message.text}',
-                        parse_mode='HTML'
-                    )
-                elif message.photo:
-                    await context.bot.send_photo(
-                        chat_id=user_id,
-                        photo=message.photo[-1].file_id,
-                        caption=f'{EMOJI["announce"]} <b>E\'LON</b>\n\n{message.caption or ""}',
-                        parse_mode='HTML'
-                    )
-                elif message.video:
-                    await context.bot.send_video(
-                        chat_id=user_id,
-                        video=message.video.file_id,
-                        caption=f'{EMOJI["announce"]} <b>E\'LON</b>\n\n{message.caption or ""}',
-                        parse_mode='HTML'
-                    )
-                elif message.document:
-                    await context.bot.send_document(
-                        chat_id=user_id,
-                        document=message.document.file_id,
-                        caption=f'{EMOJI["announce"]} <b>E\'LON</b>\n\n{message.caption or ""}',
-                        parse_mode='HTML'
-                    )
-
-                sent_count += 1
-
-                if sent_count % 10 == 0:
-                    await status_msg.edit_text(
-                        f'{EMOJI["broadcast"]} E\'lon yuborilmoqda...\n'
-                        f'Jami foydalanuvchilar: {len(users)}\n'
-                        f'Yuborildi: {sent_count}\n'
-                        f'Xatolik: {failed_count}'
-                    )
-
-            except Exception as e:
-                failed_count += 1
-                logger.error(f"Error sending to user {user_id}: {e}")
-
-        # Calculate success percentage safely
-        total_attempts = sent_count + failed_count
-        success_percentage = (sent_count / total_attempts * 100) if total_attempts > 0 else 0
-
-        final_text = f"""
-{EMOJI['success']} <b>E'lon yuborish yakunlandi!</b>
-
-{EMOJI['stats']} <b>Hisobot:</b>
-• Jami foydalanuvchilar: {len(users)}
-• Muvaffaqiyatli yuborildi: {sent_count}
-• Xatolik: {failed_count}
-• Muvaffaqiyat foizi: {success_percentage:.1f}%
-"""
-
-        await status_msg.edit_text(final_text, parse_mode='HTML')
+        job_id = await broadcast_engine.start(
+            bulk_bot,
+            admin_chat_id=update.effective_chat.id,
+            status_message_id=status_msg.message_id,
+            payload=payload,
+            exclude_user_id=update.effective_user.id,
+            total=total,
+            audience=chosen['audience'],
+        )
+        logger.info(f"Broadcast {job_id} started")
 
         await context.bot.send_message(
             chat_id=update.effective_chat.id,
-            text=f'{EMOJI["info"]} Admin paneliga qaytdingiz.',
+            text=f'{EMOJI["info"]} E\'lon fonda yuborilmoqda. Admin paneliga qaytdingiz.',
             reply_markup=create_admin_keyboard()
         )
 
@@ -1218,17 +1155,7 @@ async def list_courses(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
 
     try:
-        logger.info("Getting courses list...")
-        courses_ref = db.collection('courses')
-        courses_docs = courses_ref.stream()
-        courses = []
-
-        for doc in courses_docs:
-            course_data = doc.to_dict()
-            courses.append(course_data)
-            logger.info(f"Course: {course_data.get('name', 'Unknown')}")
-
-        if not courses:
+        if not len(course_catalog):
             logger.warning("No courses found")
             await update.message.reply_text(
                 f'{EMOJI["error"]} Hozircha kurslar mavjud emas.\n'
@@ -1237,18 +1164,7 @@ async def list_courses(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             return
 
-        msg = f'{EMOJI["courses"]} <b>Bizning kurslarimiz:</b>\n\n'
-
-        for i, course in enumerate(courses, 1):
-            msg += f'<b>{i}. {course.get("name", "Noma\'lum")}</b>\n'
-            msg += f'{EMOJI["time"]} Davomiyligi: {course.get("duration_weeks", "N/A")} oy\n'
-            msg += f'{EMOJI["money"]} Narxi: {course.get("price", "N/A"):,} so\'m\n'
-
-            if course.get('description'):
-                msg += f'{EMOJI["info"]} {course["description"]}\n'
-            msg += '\n'
-
-        msg += f'{EMOJI["register"]} <i>Ro\'yxatdan o\'tish uchun tegishli tugmani bosing!</i>'
+        msg = course_render.list_text()
 
         await update.message.reply_text(msg, parse_mode='HTML', reply_markup=create_main_keyboard())
 
@@ -1261,6 +1177,23 @@ async def list_courses(update: Update, context: ContextTypes.DEFAULT_TYPE):
             reply_markup=create_main_keyboard()
         )
 
+async def inline_search(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Inline mode: "@bot pyth" searches courses in memory, paged by offset"""
+    query = update.inline_query
+    offset = int(query.offset) if query.offset.isdigit() else 0
+
+    try:
+        courses = course_catalog.search(query.query)
+        results = course_render.inline_results(context.bot.username)
+        page = [results[course['id']] for course in courses[offset:offset + INLINE_PAGE_SIZE]
+                if course['id'] in results]
+        next_offset = str(offset + INLINE_PAGE_SIZE) if offset + INLINE_PAGE_SIZE < len(courses) else ''
+
+        # Same results for every user, so Telegram may serve them from its cache
+        await query.answer(page, cache_time=INLINE_CACHE_TIME, is_personal=False, next_offset=next_offset)
+    except Exception as e:
+        logger.error(f"Inline search error: {e}")
+
 async def contact_info(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     
@@ -1270,17 +1203,7 @@ async def contact_info(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await subscription_required_message(update, context)
             return
 
-    contact_text = f"""
-{EMOJI['contact']} <b>Bog'lanish ma'lumotlari:</b>
-
-{EMOJI['phone']} <b>Telefon:</b> +998 99 448-46-24
-{EMOJI['location']} <b>Manzil:</b> Muzrabot tuman, Xalqabot IT Center
-{EMOJI['time']} <b>Ish vaqti:</b> 9:00 - 18:00
-
-{EMOJI['info']} <b>Admin:</b> @ITCenter_01
-
-{EMOJI['courses']} <i>Barcha savollaringiz bo'yicha murojaat qilishingiz mumkin!</i>
-"""
+    contact_text = CONTACT_TEXT
     await update.message.reply_text(contact_text, parse_mode='HTML', reply_markup=create_main_keyboard())
 
 async def about_info(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -1292,24 +1215,7 @@ async def about_info(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await subscription_required_message(update, context)
             return
 
-    about_text = f"""
-{EMOJI['info']} <b>IT Center haqida:</b>
-
-{EMOJI['course']} Biz zamonaviy IT ta'lim markazi bo'lib, professional dasturchilar tayyorlaymiz.
-
-<b>Bizning afzalliklarimiz:</b>
-• Tajribali o'qituvchilar
-• Amaliy loyihalar
-• Ish bilan ta'minlash
-• Sertifikat berish
-• Kichik guruhlar
-
-{EMOJI['success']} <b>1000+</b> muvaffaqiyatli bitiruvchi
-{EMOJI['time']} <b>5 yil</b> tajriba
-{EMOJI['course']} <b>10+</b> turli kurslar
-
-{EMOJI['register']} Bugunoq ro'yxatdan o'ting va IT sohasida o'z karerangizni boshlang!
-"""
+    about_text = ABOUT_TEXT
     await update.message.reply_text(about_text, parse_mode='HTML', reply_markup=create_main_keyboard())
 
 async def back_to_main(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -1317,11 +1223,7 @@ async def back_to_main(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     user_name = user.first_name or "Foydalanuvchi"
 
-    welcome_text = f"""
-{EMOJI['welcome']} <b>Asosiy menuga qaytdingiz, {user_name}!</b>
-
-{EMOJI['info']} Kerakli bo'limni tanlang:
-"""
+    welcome_text = BACK_TO_MAIN_TEMPLATE.format(user_name=user_name)
 
     if is_admin(user.id):
         await update.message.reply_text(
@@ -1343,17 +1245,106 @@ async def admin_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
     return ConversationHandler.END
 
-def main():
-    """Main function"""
-    if not BOT_TOKEN or ADMIN_CHAT_ID == 0:
-        logger.error('BOT_TOKEN or ADMIN_CHAT_ID not found in .env!')
-        raise RuntimeError('BOT_TOKEN or ADMIN_CHAT_ID not found in .env!')
-
-    app = ApplicationBuilder().token(BOT_TOKEN).build()
+async def load_catalog(retry_delay=5):
+    """Load the course catalog and start its listener, retrying until storage is reachable"""
+    while True:
+        try:
+            await course_catalog.load()
+            await run_blocking(course_catalog.start_listener)
+            return
+        except Exception as e:
+            logger.error(f"Course catalog not loaded, retrying in {retry_delay}s: {e!r}")
+            await asyncio.sleep(retry_delay)
+            retry_delay = min(retry_delay * 2, 300)
+
+async def load_storage_state():
+    """Load the course catalog, then resume interrupted broadcasts"""
+    await load_catalog()
+    if runs_broadcasts:
+        try:
+            await broadcast_engine.resume_pending(bulk_bot)
+        except Exception as e:
+            logger.error(f"Error resuming broadcasts: {e}")
+
+async def post_init(application):
+    """Warm up caches before the bot starts serving updates"""
+    await bulk_bot.initialize()
+    interaction_buffer.start()
+    admin_notifier.start(bulk_bot)
+
+    # First storage use. A slow or unreachable Firestore must not keep the
+    # bot from starting, the catalog and broadcasts keep loading in the background.
+    global storage_loader
+    storage_loader = asyncio.create_task(load_storage_state(), name='storage-loader')
+    try:
+        await asyncio.wait_for(asyncio.shield(storage_loader), FIRESTORE_STARTUP_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning("Storage is slow, serving while the catalog and broadcasts load")
+
+    global metrics_server
+    if metrics_port:
+        metrics_server = WebServer(WEBHOOK_LISTEN, metrics_port)
+        metrics_server.route('GET', '/metrics', metrics_handler())
+        metrics_server.route('GET', '/health', health_handler(application))
+        await metrics_server.start()
+
+async def post_stop(application):
+    """Checkpoint background jobs and flush buffered writes"""
+    if storage_loader is not None:
+        storage_loader.cancel()
+    await broadcast_engine.stop()
+    await registration_exporter.stop()
+    await admin_notifier.stop()
+    await interaction_buffer.stop()
+
+async def post_shutdown(application):
+    """Release resources after the bot stops"""
+    if metrics_server is not None:
+        await metrics_server.stop()
+    course_catalog.stop_listener()
+    await bulk_bot.shutdown()
+    shutdown_executor()
+    storage.close()
+
+def build_application(request=None):
+    """Build the application and register all handlers"""
+    builder = (
+        ApplicationBuilder()
+        .token(BOT_TOKEN)
+        .concurrent_updates(PerUserUpdateProcessor(CONCURRENT_UPDATES))
+        .post_init(post_init)
+        .post_stop(post_stop)
+        .post_shutdown(post_shutdown)
+    )
+    if request is not None:
+        # Custom transport, e.g. the offline stub used by bench_load.py
+        interactive_request = bulk_request = updates_request = request
+    else:
+        # Bot API latency metrics, and a connection pool per lane
+        interactive_request = MetricsRequest(connection_pool_size=INTERACTIVE_POOL_SIZE)
+        bulk_request = MetricsRequest(connection_pool_size=BULK_POOL_SIZE)
+        updates_request = MetricsRequest()
+    # Replies go first; bulk sends use a second Bot on its own lane
+    builder = builder.request(send_lanes.interactive(interactive_request)).get_updates_request(updates_request)
+    global bulk_bot
+    bulk_bot = Bot(BOT_TOKEN, request=send_lanes.bulk(bulk_request))
+
+    # Conversation state survives restarts; it is read once, see persistence.py
+    persistence = create_persistence(db)
+    if persistence is not None:
+        builder = builder.persistence(persistence)
+    persistent = persistence is not None
+
+    app = builder.build()
+
+    # Menu buttons are matched by exact label with one dict lookup
+    router = ButtonRouter()
 
     # Registration conversation handler
     reg_conv = ConversationHandler(
-        entry_points=[MessageHandler(filters.Regex(f'{EMOJI["register"]} Ro\'yxatdan o\'tish'), reg_entry)],
+        name='reg_conv',
+        persistent=persistent,
+        entry_points=[router.entry_point(BTN_REGISTER, reg_entry)],
         states={
             FULLNAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, reg_fullname)],
             AGE: [MessageHandler(filters.TEXT & ~filters.COMMAND, reg_age)],
@@ -1369,7 +1360,9 @@ def main():
 
     # Admin conversation handlers
     add_course_conv = ConversationHandler(
-        entry_points=[MessageHandler(filters.Regex(f'{EMOJI["add"]} Kurs qo\'shish'), add_course_start)],
+        name='add_course_conv',
+        persistent=persistent,
+        entry_points=[router.entry_point(BTN_ADD_COURSE, add_course_start)],
         states={
             ADD_COURSE_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, add_course_name)],
             ADD_COURSE_DURATION: [MessageHandler(filters.TEXT & ~filters.COMMAND, add_course_duration)],
@@ -1381,7 +1374,9 @@ def main():
     )
 
     edit_course_conv = ConversationHandler(
-        entry_points=[MessageHandler(filters.Regex(f'{EMOJI["edit"]} Kurs tahrirlash'), edit_course_start)],
+        name='edit_course_conv',
+        persistent=persistent,
+        entry_points=[router.entry_point(BTN_EDIT_COURSE, edit_course_start)],
         states={
             EDIT_COURSE_SELECT: [CallbackQueryHandler(edit_course_select)],
             EDIT_COURSE_FIELD: [CallbackQueryHandler(edit_course_field)],
@@ -1392,7 +1387,9 @@ def main():
     )
 
     delete_course_conv = ConversationHandler(
-        entry_points=[MessageHandler(filters.Regex(f'{EMOJI["delete"]} Kurs o\'chirish'), delete_course_start)],
+        name='delete_course_conv',
+        persistent=persistent,
+        entry_points=[router.entry_point(BTN_DELETE_COURSE, delete_course_start)],
         states={
             DELETE_COURSE_SELECT: [CallbackQueryHandler(delete_course_select)],
         },
@@ -1401,35 +1398,134 @@ def main():
     )
 
     broadcast_conv = ConversationHandler(
-        entry_points=[MessageHandler(filters.Regex(f'{EMOJI["broadcast"]} E\'lon yuborish'), broadcast_start)],
+        name='broadcast_conv',
+        persistent=persistent,
+        entry_points=[router.entry_point(BTN_BROADCAST, broadcast_start)],
         states={
+            BROADCAST_AUDIENCE: [CallbackQueryHandler(broadcast_audience, pattern=r'^(aud:|cancel_broadcast$)')],
             BROADCAST_MESSAGE: [MessageHandler(filters.ALL & ~filters.COMMAND, broadcast_message)],
         },
         fallbacks=[CommandHandler('cancel', admin_cancel)],
         allow_reentry=True,
     )
 
+    # Every update counts as activity for broadcast audiences; a group runs
+    # only its first matching handler, so this one has its own group
+    app.add_handler(TypeHandler(Update, interaction_buffer.record), group=-2)
+    # Excess updates from one user or chat are dropped before any handler
+    app.add_handler(TypeHandler(Update, flood_control.check), group=-1)
+
     # Add handlers
     app.add_handler(CommandHandler('start', start))
     app.add_handler(CallbackQueryHandler(check_subscription_callback, pattern='check_subscription'))
+    app.add_handler(CallbackQueryHandler(registrations_page_callback, pattern=r'^regs:(next|prev)$'))
+    # Bot must be a channel admin to receive these updates
+    app.add_handler(ChatMemberHandler(channel_member_update, ChatMemberHandler.CHAT_MEMBER))
     app.add_handler(reg_conv)
     app.add_handler(add_course_conv)
     app.add_handler(edit_course_conv)
     app.add_handler(delete_course_conv)
     app.add_handler(broadcast_conv)
 
+    # Admin commands
+    app.add_handler(CommandHandler('registrations', registrations_command))
+    app.add_handler(CommandHandler('registrations_user', registrations_user_command))
+    app.add_handler(CommandHandler('registrations_phone', registrations_phone_command))
+    app.add_handler(CommandHandler('registrations_range', registrations_range_command))
+    app.add_handler(CommandHandler('export', export_command))
+    app.add_handler(InlineQueryHandler(inline_search))
+
     # Admin buttons
-    app.add_handler(MessageHandler(filters.Regex(f'{EMOJI["stats"]} Statistika'), admin_stats))
-    app.add_handler(MessageHandler(filters.Regex(f'{EMOJI["back"]} Asosiy menu'), back_to_main))
+    router.add(BTN_STATS, admin_stats)
+    router.add(BTN_BACK, back_to_main)
 
     # Regular user buttons
-    app.add_handler(MessageHandler(filters.Regex(f'{EMOJI["courses"]} Kurslar ro\'yxati'), list_courses))
-    app.add_handler(MessageHandler(filters.Regex(f'{EMOJI["contact"]} Bog\'lanish'), contact_info))
-    app.add_handler(MessageHandler(filters.Regex(f'{EMOJI["info"]} Ma\'lumot'), about_info))
+    router.add(BTN_COURSES, list_courses)
+    router.add(BTN_CONTACT, contact_info)
+    router.add(BTN_ABOUT, about_info)
+    app.add_handler(router.handler())
     app.add_handler(MessageHandler(filters.COMMAND, start))  # fallback
 
+    instrument_application(app)
+    return app
+
+def build_front_application(pool):
+    """Application of the front process: receives updates and queues them for the workers"""
+    app = (
+        ApplicationBuilder()
+        .token(BOT_TOKEN)
+        .request(MetricsRequest())
+        .get_updates_request(MetricsRequest())
+        .build()
+    )
+    # Sequential, so each worker queue gets a user's updates in order
+    app.add_handler(TypeHandler(Update, pool.dispatch))
+    instrument_application(app)
+    return app
+
+def run_worker(index, workers, queue, ready, request=None):
+    """Worker process (WORKERS > 1): process the updates of one shard of users"""
+    global send_lanes, runs_broadcasts, metrics_port
+    # Telegram's message limit is per bot, each worker gets its share
+    send_lanes = SendLanes(rate=SEND_RATE / workers)
+    # Broadcasts are started by the admin, so they run on the admin's worker
+    runs_broadcasts = shard_of(ADMIN_CHAT_ID, workers) == index
+    metrics_port = METRICS_PORT + 1 + index if METRICS_PORT else 0
+
+    asyncio.run(serve_queue(build_application(request=request), queue, ready))
+
+def main():
+    """Main function"""
+    if not BOT_TOKEN or ADMIN_CHAT_ID == 0:
+        logger.error('BOT_TOKEN or ADMIN_CHAT_ID not found in .env!')
+        raise RuntimeError('BOT_TOKEN or ADMIN_CHAT_ID not found in .env!')
+
+    if 'firestore' in (STORAGE, PERSISTENCE):
+        # Firestore itself is connected lazily, but a missing key file is a config error
+        if not os.path.exists(credentials_path()):
+            raise FileNotFoundError(f"Firebase credential file not found: {credentials_path()}")
+        if WORKERS <= 1:
+            # Overlap the Firestore library import with Application setup and getMe
+            db.warm_up()
+
+    if BOT_MODE == 'webhook' and not WEBHOOK_URL:
+        raise RuntimeError('WEBHOOK_URL is required in webhook mode!')
+    if BOT_MODE == 'webhook' and not WEBHOOK_SECRET:
+        # The endpoint listens on a public address, unsigned updates must be rejected
+        raise RuntimeError('WEBHOOK_SECRET is required in webhook mode!')
+
+    if WORKERS > 1 and STORAGE == 'sqlite':
+        # Workers cache the catalog and SQLite can't tell them about course edits
+        raise RuntimeError('WORKERS > 1 requires STORAGE=firestore!')
+
+    pool = None
+    if WORKERS > 1:
+        # This process only receives updates, the workers handle them
+        pool = WorkerPool(run_worker, WORKERS)
+        pool.start()
+        app = build_front_application(pool)
+    else:
+        app = build_application()
+
     logger.info(f"{EMOJI['success']} Bot started successfully!")
-    app.run_polling(drop_pending_updates=True)
+    try:
+        if BOT_MODE == 'webhook':
+            server = WebServer(WEBHOOK_LISTEN, WEBHOOK_PORT)
+            server.route('POST', WEBHOOK_PATH, webhook_handler(app, WEBHOOK_SECRET))
+            server.route('GET', '/health', health_handler(app))
+            server.route('GET', '/metrics', metrics_handler())
+            asyncio.run(run_webhook(
+                app, server,
+                webhook_url=WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH,
+                secret_token=WEBHOOK_SECRET,
+                allowed_updates=Update.ALL_TYPES,
+            ))
+        else:
+            # Updates queued while the bot was down are processed, not dropped
+            app.run_polling(drop_pending_updates=False, allowed_updates=Update.ALL_TYPES)
+    finally:
+        if pool is not None:
+            pool.stop()
 
 if __name__ == '__main__':
     main()
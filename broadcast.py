@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Background broadcast engine.
+
+Broadcasts run as background jobs: sends go out concurrently under a global
+token bucket, RetryAfter pauses the whole job, and progress is checkpointed to
+the `broadcasts` collection after every page of users so a restarted bot
+resumes where it stopped. Recipients who blocked the bot or no longer exist
+are marked inactive and left out of later broadcasts.
+"""
+
+import os
+import time
+import asyncio
+import logging
+
+from telegram.error import RetryAfter, BadRequest, Forbidden
+
+from ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Upper bound for one broadcast; the global budget (lanes.SEND_RATE) is shared with replies
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "25"))
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "20"))
+BROADCAST_PAGE_SIZE = int(os.getenv("BROADCAST_PAGE_SIZE", "500"))
+BROADCAST_PROGRESS_INTERVAL = float(os.getenv("BROADCAST_PROGRESS_INTERVAL", "5"))
+BROADCAST_MAX_RETRIES = 3
+
+ANNOUNCE_PREFIX = '📣 <b>E\'LON</b>\n\n'
+
+
+def payload_from_message(message):
+    """Extract what has to be re-sent from an admin message, None if unsupported"""
+    if message.text:
+        return {'kind': 'text', 'text': message.text}
+    if message.photo:
+        return {'kind': 'photo', 'file_id': message.photo[-1].file_id, 'caption': message.caption or ''}
+    if message.video:
+        return {'kind': 'video', 'file_id': message.video.file_id, 'caption': message.caption or ''}
+    if message.document:
+        return {'kind': 'document', 'file_id': message.document.file_id, 'caption': message.caption or ''}
+    return None
+
+
+async def send_payload(bot, chat_id, payload):
+    """Send a broadcast payload to one chat"""
+    kind = payload['kind']
+    if kind == 'text':
+        await bot.send_message(chat_id=chat_id, text=ANNOUNCE_PREFIX + payload['text'], parse_mode='HTML')
+        return
+
+    caption = ANNOUNCE_PREFIX + payload.get('caption', '')
+    if kind == 'photo':
+        await bot.send_photo(chat_id=chat_id, photo=payload['file_id'], caption=caption, parse_mode='HTML')
+    elif kind == 'video':
+        await bot.send_video(chat_id=chat_id, video=payload['file_id'], caption=caption, parse_mode='HTML')
+    elif kind == 'document':
+        await bot.send_document(chat_id=chat_id, document=payload['file_id'], caption=caption, parse_mode='HTML')
+
+
+def is_dead_recipient(error):
+    """True if the user blocked the bot or the chat no longer exists"""
+    return isinstance(error, Forbidden) or (
+        isinstance(error, BadRequest) and 'chat not found' in error.message.lower()
+    )
+
+
+def progress_text(job):
+    """Status message text while a broadcast is running"""
+    return (
+        f'📢 E\'lon yuborilmoqda...\n'
+        f'Jami foydalanuvchilar: {job["total"]}\n'
+        f'Yuborildi: {job["sent"]}\n'
+        f'Xatolik: {job["failed"]}'
+    )
+
+
+def report_text(job):
+    """Status message text after a broadcast is finished"""
+    total_attempts = job['sent'] + job['failed']
+    success_percentage = (job['sent'] / total_attempts * 100) if total_attempts > 0 else 0
+    return f"""
+✅ <b>E'lon yuborish yakunlandi!</b>
+
+📊 <b>Hisobot:</b>
+• Jami foydalanuvchilar: {job['total']}
+• Muvaffaqiyatli yuborildi: {job['sent']}
+• Xatolik: {job['failed']}
+• Botni bloklagan: {job.get('inactive', 0)}
+• Muvaffaqiyat foizi: {success_percentage:.1f}%
+"""
+
+
+def failure_text(job):
+    """Status message text after a broadcast stopped on an error"""
+    return f"""
+❌ <b>E'lon yuborish xatolik bilan to'xtadi!</b>
+
+📊 <b>Hisobot:</b>
+• Jami foydalanuvchilar: {job['total']}
+• Yuborildi: {job['sent']}
+• Xatolik: {job['failed']}
+• Botni bloklagan: {job.get('inactive', 0)}
+"""
+
+
+class BroadcastEngine:
+    """Runs and resumes broadcast jobs"""
+
+    def __init__(self, broadcasts_repo, users_repo, rate=BROADCAST_RATE,
+                 concurrency=BROADCAST_CONCURRENCY, page_size=BROADCAST_PAGE_SIZE,
+                 progress_interval=BROADCAST_PROGRESS_INTERVAL):
+        self.broadcasts_repo = broadcasts_repo
+        self.users_repo = users_repo
+        self.bucket = TokenBucket(rate)
+        self.concurrency = concurrency
+        self.page_size = page_size
+        self.progress_interval = progress_interval
+        self._tasks = {}
+
+    async def start(self, bot, admin_chat_id, status_message_id, payload, exclude_user_id=None, total=0,
+                    audience=None):
+        """Create a broadcast job for an audience (see UserRepository) and run it in the background"""
+        job = {
+            'admin_chat_id': admin_chat_id,
+            'status_message_id': status_message_id,
+            'payload': payload,
+            'exclude_user_id': exclude_user_id,
+            'audience': audience or {},
+            'status': 'running',
+            'cursor': None,
+            'total': total,
+            'sent': 0,
+            'failed': 0,
+            'inactive': 0,
+        }
+        job_id = await self.broadcasts_repo.create(job)
+        self._spawn(bot, job_id, job)
+        return job_id
+
+    async def resume_pending(self, bot):
+        """Restart jobs interrupted by a previous shutdown"""
+        for job_id, job in await self.broadcasts_repo.list_running():
+            logger.info(f"Resuming broadcast {job_id} after {job.get('cursor')}")
+            self._spawn(bot, job_id, job)
+
+    async def stop(self):
+        """Cancel running jobs; they resume from the last checkpoint on next start"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _spawn(self, bot, job_id, job):
+        if job_id in self._tasks:
+            return
+        task = asyncio.create_task(self._run(bot, job_id, job), name=f'broadcast:{job_id}')
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    async def _run(self, bot, job_id, job):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        last_progress = time.monotonic()
+        cursor = job.get('cursor')
+
+        try:
+            while True:
+                page = await self.users_repo.page_ids(
+                    after=cursor, limit=self.page_size, audience=job.get('audience'),
+                )
+                if not page:
+                    break
+
+                recipients = [user_id for _, user_id in page if user_id != job.get('exclude_user_id')]
+                results = await asyncio.gather(*(
+                    self._send_one(bot, semaphore, user_id, job['payload'])
+                    for user_id in recipients
+                ))
+                dead = [user_id for user_id, result in zip(recipients, results) if result == 'dead']
+                job['sent'] += results.count('sent')
+                job['failed'] += len(results) - results.count('sent')
+                job['inactive'] = job.get('inactive', 0) + len(dead)
+                cursor = page[-1][0]
+
+                if dead:
+                    await self._mark_inactive(dead)
+                await self.broadcasts_repo.update(job_id, {
+                    'cursor': cursor, 'sent': job['sent'], 'failed': job['failed'], 'inactive': job['inactive'],
+                })
+
+                # Progress updates are throttled by time to respect per-chat limits
+                if time.monotonic() - last_progress >= self.progress_interval:
+                    last_progress = time.monotonic()
+                    await self._edit_status(bot, job, progress_text(job))
+
+            await self.broadcasts_repo.update(job_id, {'status': 'done'})
+            await self._edit_status(bot, job, report_text(job), parse_mode='HTML')
+            logger.info(f"Broadcast {job_id} finished: {job['sent']} sent, {job['failed']} failed")
+
+        except asyncio.CancelledError:
+            logger.info(f"Broadcast {job_id} interrupted at {cursor}")
+            raise
+        except Exception as e:
+            logger.error(f"Broadcast {job_id} error: {e}")
+            await self._edit_status(bot, job, failure_text(job), parse_mode='HTML')
+            try:
+                await self.broadcasts_repo.update(job_id, {'status': 'failed', 'error': str(e)})
+            except Exception as e:
+                # Still 'running': the job resumes from its checkpoint on next start
+                logger.error(f"Error saving broadcast {job_id} status: {e}")
+
+    async def _send_one(self, bot, semaphore, chat_id, payload):
+        """Send to one user; returns 'sent', 'failed' or 'dead'"""
+        async with semaphore:
+            for _ in range(BROADCAST_MAX_RETRIES + 1):
+                await self.bucket.acquire()
+                try:
+                    await send_payload(bot, chat_id, payload)
+                    return 'sent'
+                except RetryAfter as e:
+                    logger.warning(f"Flood control, pausing broadcast for {e.retry_after}s")
+                    self.bucket.pause(e.retry_after)
+                except Exception as e:
+                    if is_dead_recipient(e):
+                        logger.info(f"User {chat_id} unreachable, marking inactive: {e}")
+                        return 'dead'
+                    logger.error(f"Error sending to user {chat_id}: {e}")
+                    return 'failed'
+            return 'failed'
+
+    async def _mark_inactive(self, user_ids):
+        try:
+            await self.users_repo.mark_inactive(user_ids)
+        except Exception as e:
+            # Not fatal: they are retried, and marked again, by the next broadcast
+            logger.error(f"Error marking {len(user_ids)} users inactive: {e}")
+
+    async def _edit_status(self, bot, job, text, parse_mode=None):
+        try:
+            await bot.edit_message_text(
+                chat_id=job['admin_chat_id'],
+                message_id=job['status_message_id'],
+                text=text,
+                parse_mode=parse_mode,
+            )
+        except Exception as e:
+            logger.error(f"Error updating broadcast status: {e}")
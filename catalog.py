@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+In-memory course catalog.
+
+Courses are loaded once at startup and kept fresh by a Firestore snapshot
+listener plus write-through from the admin handlers, so browsing and
+searching courses costs no Firestore reads. The search index follows every
+change of a single course without a rebuild.
+"""
+
+import logging
+import threading
+
+from validation import course_key
+from search import CourseSearchIndex
+
+logger = logging.getLogger(__name__)
+
+
+class CourseCatalog:
+    """Process-wide course cache with O(1) lookup by id"""
+
+    def __init__(self, repo):
+        self.repo = repo
+        self.version = 0
+        self._courses = {}
+        self._sorted = None
+        self._index = CourseSearchIndex()
+        self._lock = threading.Lock()
+        self._watch = None
+
+    async def load(self):
+        """Load all courses from storage"""
+        courses = await self.repo.list()
+        with self._lock:
+            self._courses = {course['id']: course for course in courses}
+            self._index.rebuild(courses)
+            self._changed()
+        logger.info(f"Course catalog loaded: {len(courses)} courses")
+
+    def start_listener(self):
+        """Keep the catalog in sync with Firestore"""
+        if self._watch is None:
+            self._watch = self.repo.watch(self._on_change)
+            logger.info("Course catalog listener started")
+
+    def stop_listener(self):
+        """Stop the Firestore listener"""
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    def _on_change(self, kind, course_id, course_data):
+        if kind == 'REMOVED':
+            self.remove(course_id)
+        else:
+            self.put(course_data)
+
+    def _changed(self):
+        # Caller holds the lock
+        self._sorted = None
+        self.version += 1
+
+    def all(self):
+        """Return all courses ordered by id"""
+        with self._lock:
+            if self._sorted is None:
+                self._sorted = [self._courses[key] for key in sorted(self._courses)]
+            return [dict(course) for course in self._sorted]
+
+    def get(self, course_id):
+        """Return a course or None"""
+        course = self._courses.get(course_id)
+        return dict(course) if course is not None else None
+
+    def find(self, text):
+        """Return a course by id, key or name, or None"""
+        course = self.get(text)
+        if course is not None:
+            return course
+        key = course_key(text)
+        if not key:
+            return None
+        for course in self.all():
+            # A renamed course keeps its import key, so match the current name too
+            if key in (course.get('key'), course_key(course.get('name', ''))):
+                return course
+        return None
+
+    def search(self, text):
+        """Courses matching a search query, best first; all courses by name for an empty query"""
+        with self._lock:
+            return [dict(self._courses[course_id]) for course_id in self._index.search(text)]
+
+    def __len__(self):
+        return len(self._courses)
+
+    def put(self, course_data):
+        """Insert or replace a course"""
+        with self._lock:
+            self._courses[course_data['id']] = dict(course_data)
+            self._index.put(course_data)
+            self._changed()
+
+    def update(self, course_id, fields):
+        """Apply changed fields to a cached course"""
+        with self._lock:
+            course = self._courses.get(course_id)
+            if course is None:
+                return
+            self._courses[course_id] = dict(course, **fields)
+            self._index.put(self._courses[course_id])
+            self._changed()
+
+    def remove(self, course_id):
+        """Drop a course from the cache"""
+        with self._lock:
+            if self._courses.pop(course_id, None) is not None:
+                self._index.remove(course_id)
+                self._changed()
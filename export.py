@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Background CSV export of registrations.
+
+Registrations are read page by page with a document-id cursor and appended to
+a temporary CSV file, so memory use is bounded by one page regardless of the
+collection size. The finished file is sent to the admin as a document and
+removed.
+"""
+
+import os
+import csv
+import asyncio
+import logging
+import tempfile
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "500"))
+
+EXPORT_FIELDS = ['created_at', 'fullName', 'age', 'phone', 'course', 'course_id', 'tg_id', 'username']
+
+
+def export_row(registration_id, registration):
+    """CSV row of a registration"""
+    created_at = registration.get('created_at')
+    return [
+        registration_id,
+        created_at.strftime('%Y-%m-%d %H:%M:%S') if created_at else '',
+        *(registration.get(field, '') for field in EXPORT_FIELDS[1:]),
+    ]
+
+
+class RegistrationExporter:
+    """Runs one registrations export at a time in the background"""
+
+    def __init__(self, registrations_repo, page_size=EXPORT_PAGE_SIZE):
+        self.registrations_repo = registrations_repo
+        self.page_size = page_size
+        self._task = None
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def start(self, bot, chat_id):
+        """Start an export for `chat_id`; False if one is already running"""
+        if self.running:
+            return False
+        self._task = asyncio.create_task(self._run(bot, chat_id), name='registrations-export')
+        return True
+
+    async def stop(self):
+        """Cancel a running export"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def write_csv(self, f):
+        """Write all registrations to an open text file, return the row count"""
+        writer = csv.writer(f)
+        writer.writerow(['id', *EXPORT_FIELDS])
+        rows = 0
+        cursor = None
+        while True:
+            page = await self.registrations_repo.scan(EXPORT_FIELDS, after=cursor, limit=self.page_size)
+            if not page:
+                break
+            writer.writerows(export_row(registration_id, registration) for registration_id, registration in page)
+            rows += len(page)
+            cursor = page[-1][0]
+            if len(page) < self.page_size:
+                break
+        return rows
+
+    async def _run(self, bot, chat_id):
+        fd, path = tempfile.mkstemp(prefix='registrations_', suffix='.csv')
+        try:
+            # utf-8-sig so Excel opens Cyrillic/Uzbek names correctly
+            with os.fdopen(fd, 'w', newline='', encoding='utf-8-sig') as f:
+                rows = await self.write_csv(f)
+
+            filename = f"registrations_{datetime.now().strftime('%Y%m%d_%H%M')}.csv"
+            with open(path, 'rb') as f:
+                await bot.send_document(
+                    chat_id=chat_id,
+                    document=f,
+                    filename=filename,
+                    caption=f"📊 Arizalar eksporti: {rows} ta",
+                )
+            logger.info(f"Registrations export sent: {rows} rows")
+
+        except asyncio.CancelledError:
+            logger.info("Registrations export cancelled")
+            raise
+        except Exception as e:
+            logger.error(f"Registrations export error: {e}")
+            try:
+                await bot.send_message(chat_id=chat_id, text=f"❌ Eksportda xatolik yuz berdi: {e}")
+            except Exception as e:
+                logger.error(f"Error reporting export failure: {e}")
+        finally:
+            os.remove(path)
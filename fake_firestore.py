@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+In-memory stand-in for the Firestore client, used by the offline benchmarks.
+
+Implements the subset of the google-cloud-firestore API that repository.py
+uses and counts billed reads and writes the way Firestore does, optionally
+adding a fixed latency per round-trip. Returned documents are also counted in
+bytes (Firestore document size rules) and can be throttled to a bandwidth.
+"""
+
+import copy
+import math
+import time
+import threading
+import itertools
+from datetime import datetime, timezone
+
+from google.cloud.firestore_v1.transforms import SERVER_TIMESTAMP, DELETE_FIELD, Increment, ArrayUnion
+
+DOCUMENT_ID = '__name__'
+
+_OPERATORS = {
+    '==': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+    '<': lambda a, b: a is not None and a < b,
+    '<=': lambda a, b: a is not None and a <= b,
+    '>': lambda a, b: a is not None and a > b,
+    '>=': lambda a, b: a is not None and a >= b,
+    'in': lambda a, b: a in b,
+    'not-in': lambda a, b: a not in b,
+    'array_contains': lambda a, b: isinstance(a, list) and b in a,
+}
+
+
+def value_size(value):
+    """Firestore storage size of a field value"""
+    if value is None or isinstance(value, bool):
+        return 1
+    if isinstance(value, str):
+        return len(value.encode()) + 1
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, (list, tuple)):
+        return sum(value_size(item) for item in value)
+    if isinstance(value, dict):
+        return sum(len(key.encode()) + 1 + value_size(item) for key, item in value.items())
+    # Numbers, timestamps
+    return 8
+
+
+def document_size(path, data):
+    """Firestore storage size of a document: name, fields and 32 bytes overhead"""
+    name = sum(len(part.encode()) + 1 for part in path.split('/')) + 16
+    return name + value_size(data or {}) + 32
+
+
+class FakeStats:
+    """Billed operation counters and bytes returned to the client"""
+
+    def __init__(self):
+        self.reads = 0
+        self.writes = 0
+        self.round_trips = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def add(self, reads=0, writes=0):
+        with self._lock:
+            self.reads += reads
+            self.writes += writes
+            self.round_trips += 1
+
+    def received(self, size):
+        with self._lock:
+            self.bytes += size
+
+    def snapshot(self):
+        return {'reads': self.reads, 'writes': self.writes, 'round_trips': self.round_trips, 'bytes': self.bytes}
+
+
+class FakeChange:
+    def __init__(self, kind, document):
+        self.type = type('ChangeType', (), {'name': kind})()
+        self.document = document
+
+
+class FakeWatch:
+    def __init__(self, collection, callback):
+        self.collection = collection
+        self.callback = callback
+
+    def unsubscribe(self):
+        self.collection.db._watchers[self.collection.name].remove(self)
+
+
+class FakeAggregation:
+    def __init__(self, query):
+        self.query = query
+
+    def get(self):
+        db = self.query.collection.db
+        count = len(self.query._matching())
+        db._round_trip(reads=max(1, math.ceil(count / 1000)))
+        result = type('AggregationResult', (), {'alias': 'count', 'value': count})()
+        return [[result]]
+
+
+class FakeSnapshot:
+    """DocumentSnapshot"""
+
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field):
+        value = self._data
+        for part in field.split('.'):
+            value = value[part]
+        return copy.deepcopy(value)
+
+
+class FakeDocument:
+    """DocumentReference"""
+
+    def __init__(self, collection, doc_id):
+        self.collection = collection
+        self.id = doc_id
+        self.path = f'{collection.name}/{doc_id}'
+
+    def get(self, transaction=None):
+        db = self.collection.db
+        db._round_trip(reads=1)
+        with db._lock:
+            data = copy.deepcopy(db._data[self.collection.name].get(self.id))
+        db._transfer(document_size(self.path, data))
+        return FakeSnapshot(self, data)
+
+    def set(self, data, merge=False):
+        self.collection.db._round_trip(writes=1)
+        self.collection.db._apply([(self, 'set', data, merge)])
+
+    def create(self, data):
+        self.collection.db._round_trip(writes=1)
+        self.collection.db._apply([(self, 'create', data, False)])
+
+    def update(self, data):
+        self.collection.db._round_trip(writes=1)
+        self.collection.db._apply([(self, 'update', data, True)])
+
+    def delete(self):
+        self.collection.db._round_trip(writes=1)
+        self.collection.db._apply([(self, 'delete', None, False)])
+
+
+class FakeQuery:
+    def __init__(self, collection, filters=(), orders=(), limit=None, cursor=None, fields=None):
+        self.collection = collection
+        self.filters = list(filters)
+        self.orders = list(orders)
+        self._limit = limit
+        self.cursor = cursor
+        self.fields = fields
+
+    def _copy(self, **changes):
+        values = dict(filters=self.filters, orders=self.orders, limit=self._limit,
+                      cursor=self.cursor, fields=self.fields)
+        values.update(changes)
+        return FakeQuery(self.collection, **values)
+
+    def where(self, field_path=None, op_string=None, value=None, *, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self.filters + [(field_path, op_string, value)])
+
+    def order_by(self, field_path, direction='ASCENDING'):
+        return self._copy(orders=self.orders + [(field_path, direction == 'DESCENDING')])
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def start_after(self, values):
+        if isinstance(values, FakeSnapshot):
+            values = dict(values._data or {}, **{DOCUMENT_ID: values.id})
+        return self._copy(cursor=values)
+
+    def select(self, field_paths):
+        return self._copy(fields=list(field_paths))
+
+    def count(self, alias=None):
+        return FakeAggregation(self)
+
+    @staticmethod
+    def _value(doc_id, data, field):
+        if field == DOCUMENT_ID:
+            return doc_id
+        return data.get(field)
+
+    def _matching(self):
+        db = self.collection.db
+        with db._lock:
+            items = list(db._data[self.collection.name].items())
+
+        items = [
+            (doc_id, data) for doc_id, data in items
+            if all(field == DOCUMENT_ID or field in data for field, _, _ in self.filters)
+            and all(_OPERATORS[op](self._value(doc_id, data, field), value) for field, op, value in self.filters)
+        ]
+
+        orders = self.orders or [(DOCUMENT_ID, False)]
+        if orders[-1][0] != DOCUMENT_ID:
+            orders = orders + [(DOCUMENT_ID, orders[-1][1])]
+        # Documents missing an order field are excluded, as in Firestore
+        items = [(doc_id, data) for doc_id, data in items
+                 if all(field == DOCUMENT_ID or field in data for field, _ in orders)]
+        for field, descending in reversed(orders):
+            items.sort(key=lambda item: self._value(item[0], item[1], field), reverse=descending)
+
+        if self.cursor is not None:
+            def after_cursor(item):
+                for field, descending in orders:
+                    if field not in self.cursor:
+                        return True
+                    value = self._value(item[0], item[1], field)
+                    if value == self.cursor[field]:
+                        continue
+                    return value < self.cursor[field] if descending else value > self.cursor[field]
+                return False
+            items = [item for item in items if after_cursor(item)]
+
+        if self._limit is not None:
+            items = items[:self._limit]
+        return items
+
+    def stream(self, transaction=None):
+        items = self._matching()
+        db = self.collection.db
+        db._round_trip(reads=max(1, len(items)))
+        if self.fields is not None:
+            items = [(doc_id, {field: data[field] for field in self.fields if field in data}) for doc_id, data in items]
+        db._transfer(sum(document_size(f'{self.collection.name}/{doc_id}', data) for doc_id, data in items))
+        for doc_id, data in items:
+            yield FakeSnapshot(self.collection.document(doc_id), copy.deepcopy(data))
+
+    def get(self, transaction=None):
+        return list(self.stream())
+
+
+class FakeCollection(FakeQuery):
+    """CollectionReference"""
+
+    def __init__(self, db, name):
+        self.db = db
+        self.name = name
+        super().__init__(self)
+
+    def document(self, doc_id=None):
+        return FakeDocument(self, doc_id or self.db._new_id())
+
+    def add(self, data):
+        ref = self.document()
+        ref.set(data)
+        return datetime.now(timezone.utc), ref
+
+    def on_snapshot(self, callback):
+        watch = FakeWatch(self, callback)
+        self.db._watchers.setdefault(self.name, []).append(watch)
+        with self.db._lock:
+            docs = [FakeSnapshot(self.document(doc_id), copy.deepcopy(data))
+                    for doc_id, data in self.db._data[self.name].items()]
+        callback(docs, [FakeChange('ADDED', doc) for doc in docs], datetime.now(timezone.utc))
+        return watch
+
+
+class FakeWriteBatch:
+    """WriteBatch and BulkWriter"""
+
+    def __init__(self, db):
+        self.db = db
+        self._writes = []
+
+    def set(self, reference, data, merge=False):
+        self._writes.append((reference, 'set', data, merge))
+
+    def create(self, reference, data):
+        self._writes.append((reference, 'create', data, False))
+
+    def update(self, reference, data):
+        self._writes.append((reference, 'update', data, True))
+
+    def delete(self, reference):
+        self._writes.append((reference, 'delete', None, False))
+
+    def commit(self):
+        writes, self._writes = self._writes, []
+        if writes:
+            self.db._round_trip(writes=len(writes))
+            self.db._apply(writes)
+
+    # BulkWriter API
+    def flush(self):
+        self.commit()
+
+    def close(self):
+        self.commit()
+
+
+class FakeTransaction(FakeWriteBatch):
+    """Transaction driven by firestore.transactional.
+
+    The client lock is held from begin to commit, so transactions are
+    serialized instead of retried on contention.
+    """
+
+    def __init__(self, db):
+        super().__init__(db)
+        self._id = None
+        self._read_only = False
+        self._max_attempts = 5
+
+    def _clean_up(self):
+        self._writes = []
+        self._id = None
+
+    def _begin(self, retry_id=None):
+        self.db._lock.acquire()
+        self._id = self.db._new_id()
+
+    def _commit(self):
+        try:
+            self.commit()
+        finally:
+            self._id = None
+            self.db._lock.release()
+
+    def _rollback(self):
+        if self._id is not None:
+            self._clean_up()
+            self.db._lock.release()
+
+
+class FakeFirestore:
+    """Firestore client stand-in"""
+
+    def __init__(self, latency=0.0, bandwidth=None):
+        self.latency = latency
+        self.bandwidth = bandwidth  # bytes per second, None = unlimited
+        self.stats = FakeStats()
+        self._data = {}
+        self._watchers = {}
+        self._lock = threading.RLock()
+        self._ids = itertools.count(1)
+
+    def _new_id(self):
+        return f'doc{next(self._ids):010d}'
+
+    def _round_trip(self, reads=0, writes=0):
+        self.stats.add(reads=reads, writes=writes)
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _transfer(self, size):
+        self.stats.received(size)
+        if self.bandwidth:
+            time.sleep(size / self.bandwidth)
+
+    def collection(self, name):
+        with self._lock:
+            self._data.setdefault(name, {})
+        return FakeCollection(self, name)
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+    def bulk_writer(self, options=None):
+        return FakeWriteBatch(self)
+
+    def transaction(self, max_attempts=5, read_only=False):
+        return FakeTransaction(self)
+
+    @staticmethod
+    def _resolve(current, data):
+        now = datetime.now(timezone.utc)
+        result = dict(current or {})
+        for field, value in data.items():
+            if value is SERVER_TIMESTAMP:
+                result[field] = now
+            elif value is DELETE_FIELD:
+                result.pop(field, None)
+            elif isinstance(value, Increment):
+                result[field] = (result.get(field) or 0) + value.value
+            elif isinstance(value, ArrayUnion):
+                current_values = list(result.get(field) or [])
+                result[field] = current_values + [item for item in value.values if item not in current_values]
+            else:
+                result[field] = copy.deepcopy(value)
+        return result
+
+    def _apply(self, writes):
+        changes = []
+        with self._lock:
+            for ref, operation, data, merge in writes:
+                documents = self._data.setdefault(ref.collection.name, {})
+                current = documents.get(ref.id)
+                if operation == 'delete':
+                    if documents.pop(ref.id, None) is not None:
+                        changes.append((ref, 'REMOVED', None))
+                    continue
+                if operation == 'update' and current is None:
+                    raise KeyError(f'No document to update: {ref.path}')
+                if operation == 'create' and current is not None:
+                    raise KeyError(f'Document already exists: {ref.path}')
+                documents[ref.id] = self._resolve(current if merge else None, data)
+                changes.append((ref, 'MODIFIED' if current is not None else 'ADDED', documents[ref.id]))
+
+        for ref, kind, data in changes:
+            for watch in list(self._watchers.get(ref.collection.name, [])):
+                document = FakeSnapshot(ref, copy.deepcopy(data))
+                watch.callback([], [FakeChange(kind, document)], datetime.now(timezone.utc))
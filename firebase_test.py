@@ -1,16 +1,16 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
+import asyncio
 
-# 1. Service account json faylni ulaymiz
-cred = credentials.Certificate("service-account.json")  # Agar shu papkada bo‘lsa
+from repository import shutdown_executor
+from storage import create_storage, STORAGE
 
-# 2. Firebase ilovasini ishga tushuramiz
-firebase_admin.initialize_app(cred)
+# 1. Sozlangan omborni ulaymiz (STORAGE: firestore yoki sqlite)
+storage = create_storage()
 
-# 3. Firestore clientni olamiz
-db = firestore.client()
-
-# 4. Test: Kurslar kolleksiyasini o‘qiymiz
-print("📚 Kurslar ro'yxati:")
-for doc in db.collection("courses").stream():
-    print(f"- {doc.id}: {doc.to_dict()}")
+# 2. Test: Kurslar ro'yxatini o‘qiymiz
+print(f"📚 Kurslar ro'yxati ({STORAGE}):")
+try:
+    for course in asyncio.run(storage.courses.list()):
+        print(f"- {course['id']}: {course}")
+finally:
+    shutdown_executor()
+    storage.close()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Flood control for incoming updates.
+
+A group -1 handler checks every user update against sliding-window limits
+per user and per chat. Updates over a limit are dropped silently before any
+handler runs, so hammering a button or a command costs no storage writes,
+subscription checks or Bot API calls.
+"""
+
+import os
+import logging
+
+from telegram.ext import ApplicationHandlerStop
+
+from ratelimit import SlidingWindowLimiter
+from metrics import UPDATES_THROTTLED
+
+logger = logging.getLogger(__name__)
+
+FLOOD_WINDOW = float(os.getenv("FLOOD_WINDOW", "10"))
+FLOOD_USER_LIMIT = int(os.getenv("FLOOD_USER_LIMIT", "20"))
+FLOOD_CHAT_LIMIT = int(os.getenv("FLOOD_CHAT_LIMIT", "40"))
+
+
+class FloodControl:
+    """Drops updates of users and chats that exceed their rate limit"""
+
+    def __init__(self, exempt=(), user_limit=FLOOD_USER_LIMIT, chat_limit=FLOOD_CHAT_LIMIT, window=FLOOD_WINDOW):
+        self.exempt = frozenset(exempt)
+        self.users = SlidingWindowLimiter(user_limit, window)
+        self.chats = SlidingWindowLimiter(chat_limit, window)
+
+    async def check(self, update, context):
+        """Group -1 handler: stop processing of an update over the limit"""
+        user = update.effective_user
+        # Membership updates come from Telegram, not from the user
+        if user is None or user.id in self.exempt or update.chat_member or update.my_chat_member:
+            return
+
+        if not self.users.hit(user.id):
+            scope = 'user'
+        else:
+            chat = update.effective_chat
+            # In a private chat the user limit already covers the chat
+            if chat is None or chat.id == user.id or self.chats.hit(chat.id):
+                return
+            scope = 'chat'
+
+        UPDATES_THROTTLED.inc(scope)
+        logger.debug(f"Flood control dropped update {update.update_id} from {user.id} ({scope})")
+        raise ApplicationHandlerStop
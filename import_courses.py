@@ -1,12 +1,43 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
 
-# service-account.json birga bo‘lsa shuni ishlat
-cred = credentials.Certificate("service-account.json")
-firebase_admin.initialize_app(cred)
-db = firestore.client()
+"""
+Bulk course import.
 
-courses = [
+Streams courses from a CSV, JSON or JSONL file, validates them with the same
+rules as the admin handlers and upserts them by a stable key (derived from the
+course name), so running the import again updates courses instead of
+duplicating them.
+
+    python import_courses.py courses.csv
+    python import_courses.py courses.jsonl --batch-size 500
+    python import_courses.py                # built-in sample courses
+
+CSV columns / JSON keys: name, duration_weeks, price, description (optional),
+key (optional, defaults to the normalized name). Only the columns present in a
+row are written, so a name/price file updates prices and keeps descriptions;
+new courses need duration_weeks and price. A row whose key was already
+used by another course name in the same file is skipped.
+
+Courses go to the storage selected by STORAGE (Firestore or SQLite).
+"""
+
+import os
+import csv
+import json
+import time
+import asyncio
+import logging
+import argparse
+
+from repository import init_firestore, shutdown_executor
+from storage import create_storage, STORAGE
+from validation import parse_course, course_key, REQUIRED_COURSE_FIELDS
+
+logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SAMPLE_COURSES = [
     {
         "name": "Frontend",
         "duration_weeks": 10,
@@ -29,7 +60,126 @@ courses = [
     },
 ]
 
-for course in courses:
-    db.collection("courses").add(course)
 
-print("✅ Kurslar muvaffaqiyatli yuklandi!")
+def read_rows(path, file_format):
+    """Yield raw course records from a file"""
+    if file_format == 'csv':
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            yield from csv.DictReader(f)
+    elif file_format == 'jsonl':
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path, encoding='utf-8') as f:
+            yield from json.load(f)
+
+
+def validated(rows, key_index=None):
+    """Yield valid courses with their key; log and count invalid rows
+
+    With `key_index` (existing course keys) new courses must have every
+    required field.
+    """
+    stats = {'invalid': 0}
+    names = {}  # key -> name of the row that claimed it
+
+    def generate():
+        for line_no, row in enumerate(rows, 1):
+            try:
+                course = parse_course(row)
+                key = course_key(row.get('key') or course['name'])
+                if not key:
+                    raise ValueError("Kalit bo'sh bo'lmasligi kerak!")
+                if key_index is not None and key not in key_index and key not in names:
+                    missing = [field for field in REQUIRED_COURSE_FIELDS if field not in course]
+                    if missing:
+                        raise ValueError(f"Yangi kurs uchun {', '.join(missing)} kerak!")
+                    course.setdefault('description', '')
+                if names.setdefault(key, course['name']).casefold() != course['name'].casefold():
+                    raise ValueError(f"Kalit '{key}' allaqachon '{names[key]}' kursiga tegishli!")
+            except ValueError as e:
+                stats['invalid'] += 1
+                logger.warning(f"Row {line_no} skipped ({row.get('name', '')}): {e}")
+                continue
+            course['key'] = key
+            yield course
+
+    return generate(), stats
+
+
+def chunks(items, size):
+    """Group an iterator into lists of `size`"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def import_courses(rows, batch_size, dry_run=False):
+    """Validate and upsert courses, return a summary"""
+    created = updated = 0
+    start = time.perf_counter()
+
+    if dry_run:
+        courses, stats = validated(rows)
+        valid = sum(1 for _ in courses)
+        return {'valid': valid, 'invalid': stats['invalid'], 'created': 0, 'updated': 0,
+                'seconds': time.perf_counter() - start}
+
+    # Fail before reading the file if Firestore is unreachable
+    storage = create_storage(db=init_firestore() if STORAGE == 'firestore' else None)
+    try:
+        # One projected read of existing keys, then only writes
+        key_index = await storage.courses.key_index()
+        courses, stats = validated(rows, key_index)
+
+        for chunk in chunks(courses, batch_size):
+            chunk_created, chunk_updated = await storage.courses.bulk_upsert(chunk, key_index)
+            created += chunk_created
+            updated += chunk_updated
+            logger.info(f"Imported {created + updated} courses...")
+    finally:
+        storage.close()
+
+    return {'valid': created + updated, 'invalid': stats['invalid'], 'created': created,
+            'updated': updated, 'seconds': time.perf_counter() - start}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', nargs='?', help="CSV, JSON or JSONL file (default: sample courses)")
+    parser.add_argument('--format', choices=['csv', 'json', 'jsonl'], help="File format (default: by extension)")
+    parser.add_argument('--batch-size', type=int, default=500, help="Courses per BulkWriter flush")
+    parser.add_argument('--dry-run', action='store_true', help="Only validate the file")
+    args = parser.parse_args()
+
+    if args.path:
+        file_format = args.format or os.path.splitext(args.path)[1].lstrip('.').lower()
+        if file_format not in ('csv', 'json', 'jsonl'):
+            parser.error(f"Unknown file format: {file_format}")
+        rows = read_rows(args.path, file_format)
+    else:
+        rows = iter(SAMPLE_COURSES)
+
+    try:
+        summary = asyncio.run(import_courses(rows, args.batch_size, args.dry_run))
+    finally:
+        shutdown_executor()
+
+    rate = summary['valid'] / summary['seconds'] if summary['seconds'] else 0
+    if args.dry_run:
+        print(f"✔️ Tekshirildi: {summary['valid']} to'g'ri, {summary['invalid']} xato")
+        return
+    print(f"✅ Kurslar muvaffaqiyatli yuklandi! "
+          f"Yangi: {summary['created']}, yangilangan: {summary['updated']}, "
+          f"xato: {summary['invalid']}, {summary['seconds']:.2f}s ({rate:.0f} kurs/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Priority lanes for outgoing Bot API traffic.
+
+Replies to users go out through the interactive lane, broadcasts, admin
+notifications and exports through the bulk lane. Each lane is a separate
+transport with its own connection pool, so bulk sends never hold the
+connections replies need. Both lanes draw messages from one global rate
+budget, which keeps the bot under Telegram's limit of about 30 messages per
+second. Interactive sends are always served first and bulk sends leave
+SEND_INTERACTIVE_RESERVE messages of the budget to them, so users do not
+notice a running broadcast.
+"""
+
+import os
+import time
+
+from telegram.request import BaseRequest
+
+from ratelimit import PriorityTokenBucket
+from metrics import SEND_WAIT
+
+SEND_RATE = float(os.getenv("SEND_RATE", "30"))
+SEND_INTERACTIVE_RESERVE = int(os.getenv("SEND_INTERACTIVE_RESERVE", "5"))
+INTERACTIVE_POOL_SIZE = int(os.getenv("INTERACTIVE_POOL_SIZE", "256"))
+BULK_POOL_SIZE = int(os.getenv("BULK_POOL_SIZE", "32"))
+
+LANE_INTERACTIVE = 0
+LANE_BULK = 1
+LANE_NAMES = {LANE_INTERACTIVE: 'interactive', LANE_BULK: 'bulk'}
+
+# Bot API methods that count against the global message limit
+RATE_LIMITED_PREFIXES = ('send', 'copyMessage', 'forwardMessage')
+RATE_LIMIT_EXEMPT = frozenset({'sendChatAction'})
+
+
+def is_rate_limited(api_method):
+    """True if the Bot API method sends a message"""
+    return api_method.startswith(RATE_LIMITED_PREFIXES) and api_method not in RATE_LIMIT_EXEMPT
+
+
+class LaneRequest(BaseRequest):
+    """Bot API transport of one lane: its own connection pool, the shared rate budget"""
+
+    def __init__(self, request, limiter, lane):
+        self.request = request
+        self.limiter = limiter
+        self.lane = lane
+
+    @property
+    def read_timeout(self):
+        return self.request.read_timeout
+
+    async def initialize(self):
+        await self.request.initialize()
+
+    async def shutdown(self):
+        await self.request.shutdown()
+
+    async def do_request(self, url, method, request_data=None, read_timeout=BaseRequest.DEFAULT_NONE,
+                         write_timeout=BaseRequest.DEFAULT_NONE, connect_timeout=BaseRequest.DEFAULT_NONE,
+                         pool_timeout=BaseRequest.DEFAULT_NONE):
+        if is_rate_limited(url.rsplit('/', 1)[-1]):
+            start = time.perf_counter()
+            await self.limiter.acquire(self.lane)
+            SEND_WAIT.observe(time.perf_counter() - start, LANE_NAMES[self.lane])
+        return await self.request.do_request(
+            url, method, request_data=request_data, read_timeout=read_timeout,
+            write_timeout=write_timeout, connect_timeout=connect_timeout, pool_timeout=pool_timeout,
+        )
+
+
+class SendLanes:
+    """Creates lane transports sharing one global rate budget"""
+
+    def __init__(self, rate=SEND_RATE, reserve=SEND_INTERACTIVE_RESERVE):
+        self.limiter = PriorityTokenBucket(rate, reserve=reserve)
+
+    def interactive(self, request):
+        """Transport for replies to users"""
+        return LaneRequest(request, self.limiter, LANE_INTERACTIVE)
+
+    def bulk(self, request):
+        """Transport for broadcasts, admin notifications and exports"""
+        return LaneRequest(request, self.limiter, LANE_BULK)
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+In-process metrics with Prometheus text export.
+
+Records per-handler latency and errors, storage operation latency by
+backend and collection and Telegram Bot API latency by method. Recording is
+a lock and a few additions, so it stays on in production; the registry is rendered on
+GET /metrics.
+"""
+
+import time
+import bisect
+import logging
+import functools
+import threading
+
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, ConversationHandler, TypeHandler
+from telegram.request import HTTPXRequest
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+UPDATE_TYPES = (
+    'message', 'edited_message', 'callback_query', 'inline_query', 'chosen_inline_result',
+    'chat_member', 'my_chat_member', 'channel_post', 'edited_channel_post', 'chat_join_request',
+)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            lines.append(f'{self.name}{_format_labels(self.labels, label_values)} {value}')
+        return lines
+
+
+class Histogram:
+    """Cumulative histogram with fixed buckets and labels"""
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # Per-bucket counts (+Inf last), sum, count
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *label_values):
+        series = self._series.get(label_values)
+        return series[2] if series else 0
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((key, ([*series[0]], series[1], series[2])) for key, series in self._series.items())
+        for label_values, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{bound!r}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labels, label_values, le)} {cumulative}')
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f'{self.name}_sum{labels} {total}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+UPDATES = REGISTRY.register(Counter(
+    'bot_updates_total', 'Updates received by type', ['type']))
+HANDLER_DURATION = REGISTRY.register(Histogram(
+    'bot_handler_duration_seconds', 'Handler callback duration', ['handler']))
+HANDLER_ERRORS = REGISTRY.register(Counter(
+    'bot_handler_errors_total', 'Handler callbacks that raised', ['handler']))
+STORAGE_DURATION = REGISTRY.register(Histogram(
+    'storage_operation_duration_seconds', 'Storage operation duration', ['backend', 'collection', 'operation']))
+STORAGE_ERRORS = REGISTRY.register(Counter(
+    'storage_operation_errors_total', 'Failed storage operations', ['backend', 'collection', 'operation']))
+TELEGRAM_DURATION = REGISTRY.register(Histogram(
+    'telegram_api_duration_seconds', 'Bot API request duration', ['method'],
+    buckets=DEFAULT_BUCKETS + (30.0, 60.0)))
+TELEGRAM_ERRORS = REGISTRY.register(Counter(
+    'telegram_api_errors_total', 'Failed Bot API requests', ['method']))
+UPDATES_THROTTLED = REGISTRY.register(Counter(
+    'bot_updates_throttled_total', 'Updates dropped by flood control', ['scope']))
+SEND_WAIT = REGISTRY.register(Histogram(
+    'telegram_send_wait_seconds', 'Time a message waited for the global send budget', ['lane']))
+
+
+def update_type(update):
+    """Name of the payload field set in an update"""
+    for name in UPDATE_TYPES:
+        if getattr(update, name, None) is not None:
+            return name
+    return 'other'
+
+
+def call_labels(func):
+    """(backend, collection, operation) labels of a repository call"""
+    owner = getattr(func, '__self__', None)
+    backend = getattr(owner, 'backend', None) or 'none'
+    collection = getattr(owner, 'collection', None) or (type(owner).__name__ if owner is not None else 'none')
+    return backend, collection, getattr(func, '__name__', 'call').lstrip('_')
+
+
+def observe_call(func):
+    """Wrap a blocking storage call so its duration and failures are recorded"""
+    labels = call_labels(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            STORAGE_ERRORS.inc(*labels)
+            raise
+        finally:
+            STORAGE_DURATION.observe(time.perf_counter() - start, *labels)
+
+    return wrapper
+
+
+def timed_callback(callback):
+    """Wrap a handler callback to record its duration and errors"""
+    name = getattr(callback, '__name__', 'callback')
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        start = time.perf_counter()
+        try:
+            return await callback(update, context)
+        except ApplicationHandlerStop:
+            raise
+        except Exception:
+            HANDLER_ERRORS.inc(name)
+            raise
+        finally:
+            HANDLER_DURATION.observe(time.perf_counter() - start, name)
+
+    wrapper.__wrapped_callback__ = True
+    return wrapper
+
+
+def _iter_handlers(handlers):
+    for handler in handlers:
+        if isinstance(handler, ConversationHandler):
+            yield from _iter_handlers(handler.entry_points)
+            for state_handlers in handler.states.values():
+                yield from _iter_handlers(state_handlers)
+            yield from _iter_handlers(handler.fallbacks)
+        else:
+            yield handler
+
+
+async def count_update(update, context):
+    """Group -2 handler: count every incoming update, also those flood control drops"""
+    UPDATES.inc(update_type(update))
+
+
+def instrument_application(application):
+    """Time every registered handler callback and count updates"""
+    for group_handlers in application.handlers.values():
+        for handler in _iter_handlers(group_handlers):
+            router = getattr(handler.callback, '__self__', None)
+            if isinstance(getattr(router, 'routes', None), dict):
+                # ButtonRouter: time the routed callbacks, not the dispatcher
+                for label, callback in router.routes.items():
+                    if not getattr(callback, '__wrapped_callback__', False):
+                        router.routes[label] = timed_callback(callback)
+            elif not getattr(handler.callback, '__wrapped_callback__', False):
+                handler.callback = timed_callback(handler.callback)
+    application.add_handler(TypeHandler(Update, count_update), group=-2)
+
+
+class MetricsRequest(HTTPXRequest):
+    """HTTPXRequest that records Bot API latency per method"""
+
+    async def do_request(self, url, method, request_data=None, read_timeout=HTTPXRequest.DEFAULT_NONE,
+                         write_timeout=HTTPXRequest.DEFAULT_NONE, connect_timeout=HTTPXRequest.DEFAULT_NONE,
+                         pool_timeout=HTTPXRequest.DEFAULT_NONE):
+        api_method = url.rsplit('/', 1)[-1]
+        start = time.perf_counter()
+        try:
+            status, payload = await super().do_request(
+                url, method, request_data=request_data, read_timeout=read_timeout,
+                write_timeout=write_timeout, connect_timeout=connect_timeout, pool_timeout=pool_timeout,
+            )
+            if status >= 400:
+                TELEGRAM_ERRORS.inc(api_method)
+            return status, payload
+        except Exception:
+            TELEGRAM_ERRORS.inc(api_method)
+            raise
+        finally:
+            TELEGRAM_DURATION.observe(time.perf_counter() - start, api_method)
+
+
+def metrics_handler(registry=REGISTRY):
+    """WebServer route serving the registry in Prometheus text format"""
+    async def handle(request):
+        return 200, 'text/plain; version=0.0.4; charset=utf-8', registry.render().encode()
+
+    return handle
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Admin notification queue.
+
+Handlers enqueue notifications and return; a worker delivers them to the
+admin chat. Notifications go out one by one at low volume. When they arrive
+faster than NOTIFY_DIGEST_THRESHOLD per minute, or several are already
+waiting, they are combined into digest messages, which keeps the admin chat
+under Telegram's per-chat limits. RetryAfter and network errors are retried
+with backoff.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+
+from telegram.error import RetryAfter, NetworkError, BadRequest, Forbidden
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_MIN_INTERVAL = float(os.getenv("NOTIFY_MIN_INTERVAL", "1"))
+NOTIFY_DIGEST_THRESHOLD = int(os.getenv("NOTIFY_DIGEST_THRESHOLD", "10"))
+NOTIFY_DIGEST_INTERVAL = float(os.getenv("NOTIFY_DIGEST_INTERVAL", "15"))
+NOTIFY_MAX_RETRIES = 5
+MESSAGE_LIMIT = 4096
+
+
+def digest_messages(summaries, header):
+    """Split digest lines into messages below the Telegram length limit"""
+    messages = []
+    current = header(len(summaries))
+    for summary in summaries:
+        if len(current) + len(summary) + 2 > MESSAGE_LIMIT:
+            messages.append(current)
+            current = ''
+        current += summary + '\n\n'
+    messages.append(current)
+    return messages
+
+
+class AdminNotifier:
+    """Queues admin notifications and delivers them from a background worker"""
+
+    def __init__(self, chat_id, header, min_interval=NOTIFY_MIN_INTERVAL,
+                 digest_threshold=NOTIFY_DIGEST_THRESHOLD, digest_interval=NOTIFY_DIGEST_INTERVAL):
+        self.chat_id = chat_id
+        self.header = header
+        self.min_interval = min_interval
+        self.digest_threshold = digest_threshold
+        self.digest_interval = digest_interval
+        self._pending = deque()
+        self._recent = deque()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._bot = None
+
+    def notify(self, text, summary=None):
+        """Queue a notification; `summary` is its line in a digest"""
+        self._pending.append((text, summary or text))
+        now = time.monotonic()
+        self._recent.append(now)
+        while self._recent and now - self._recent[0] > 60:
+            self._recent.popleft()
+        self._wakeup.set()
+
+    def __len__(self):
+        return len(self._pending)
+
+    @property
+    def digest_mode(self):
+        """True while notifications arrive faster than the digest threshold"""
+        return len(self._recent) >= self.digest_threshold
+
+    def start(self, bot):
+        """Start the delivery worker"""
+        self._bot = bot
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name='admin-notifier')
+
+    async def stop(self):
+        """Stop the worker and deliver what is still queued"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._pending and self._bot is not None:
+            await self._deliver(self._take())
+
+    def _take(self):
+        items = list(self._pending)
+        self._pending.clear()
+        return items
+
+    async def _run(self):
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+
+            if self.digest_mode:
+                # Busy: collect for a while and send one digest
+                await asyncio.sleep(self.digest_interval)
+
+            await self._deliver(self._take())
+            await asyncio.sleep(self.min_interval)
+
+    async def _deliver(self, items):
+        if len(items) == 1:
+            messages = [items[0][0]]
+        else:
+            messages = digest_messages([summary for _, summary in items], self.header)
+
+        for text in messages:
+            await self._send(text)
+
+    async def _send(self, text):
+        delay = 1
+        for _ in range(NOTIFY_MAX_RETRIES):
+            try:
+                await self._bot.send_message(chat_id=self.chat_id, text=text, parse_mode='HTML')
+                return
+            except RetryAfter as e:
+                logger.warning(f"Admin notification flood control, waiting {e.retry_after}s")
+                await asyncio.sleep(e.retry_after)
+            except (BadRequest, Forbidden) as e:
+                logger.error(f"Admin notification rejected: {e}")
+                return
+            except NetworkError as e:
+                logger.warning(f"Admin notification failed, retrying in {delay}s: {e}")
+                await asyncio.sleep(delay)
+                delay *= 2
+            except Exception as e:
+                logger.error(f"Error sending admin notification: {e}")
+                return
+        logger.error("Admin notification dropped after retries")
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Conversation state and user_data persistence.
+
+State is read once at startup. Changes are handed over by the Application every
+`update_interval` seconds, coalesced in memory and written in one batch, so
+there is no storage round-trip per message. Because state is not re-read, all
+updates of a user must reach the same process: run one bot process, or use
+WORKERS sharding (workers.py), where each worker owns its users' state.
+Replicas behind a load balancer without per-user routing would see each
+other's changes only after a restart. FirestorePersistence keeps state
+across restarts and redeploys; SQLitePersistence is for single-node
+deployments.
+"""
+
+import os
+import pickle
+import sqlite3
+import asyncio
+import logging
+import threading
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from repository import run_blocking, firestore, FIRESTORE_BATCH_LIMIT
+
+logger = logging.getLogger(__name__)
+
+# "none", "firestore" or "sqlite"
+PERSISTENCE = os.getenv("PERSISTENCE", "none")
+PERSISTENCE_PATH = os.getenv("PERSISTENCE_PATH", "bot_state.sqlite3")
+PERSISTENCE_UPDATE_INTERVAL = float(os.getenv("PERSISTENCE_UPDATE_INTERVAL", "10"))
+
+
+def encode_key(key):
+    """Conversation key tuple -> string"""
+    return ':'.join(str(part) for part in key)
+
+
+def decode_key(text):
+    """String -> conversation key tuple"""
+    return tuple(int(part) for part in text.split(':'))
+
+
+class BufferedPersistence(BasePersistence):
+    """Stores conversations and user_data; writes are coalesced and flushed in batches"""
+
+    def __init__(self, update_interval=PERSISTENCE_UPDATE_INTERVAL):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self._pending_conversations = {}
+        self._pending_users = {}
+        self._flush_task = None
+
+    # Backend specific
+    def _load_conversations(self, name):
+        raise NotImplementedError
+
+    def _load_user_data(self):
+        raise NotImplementedError
+
+    def _write(self, conversations, users):
+        raise NotImplementedError
+
+    async def get_conversations(self, name):
+        return await run_blocking(self._load_conversations, name)
+
+    async def get_user_data(self):
+        return await run_blocking(self._load_user_data)
+
+    async def update_conversation(self, name, key, new_state):
+        self._pending_conversations[(name, key)] = new_state
+        self._schedule_flush()
+
+    async def update_user_data(self, user_id, data):
+        # Empty user_data is stored as a delete to keep the state small
+        self._pending_users[user_id] = data or None
+        self._schedule_flush()
+
+    async def drop_user_data(self, user_id):
+        self._pending_users[user_id] = None
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_soon())
+
+    async def _flush_soon(self):
+        # Let the rest of the current update_persistence run hand over its changes first
+        await asyncio.sleep(0)
+        self._flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        conversations, self._pending_conversations = self._pending_conversations, {}
+        users, self._pending_users = self._pending_users, {}
+        if not conversations and not users:
+            return
+
+        try:
+            await run_blocking(self._write, conversations, users)
+        except Exception as e:
+            logger.error(f"Error writing persistence: {e}")
+            # Keep failed changes unless newer ones arrived meanwhile
+            for key, value in conversations.items():
+                self._pending_conversations.setdefault(key, value)
+            for key, value in users.items():
+                self._pending_users.setdefault(key, value)
+
+    # Data that is not stored
+    async def get_chat_data(self):
+        return {}
+
+    async def get_bot_data(self):
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def update_chat_data(self, chat_id, data):
+        pass
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def drop_chat_data(self, chat_id):
+        pass
+
+    async def refresh_user_data(self, user_id, user_data):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+
+class FirestorePersistence(BufferedPersistence):
+    """Persistence in Firestore, survives restarts and redeploys"""
+
+    def __init__(self, db, update_interval=PERSISTENCE_UPDATE_INTERVAL):
+        super().__init__(update_interval)
+        self.db = db
+
+    def _load_conversations(self, name):
+        query = (
+            self.db.collection('conversations')
+            .where(filter=firestore.FieldFilter('name', '==', name))
+            .select(['key', 'state'])
+        )
+        return {decode_key(doc.get('key')): doc.get('state') for doc in query.stream()}
+
+    def _load_user_data(self):
+        return {int(doc.id): doc.get('data') for doc in self.db.collection('user_data').stream()}
+
+    def _write(self, conversations, users):
+        operations = []
+        for (name, key), state in conversations.items():
+            ref = self.db.collection('conversations').document(f'{name}:{encode_key(key)}')
+            data = {'name': name, 'key': encode_key(key), 'state': state}
+            operations.append((ref, None if state is None else data))
+        for user_id, user_data in users.items():
+            ref = self.db.collection('user_data').document(str(user_id))
+            operations.append((ref, None if user_data is None else {'data': user_data}))
+
+        for start in range(0, len(operations), FIRESTORE_BATCH_LIMIT):
+            batch = self.db.batch()
+            for ref, data in operations[start:start + FIRESTORE_BATCH_LIMIT]:
+                if data is None:
+                    batch.delete(ref)
+                else:
+                    batch.set(ref, data)
+            batch.commit()
+
+
+class SQLitePersistence(BufferedPersistence):
+    """Local persistence in a SQLite file (WAL mode)"""
+
+    def __init__(self, path=PERSISTENCE_PATH, update_interval=PERSISTENCE_UPDATE_INTERVAL):
+        super().__init__(update_interval)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS conversations ('
+            'name TEXT NOT NULL, key TEXT NOT NULL, state BLOB, PRIMARY KEY (name, key))'
+        )
+        self.conn.execute('CREATE TABLE IF NOT EXISTS user_data (user_id INTEGER PRIMARY KEY, data BLOB)')
+        self.conn.commit()
+
+    def _load_conversations(self, name):
+        with self._lock:
+            rows = self.conn.execute('SELECT key, state FROM conversations WHERE name = ?', (name,)).fetchall()
+        return {decode_key(key): pickle.loads(state) for key, state in rows}
+
+    def _load_user_data(self):
+        with self._lock:
+            rows = self.conn.execute('SELECT user_id, data FROM user_data').fetchall()
+        return {user_id: pickle.loads(data) for user_id, data in rows}
+
+    def _write(self, conversations, users):
+        upsert_conversations = [
+            (name, encode_key(key), pickle.dumps(state))
+            for (name, key), state in conversations.items() if state is not None
+        ]
+        delete_conversations = [
+            (name, encode_key(key))
+            for (name, key), state in conversations.items() if state is None
+        ]
+        upsert_users = [(user_id, pickle.dumps(data)) for user_id, data in users.items() if data is not None]
+        delete_users = [(user_id,) for user_id, data in users.items() if data is None]
+
+        with self._lock, self.conn:
+            self.conn.executemany('INSERT OR REPLACE INTO conversations VALUES (?, ?, ?)', upsert_conversations)
+            self.conn.executemany('DELETE FROM conversations WHERE name = ? AND key = ?', delete_conversations)
+            self.conn.executemany('INSERT OR REPLACE INTO user_data VALUES (?, ?)', upsert_users)
+            self.conn.executemany('DELETE FROM user_data WHERE user_id = ?', delete_users)
+
+
+def create_persistence(db, mode=PERSISTENCE):
+    """Build the configured persistence or None"""
+    if mode == 'firestore':
+        return FirestorePersistence(db)
+    if mode == 'sqlite':
+        return SQLitePersistence()
+    return None
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Rate limiting helpers for outgoing and incoming Telegram traffic.
+"""
+
+import time
+import asyncio
+from collections import OrderedDict, Counter
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated = clock()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        async with self._lock:
+            while True:
+                now = self.clock()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        """Stop handing out tokens for `seconds` (used on RetryAfter)"""
+        self.paused_until = max(self.paused_until, self.clock() + seconds)
+
+
+class PriorityTokenBucket:
+    """Token bucket shared by several priorities, lower numbers are served first
+
+    A caller only gets a token while no caller of a higher priority is
+    waiting. Priorities other than 0 also leave `reserve` tokens in the
+    bucket, so priority 0 finds a burst ready instead of waiting for refill.
+    """
+
+    def __init__(self, rate, capacity=None, reserve=0, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.reserve = min(reserve, self.capacity - 1)
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated = clock()
+        self._waiting = Counter()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _blocked(self, priority):
+        return any(count for waiting, count in self._waiting.items() if waiting < priority)
+
+    async def acquire(self, priority=0):
+        """Wait until a token is available to `priority` and take it"""
+        needed = 1 if priority == 0 else 1 + self.reserve
+        self._waiting[priority] += 1
+        try:
+            while True:
+                self._refill(self.clock())
+                if self._blocked(priority):
+                    await asyncio.sleep(1 / self.rate)
+                elif self.tokens >= needed:
+                    self.tokens -= 1
+                    return
+                else:
+                    await asyncio.sleep((needed - self.tokens) / self.rate)
+        finally:
+            self._waiting[priority] -= 1
+
+
+class SlidingWindowLimiter:
+    """Per-key limit of `limit` events per sliding `window` seconds
+
+    The window is approximated from the counts of the current and previous
+    fixed windows, so a key costs three numbers instead of a timestamp log.
+    At most `maxsize` keys are kept, least recently seen keys are dropped.
+    """
+
+    def __init__(self, limit, window, maxsize=100000, clock=time.monotonic):
+        self.limit = limit
+        self.window = window
+        self.maxsize = maxsize
+        self.clock = clock
+        # key -> [fixed window index, previous window count, current window count]
+        self._counters = OrderedDict()
+
+    def hit(self, key):
+        """Record an event for `key`; False if it is over the limit (and not recorded)"""
+        index, offset = divmod(self.clock(), self.window)
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = self._counters[key] = [index, 0, 0]
+            while len(self._counters) > self.maxsize:
+                self._counters.popitem(last=False)
+        else:
+            self._counters.move_to_end(key)
+            if counter[0] != index:
+                counter[1] = counter[2] if counter[0] == index - 1 else 0
+                counter[2] = 0
+                counter[0] = index
+
+        if counter[1] * (1 - offset / self.window) + counter[2] >= self.limit:
+            return False
+        counter[2] += 1
+        return True
+
+    def __len__(self):
+        return len(self._counters)
@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Keyboards and message templates.
+
+Static keyboards and texts are built once and shared. Course keyboards and the
+course list message are rebuilt only when the course catalog version changes.
+"""
+
+import html
+import functools
+
+from telegram import (
+    KeyboardButton, ReplyKeyboardMarkup, InlineKeyboardButton, InlineKeyboardMarkup,
+    InlineQueryResultArticle, InputTextMessageContent,
+)
+
+# Emojis and design elements
+EMOJI = {
+    'welcome': '🎉',
+    'register': '📝',
+    'courses': '📚',
+    'contact': '☎️',
+    'success': '✅',
+    'error': '❌',
+    'info': 'ℹ️',
+    'phone': '📱',
+    'age': '🎂',
+    'name': '👤',
+    'course': '🎓',
+    'time': '⏰',
+    'money': '💰',
+    'location': '📍',
+    'new': '🆕',
+    'cancel': '❌',
+    'admin': '👑',
+    'add': '➕',
+    'edit': '✏️',
+    'delete': '🗑️',
+    'broadcast': '📢',
+    'stats': '📊',
+    'back': '⬅️',
+    'save': '💾',
+    'announce': '📣',
+    'subscribe': '🔔',
+    'warning': '⚠️',
+    'check': '✔️',
+}
+
+# Reply keyboard button labels, also used for routing (router.py)
+BTN_REGISTER = f'{EMOJI["register"]} Ro\'yxatdan o\'tish'
+BTN_COURSES = f'{EMOJI["courses"]} Kurslar ro\'yxati'
+BTN_CONTACT = f'{EMOJI["contact"]} Bog\'lanish'
+BTN_ABOUT = f'{EMOJI["info"]} Ma\'lumot'
+BTN_ADD_COURSE = f'{EMOJI["add"]} Kurs qo\'shish'
+BTN_EDIT_COURSE = f'{EMOJI["edit"]} Kurs tahrirlash'
+BTN_DELETE_COURSE = f'{EMOJI["delete"]} Kurs o\'chirish'
+BTN_BROADCAST = f'{EMOJI["broadcast"]} E\'lon yuborish'
+BTN_STATS = f'{EMOJI["stats"]} Statistika'
+BTN_BACK = f'{EMOJI["back"]} Asosiy menu'
+
+
+# Keyboards (Telegram markup objects are immutable, so one instance is shared)
+@functools.lru_cache(maxsize=None)
+def create_main_keyboard():
+    """Create main keyboard"""
+    keyboard = [
+        [BTN_REGISTER, BTN_COURSES],
+        [BTN_CONTACT, BTN_ABOUT]
+    ]
+    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=False)
+
+@functools.lru_cache(maxsize=None)
+def create_admin_keyboard():
+    """Create admin keyboard"""
+    keyboard = [
+        [BTN_ADD_COURSE, BTN_EDIT_COURSE],
+        [BTN_DELETE_COURSE, BTN_BROADCAST],
+        [BTN_STATS, BTN_BACK]
+    ]
+    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=False)
+
+@functools.lru_cache(maxsize=None)
+def create_subscription_keyboard(channel):
+    """Create subscription keyboard"""
+    keyboard = [
+        [InlineKeyboardButton(f'{EMOJI["subscribe"]} Kanalga obuna bo\'lish', url=f'https://t.me/{channel.replace("@", "")}')],
+        [InlineKeyboardButton(f'{EMOJI["check"]} Obunani tekshirish', callback_data='check_subscription')]
+    ]
+    return InlineKeyboardMarkup(keyboard)
+
+@functools.lru_cache(maxsize=None)
+def create_phone_keyboard():
+    """Create contact request keyboard"""
+    phone_kb = [[KeyboardButton(f'{EMOJI["phone"]} Telefonni yuborish', request_contact=True)]]
+    return ReplyKeyboardMarkup(phone_kb, one_time_keyboard=True, resize_keyboard=True)
+
+# Course keyboards: (label prefix, callback prefix, cancel callback)
+COURSE_KEYBOARDS = {
+    'register': (f"{EMOJI['course']} ", '', 'cancel'),
+    'edit': ('', 'edit_', 'cancel_edit'),
+    'delete': (f"{EMOJI['delete']} ", 'delete_', 'cancel_delete'),
+}
+
+def build_course_keyboard(courses, kind):
+    """Build inline keyboard with one button per course"""
+    label_prefix, callback_prefix, cancel_data = COURSE_KEYBOARDS[kind]
+    buttons = []
+    for course in courses:
+        course_name = course.get('name', 'Noma\'lum kurs')
+        buttons.append([InlineKeyboardButton(f"{label_prefix}{course_name}", callback_data=f"{callback_prefix}{course['id']}")])
+
+    buttons.append([InlineKeyboardButton(f"{EMOJI['cancel']} Bekor qilish", callback_data=cancel_data)])
+    return InlineKeyboardMarkup(buttons)
+
+# Broadcast audiences: callback suffix -> button label
+AUDIENCE_LABELS = {
+    'all': "Barcha faol foydalanuvchilar",
+    'sub': "Kanal obunachilari",
+    'days:7': "Oxirgi 7 kunda faol bo'lganlar",
+    'days:30': "Oxirgi 30 kunda faol bo'lganlar",
+}
+
+def course_audience_label(course_name):
+    """Audience label of users registered for a course"""
+    return f"{course_name} kursiga yozilganlar"
+
+def build_audience_keyboard(courses):
+    """Build broadcast audience keyboard: fixed audiences, then one button per course"""
+    buttons = [
+        [InlineKeyboardButton(f"{EMOJI['name']} {label}", callback_data=f"aud:{key}")]
+        for key, label in AUDIENCE_LABELS.items()
+    ]
+    for course in courses:
+        label = course_audience_label(course.get('name', 'Noma\'lum kurs'))
+        buttons.append([InlineKeyboardButton(f"{EMOJI['course']} {label}", callback_data=f"aud:course:{course['id']}")])
+
+    buttons.append([InlineKeyboardButton(f"{EMOJI['cancel']} Bekor qilish", callback_data='cancel_broadcast')])
+    return InlineKeyboardMarkup(buttons)
+
+def build_course_list_text(courses):
+    """Build course list message"""
+    msg = f'{EMOJI["courses"]} <b>Bizning kurslarimiz:</b>\n\n'
+
+    for i, course in enumerate(courses, 1):
+        msg += f'<b>{i}. {course.get("name", "Noma\'lum")}</b>\n'
+        msg += f'{EMOJI["time"]} Davomiyligi: {course.get("duration_weeks", "N/A")} oy\n'
+        msg += f'{EMOJI["money"]} Narxi: {course.get("price", "N/A"):,} so\'m\n'
+
+        if course.get('description'):
+            msg += f'{EMOJI["info"]} {course["description"]}\n'
+        msg += '\n'
+
+    msg += f'{EMOJI["register"]} <i>Ro\'yxatdan o\'tish uchun tegishli tugmani bosing!</i>'
+    return msg
+
+def format_price(price):
+    """Course price with thousands separators"""
+    return f'{price:,}' if isinstance(price, (int, float)) else 'N/A'
+
+def build_course_card(course):
+    """Course message shared from inline mode"""
+    msg = f'{EMOJI["course"]} <b>{html.escape(str(course.get("name", "Noma\'lum kurs")))}</b>\n\n'
+    msg += f'{EMOJI["time"]} Davomiyligi: {html.escape(str(course.get("duration_weeks", "N/A")))} oy\n'
+    msg += f'{EMOJI["money"]} Narxi: {format_price(course.get("price"))} so\'m\n'
+    if course.get('description'):
+        msg += f'{EMOJI["info"]} {html.escape(str(course["description"]))}\n'
+    return msg
+
+def build_inline_result(course, bot_username):
+    """Inline query result of a course, with a button that opens the bot"""
+    return InlineQueryResultArticle(
+        id=course['id'],
+        title=course.get('name', 'Noma\'lum kurs'),
+        description=f'{course.get("duration_weeks", "N/A")} oy • {format_price(course.get("price"))} so\'m',
+        input_message_content=InputTextMessageContent(build_course_card(course), parse_mode='HTML'),
+        reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton(
+            f"{EMOJI['register']} Ro'yxatdan o'tish", url=f'https://t.me/{bot_username}',
+        )]]),
+    )
+
+# Registration fields shown on a page; pages are read with this projection
+REGISTRATION_PAGE_FIELDS = ('fullName', 'age', 'phone', 'course', 'tg_id', 'username', 'created_at')
+
+def build_registrations_page(rows, title, page, has_prev, has_next):
+    """Build registrations page text and navigation keyboard"""
+    msg = f'{EMOJI["register"]} <b>{html.escape(title)}</b> ({page + 1}-sahifa)\n\n'
+    if not rows:
+        msg += f'{EMOJI["info"]} Arizalar topilmadi.'
+
+    for registration_id, registration in rows:
+        created_at = registration.get('created_at')
+        date = created_at.strftime('%d.%m.%Y %H:%M') if created_at else '—'
+        username = registration.get('username')
+        msg += f'{EMOJI["name"]} <b>{html.escape(str(registration.get("fullName", "")))}</b>, {html.escape(str(registration.get("age", "")))} yosh\n'
+        msg += f'{EMOJI["phone"]} {html.escape(str(registration.get("phone", "")))}\n'
+        msg += f'{EMOJI["course"]} {html.escape(str(registration.get("course", "")))}\n'
+        msg += f'{EMOJI["time"]} {date} | 🆔 {registration.get("tg_id", "")}'
+        msg += f' | @{html.escape(username)}\n\n' if username else '\n\n'
+
+    buttons = []
+    if has_prev:
+        buttons.append(InlineKeyboardButton(f"{EMOJI['back']} Oldingi", callback_data='regs:prev'))
+    if has_next:
+        buttons.append(InlineKeyboardButton("Keyingi ➡️", callback_data='regs:next'))
+    return msg, InlineKeyboardMarkup([buttons]) if buttons else None
+
+def registration_digest_header(count):
+    """Header of a digest of admin registration notifications"""
+    return f"{EMOJI['new']} <b>{count} ta yangi ariza:</b>\n\n"
+
+
+class CourseRenderCache:
+    """Course keyboards and list text, rebuilt when the catalog version changes"""
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self._cache = {}
+
+    def _get(self, key, build):
+        version = self.catalog.version
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        value = build(self.catalog.all())
+        self._cache[key] = (version, value)
+        return value
+
+    def keyboard(self, kind):
+        """Inline keyboard for 'register', 'edit' or 'delete'"""
+        return self._get(kind, lambda courses: build_course_keyboard(courses, kind))
+
+    def list_text(self):
+        """Course list message"""
+        return self._get('list', build_course_list_text)
+
+    def audience_keyboard(self):
+        """Broadcast audience keyboard"""
+        return self._get('audience', build_audience_keyboard)
+
+    def inline_results(self, bot_username):
+        """Inline query results by course id"""
+        return self._get(('inline', bot_username), lambda courses: {
+            course['id']: build_inline_result(course, bot_username) for course in courses
+        })
+
+
+# Message templates
+@functools.lru_cache(maxsize=None)
+def subscription_required_text(channel):
+    """Subscription required message"""
+    return f"""
+{EMOJI['warning']} <b>Diqqat!</b>
+
+{EMOJI['info']} Botdan to'liq foydalanish uchun bizning kanalimizga obuna bo'ling!
+
+{EMOJI['subscribe']} <b>Kanal:</b> {channel}
+
+{EMOJI['check']} Obuna bo'lgandan so'ng "Obunani tekshirish" tugmasini bosing.
+"""
+
+SUBSCRIPTION_SUCCESS_TEXT = f"""
+{EMOJI['success']} <b>Rahmat!</b>
+
+{EMOJI['check']} Siz muvaffaqiyatli obuna bo'ldingiz!
+Endi botdan to'liq foydalanishingiz mumkin.
+
+{EMOJI['info']} Asosiy menyuga o'tish uchun /start buyrug'ini bosing.
+"""
+
+@functools.lru_cache(maxsize=None)
+def subscription_not_found_text(channel):
+    """Subscription not found message"""
+    return f"""
+{EMOJI['error']} <b>Obuna topilmadi!</b>
+
+{EMOJI['warning']} Iltimos, avval kanalga obuna bo'ling:
+{channel}
+
+{EMOJI['info']} Keyin qaytadan "Obunani tekshirish" tugmasini bosing.
+"""
+
+ADMIN_WELCOME_TEMPLATE = f"""
+{EMOJI['admin']} <b>Admin panelga xush kelibsiz, {{user_name}}!</b>
+
+{EMOJI['info']} Admin sifatida siz:
+• Kurslarni boshqara olasiz
+• E'lonlar yuborish mumkin
+• Statistika ko'ra olasiz
+• Oddiy foydalanuvchi funksiyalarini ham ishlatish mumkin
+• Obuna bo'lish talabidan ozod
+
+Kerakli bo'limni tanlang:
+"""
+
+USER_WELCOME_TEMPLATE = f"""
+{EMOJI['welcome']} <b>IT Center botiga xush kelibsiz, {{user_name}}!</b>
+
+{EMOJI['info']} Bu bot orqali siz:
+• Kurslarimizga ro'yxatdan o'ta olasiz
+• Barcha kurslar haqida ma'lumot olasiz
+• Biz bilan bog'lana olasiz
+
+Kerakli bo'limni tanlang:
+"""
+
+REG_NAME_TEXT = f"""
+{EMOJI['register']} <b>Ro'yxatdan o'tish</b>
+
+{EMOJI['name']} Iltimos, <b>ism va familiyangizni</b> to'liq kiriting:
+
+<i>Masalan: Ahmadjon Valiyev</i>
+"""
+
+REG_AGE_TEXT = f"""
+{EMOJI['age']} <b>Yoshingizni kiriting:</b>
+
+{EMOJI['info']} <i>Faqat raqam kiriting (5-100 oralig'ida)</i>
+"""
+
+REG_AGE_ERROR_TEXT = f"""
+{EMOJI['error']} <b>Noto'g'ri yosh!</b>
+
+{EMOJI['info']} Iltimos:
+• Faqat raqam kiriting
+• 5 dan 100 gacha bo'lgan yoshni kiriting
+
+<i>Masalan: 25</i>
+"""
+
+REG_PHONE_TEXT = f"""
+{EMOJI['phone']} <b>Telefon raqamingizni yuboring:</b>
+
+{EMOJI['info']} Ikki usuldan birini tanlang:
+• Pastdagi tugmani bosing
+• Yoki qo'lda kiriting (+998901234567)
+"""
+
+REG_COURSE_TEXT = f"""
+{EMOJI['course']} <b>Kursni tanlang:</b>
+
+{EMOJI['info']} <i>Quyidagi kurslardan birini tanlang:</i>
+"""
+
+ADD_COURSE_NAME_TEXT = f"""
+{EMOJI['add']} <b>Yangi kurs qo'shish</b>
+
+{EMOJI['course']} <b>Kurs nomini kiriting:</b>
+
+{EMOJI['info']} <i>Masalan: Python dasturlash</i>
+"""
+
+ADD_COURSE_DURATION_TEXT = f"""
+{EMOJI['time']} <b>Kurs davomiyligini kiriting (oyda):</b>
+
+{EMOJI['info']} <i>Faqat raqam kiriting. Masalan: 6</i>
+"""
+
+ADD_COURSE_PRICE_TEXT = f"""
+{EMOJI['money']} <b>Kurs narxini kiriting (so'mda):</b>
+
+{EMOJI['info']} <i>Faqat raqam kiriting. Masalan: 500000</i>
+"""
+
+ADD_COURSE_DESC_TEXT = f"""
+{EMOJI['info']} <b>Kurs tavsifini kiriting:</b>
+
+{EMOJI['info']} <i>Kurs haqida qisqacha ma'lumot yozing yoki "yo'q" deb yozing</i>
+"""
+
+EDIT_COURSE_SELECT_TEXT = f"""
+{EMOJI['edit']} <b>Qaysi kursni tahrirlash kerak?</b>
+
+{EMOJI['info']} <i>Tahrirlash kerak bo'lgan kursni tanlang:</i>
+"""
+
+DELETE_COURSE_SELECT_TEXT = f"""
+{EMOJI['delete']} <b>Qaysi kursni o'chirish kerak?</b>
+
+{EMOJI['error']} <b>Diqqat!</b> <i>O'chirilgan kursni tiklash mumkin emas!</i>
+"""
+
+BROADCAST_AUDIENCE_TEXT = f"""
+{EMOJI['broadcast']} <b>E'lon yuborish</b>
+
+{EMOJI['name']} <b>E'lon kimlarga yuborilsin?</b>
+
+{EMOJI['info']} <i>Botni bloklagan foydalanuvchilarga yuborilmaydi.</i>
+"""
+
+BROADCAST_START_TEXT = f"""
+{EMOJI['broadcast']} <b>E'lon yuborish</b>
+
+{EMOJI['announce']} <b>E'lon matnini yozing:</b>
+
+{EMOJI['info']} <i>Matn, rasm, video va boshqa formatlarni yuborish mumkin.
+HTML formatini ishlatish mumkin: <b>qalin</b>, <i>qiya</i></i>
+"""
+
+CONTACT_TEXT = f"""
+{EMOJI['contact']} <b>Bog'lanish ma'lumotlari:</b>
+
+{EMOJI['phone']} <b>Telefon:</b> +998 99 448-46-24
+{EMOJI['location']} <b>Manzil:</b> Muzrabot tuman, Xalqabot IT Center
+{EMOJI['time']} <b>Ish vaqti:</b> 9:00 - 18:00
+
+{EMOJI['info']} <b>Admin:</b> @ITCenter_01
+
+{EMOJI['courses']} <i>Barcha savollaringiz bo'yicha murojaat qilishingiz mumkin!</i>
+"""
+
+ABOUT_TEXT = f"""
+{EMOJI['info']} <b>IT Center haqida:</b>
+
+{EMOJI['course']} Biz zamonaviy IT ta'lim markazi bo'lib, professional dasturchilar tayyorlaymiz.
+
+<b>Bizning afzalliklarimiz:</b>
+• Tajribali o'qituvchilar
+• Amaliy loyihalar
+• Ish bilan ta'minlash
+• Sertifikat berish
+• Kichik guruhlar
+
+{EMOJI['success']} <b>1000+</b> muvaffaqiyatli bitiruvchi
+{EMOJI['time']} <b>5 yil</b> tajriba
+{EMOJI['course']} <b>10+</b> turli kurslar
+
+{EMOJI['register']} Bugunoq ro'yxatdan o'ting va IT sohasida o'z karerangizni boshlang!
+"""
+
+BACK_TO_MAIN_TEMPLATE = f"""
+{EMOJI['welcome']} <b>Asosiy menuga qaytdingiz, {{user_name}}!</b>
+
+{EMOJI['info']} Kerakli bo'limni tanlang:
+"""
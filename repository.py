@@ -0,0 +1,571 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Data-access layer for the IT Center bot.
+
+CourseRepository, UserRepository, RegistrationRepository and
+BroadcastRepository are the storage interface the bot uses; this module also
+holds their Firestore implementation (sqlite_storage.py has the SQLite one).
+Storage clients are synchronous, so every call is pushed to a bounded thread
+pool. Handlers await the repository methods and the event loop keeps serving
+other users while a round-trip is in flight.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import functools
+import importlib
+import threading
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+from validation import course_key
+from metrics import observe_call
+
+logger = logging.getLogger(__name__)
+
+FIRESTORE_MAX_WORKERS = int(os.getenv("FIRESTORE_MAX_WORKERS", "16"))
+FIRESTORE_BATCH_LIMIT = 500
+# Repeated registrations for the same course within this window are deduplicated
+REGISTRATION_DEDUP_WINDOW = int(os.getenv("REGISTRATION_DEDUP_WINDOW", "86400"))
+
+# Projection that returns document names only; an empty select() returns every field
+KEY_ONLY = ['__name__']
+
+_executor = ThreadPoolExecutor(max_workers=FIRESTORE_MAX_WORKERS, thread_name_prefix="firestore")
+
+
+class LazyModule:
+    """Module proxy that imports the module on first attribute access"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+# firebase_admin.firestore pulls in grpc (~1 s); it is first touched in a worker thread
+firestore = LazyModule('firebase_admin.firestore')
+
+
+def credentials_path():
+    """Path of the Firebase service account file"""
+    return os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "service-account.json")
+
+
+def create_client():
+    """Initialize Firebase app and return Firestore client (no network round-trip)"""
+    import firebase_admin
+    from firebase_admin import credentials
+
+    cred_path = credentials_path()
+    logger.info(f"Firebase credential file: {cred_path}")
+
+    if not os.path.exists(cred_path):
+        raise FileNotFoundError(f"Firebase credential file not found: {cred_path}")
+
+    cred = credentials.Certificate(cred_path)
+
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(cred)
+        logger.info("Firebase app initialized successfully")
+
+    db = firestore.client()
+    logger.info("Firestore client created successfully")
+    return db
+
+
+def probe_firestore(db):
+    """Test connection with a one-document read"""
+    test_collection = db.collection('test').limit(1)
+    list(test_collection.stream())
+    logger.info("Firestore connection successful!")
+
+
+def init_firestore():
+    """Initialize Firebase app, check the connection and return Firestore client"""
+    db = create_client()
+    probe_firestore(db)
+    return db
+
+
+class LazyFirestore:
+    """Firestore client created on first use instead of at import"""
+
+    def __init__(self, factory=None):
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = (self._factory or create_client)()
+        return self._client
+
+    def warm_up(self):
+        """Start creating the client in the thread pool; errors surface on first use"""
+        return _executor.submit(lambda: self.client)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking Firestore call in the thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(observe_call(func), *args, **kwargs))
+
+
+def current_day():
+    """Days since the epoch (UTC), stored as `last_seen_day` for activity audiences"""
+    return int(time.time() // 86400)
+
+
+def count_query(query):
+    """Count matching documents with a server-side aggregation query"""
+    return int(query.count(alias='count').get()[0][0].value)
+
+
+def shutdown_executor():
+    """Stop the Firestore thread pool"""
+    _executor.shutdown(wait=True)
+
+
+class CourseRepository:
+    """Access to courses; backends implement the blocking methods"""
+
+    collection = 'courses'
+
+    # Backend specific
+    def _list(self):
+        raise NotImplementedError
+
+    def _get(self, course_id):
+        raise NotImplementedError
+
+    def _add(self, course_data):
+        raise NotImplementedError
+
+    def _update(self, course_id, fields):
+        raise NotImplementedError
+
+    def _delete(self, course_id):
+        raise NotImplementedError
+
+    def _key_index(self):
+        raise NotImplementedError
+
+    def _bulk_upsert(self, courses, key_index):
+        raise NotImplementedError
+
+    def watch(self, on_change):
+        """Subscribe to course changes; on_change(kind, course_id, course_data) runs in a listener thread"""
+        raise NotImplementedError
+
+    async def list(self):
+        """Return all courses with their document id under 'id'"""
+        return await run_blocking(self._list)
+
+    async def get(self, course_id):
+        """Return a course or None"""
+        return await run_blocking(self._get, course_id)
+
+    async def add(self, course_data):
+        """Create a course and return its id"""
+        return await run_blocking(self._add, course_data)
+
+    async def update(self, course_id, fields):
+        """Update course fields"""
+        await run_blocking(self._update, course_id, fields)
+
+    async def delete(self, course_id):
+        """Delete a course"""
+        await run_blocking(self._delete, course_id)
+
+    async def key_index(self):
+        """Return {course key: document id} for all courses"""
+        return await run_blocking(self._key_index)
+
+    async def bulk_upsert(self, courses, key_index):
+        """Create or update courses by their 'key'; returns (created, updated)"""
+        return await run_blocking(self._bulk_upsert, courses, key_index)
+
+
+class UserRepository:
+    """Access to user profiles; backends implement the blocking methods
+
+    Broadcast audiences are dicts: {} is every active user, and the optional
+    keys 'subscribed' (True), 'course_id' (registered for the course) and
+    'active_since_day' (seen on or after this day, see current_day) narrow it.
+    """
+
+    collection = 'users'
+
+    # Backend specific
+    def _save_interactions(self, entries):
+        raise NotImplementedError
+
+    def _mark_inactive(self, user_ids):
+        raise NotImplementedError
+
+    def _set_subscribed(self, user_id):
+        raise NotImplementedError
+
+    def _count(self):
+        raise NotImplementedError
+
+    def _count_subscribed(self):
+        raise NotImplementedError
+
+    def _count_audience(self, audience):
+        raise NotImplementedError
+
+    def _page_ids(self, after, limit, audience):
+        raise NotImplementedError
+
+    async def save_interactions(self, entries):
+        """Create or refresh user profiles and last interaction time in batches, marking users active"""
+        await run_blocking(self._save_interactions, entries)
+
+    async def mark_inactive(self, user_ids):
+        """Exclude users who blocked the bot or deleted their account from broadcasts"""
+        await run_blocking(self._mark_inactive, user_ids)
+
+    async def set_subscribed(self, user_id):
+        """Mark user as subscribed to the required channel"""
+        await run_blocking(self._set_subscribed, user_id)
+
+    async def count(self):
+        """Return number of users"""
+        return await run_blocking(self._count)
+
+    async def count_subscribed(self):
+        """Return number of subscribed users"""
+        return await run_blocking(self._count_subscribed)
+
+    async def count_audience(self, audience=None):
+        """Return number of active users in an audience"""
+        return await run_blocking(self._count_audience, audience or {})
+
+    async def page_ids(self, after=None, limit=500, audience=None):
+        """Return up to `limit` (document id, Telegram id) pairs of active audience users ordered by document id"""
+        return await run_blocking(self._page_ids, after, limit, audience or {})
+
+
+class RegistrationRepository:
+    """Access to registrations and per-course enrolment counters; backends implement the blocking methods"""
+
+    collection = 'registrations'
+    stats_collection = 'course_stats'
+
+    # Backend specific
+    def _register(self, registration_data, window):
+        raise NotImplementedError
+
+    def _count(self):
+        raise NotImplementedError
+
+    def _count_since(self, since):
+        raise NotImplementedError
+
+    def _page(self, field, value, since, until, after, limit, fields):
+        raise NotImplementedError
+
+    def _scan(self, fields, after, limit):
+        raise NotImplementedError
+
+    async def register(self, registration_data, window=REGISTRATION_DEDUP_WINDOW):
+        """Idempotently create a registration and count the enrolment, return (id, created)"""
+        return await run_blocking(self._register, registration_data, window)
+
+    async def count(self):
+        """Return number of registrations"""
+        return await run_blocking(self._count)
+
+    async def count_since(self, since):
+        """Return number of registrations created after `since` (timezone-aware datetime)"""
+        return await run_blocking(self._count_since, since)
+
+    async def scan(self, fields, after=None, limit=500):
+        """Return up to `limit` (id, registration) pairs with only `fields`, ordered by document id"""
+        return await run_blocking(self._scan, fields, after, limit)
+
+    async def page(self, field=None, value=None, since=None, until=None, after=None, limit=10, fields=None):
+        """Return up to `limit` (id, registration) pairs newest first, after the (created_at, id) cursor
+
+        `fields` limits the returned fields (created_at is always included).
+        """
+        # field: course_id, tg_id or phone
+        return await run_blocking(self._page, field, value, since, until, after, limit, fields)
+
+
+class BroadcastRepository:
+    """Access to broadcast job checkpoints; backends implement the blocking methods"""
+
+    collection = 'broadcasts'
+
+    # Backend specific
+    def _create(self, job):
+        raise NotImplementedError
+
+    def _update(self, job_id, fields):
+        raise NotImplementedError
+
+    def _list_running(self):
+        raise NotImplementedError
+
+    async def create(self, job):
+        """Create a broadcast job and return its id"""
+        return await run_blocking(self._create, job)
+
+    async def update(self, job_id, fields):
+        """Checkpoint broadcast job fields"""
+        await run_blocking(self._update, job_id, fields)
+
+    async def list_running(self):
+        """Return (id, job) pairs of unfinished broadcasts"""
+        return await run_blocking(self._list_running)
+
+
+class FirestoreCourseRepository(CourseRepository):
+    """`courses` collection in Firestore"""
+    backend = 'firestore'
+
+    def __init__(self, db):
+        self.db = db
+
+    def _list(self):
+        courses = []
+        for doc in self.db.collection(self.collection).stream():
+            course_data = doc.to_dict()
+            course_data['id'] = doc.id
+            courses.append(course_data)
+        return courses
+
+    def _get(self, course_id):
+        course_doc = self.db.collection(self.collection).document(course_id).get()
+        if not course_doc.exists:
+            return None
+        course_data = course_doc.to_dict()
+        course_data['id'] = course_doc.id
+        return course_data
+
+    def _add(self, course_data):
+        data = dict(course_data, created_at=firestore.SERVER_TIMESTAMP)
+        _, doc_ref = self.db.collection(self.collection).add(data)
+        return doc_ref.id
+
+    def _update(self, course_id, fields):
+        data = dict(fields, updated_at=firestore.SERVER_TIMESTAMP)
+        self.db.collection(self.collection).document(course_id).update(data)
+
+    def _delete(self, course_id):
+        self.db.collection(self.collection).document(course_id).delete()
+
+    def _key_index(self):
+        index = {}
+        for doc in self.db.collection(self.collection).select(['name', 'key']).stream():
+            course_data = doc.to_dict()
+            index[course_data.get('key') or course_key(course_data.get('name', ''))] = doc.id
+        return index
+
+    def _bulk_upsert(self, courses, key_index):
+        writer = self.db.bulk_writer()
+        created = updated = 0
+        for course in courses:
+            key = course['key']
+            doc_id = key_index.get(key)
+            data = dict(course, updated_at=firestore.SERVER_TIMESTAMP)
+            if doc_id is None:
+                # Auto id: ids go into callback data (64 bytes), keys have no length limit
+                doc_ref = self.db.collection(self.collection).document()
+                key_index[key] = doc_ref.id
+                data['created_at'] = firestore.SERVER_TIMESTAMP
+                created += 1
+            else:
+                doc_ref = self.db.collection(self.collection).document(doc_id)
+                updated += 1
+            writer.set(doc_ref, data, merge=True)
+        # BulkWriter sends batches in parallel; close() waits for all of them
+        writer.close()
+        return created, updated
+
+    def watch(self, on_change):
+        def on_snapshot(docs, changes, read_time):
+            for change in changes:
+                doc = change.document
+                course_data = None
+                if change.type.name != 'REMOVED':
+                    course_data = doc.to_dict()
+                    course_data['id'] = doc.id
+                on_change(change.type.name, doc.id, course_data)
+
+        return self.db.collection(self.collection).on_snapshot(on_snapshot)
+
+
+class FirestoreUserRepository(UserRepository):
+    """`users` collection in Firestore"""
+    backend = 'firestore'
+
+    def __init__(self, db):
+        self.db = db
+
+    def _save_interactions(self, entries):
+        day = current_day()
+        for start in range(0, len(entries), FIRESTORE_BATCH_LIMIT):
+            batch = self.db.batch()
+            for entry in entries[start:start + FIRESTORE_BATCH_LIMIT]:
+                user_ref = self.db.collection(self.collection).document(str(entry['user_id']))
+                data = dict(entry, last_interaction=firestore.SERVER_TIMESTAMP, last_seen_day=day, active=True)
+                batch.set(user_ref, data, merge=True)
+            batch.commit()
+
+    def _mark_inactive(self, user_ids):
+        for start in range(0, len(user_ids), FIRESTORE_BATCH_LIMIT):
+            batch = self.db.batch()
+            for user_id in user_ids[start:start + FIRESTORE_BATCH_LIMIT]:
+                user_ref = self.db.collection(self.collection).document(str(user_id))
+                batch.set(user_ref, {'active': False, 'deactivated_at': firestore.SERVER_TIMESTAMP}, merge=True)
+            batch.commit()
+
+    def _set_subscribed(self, user_id):
+        # merge: the user document may still be waiting in the write-behind buffer
+        self.db.collection(self.collection).document(str(user_id)).set(
+            {'subscribed': True, 'subscription_date': firestore.SERVER_TIMESTAMP}, merge=True
+        )
+
+    def _count(self):
+        return count_query(self.db.collection(self.collection))
+
+    def _count_subscribed(self):
+        query = self.db.collection(self.collection).where(filter=firestore.FieldFilter('subscribed', '==', True))
+        return count_query(query)
+
+    def _audience_query(self, audience):
+        # Equality filters only, so every audience can be paged by document id
+        # (composite indexes in firestore.indexes.json)
+        query = self.db.collection(self.collection).where(filter=firestore.FieldFilter('active', '==', True))
+        if audience.get('subscribed'):
+            query = query.where(filter=firestore.FieldFilter('subscribed', '==', True))
+        if audience.get('course_id') is not None:
+            query = query.where(filter=firestore.FieldFilter('courses', 'array_contains', audience['course_id']))
+        if audience.get('active_since_day') is not None:
+            # 'in' takes at most 30 values
+            days = list(range(audience['active_since_day'], current_day() + 1))[-30:]
+            query = query.where(filter=firestore.FieldFilter('last_seen_day', 'in', days))
+        return query
+
+    def _count_audience(self, audience):
+        return count_query(self._audience_query(audience))
+
+    def _page_ids(self, after, limit, audience):
+        # User documents are keyed by Telegram id, so names are all a broadcast needs
+        query = self._audience_query(audience).select(KEY_ONLY).order_by('__name__').limit(limit)
+        if after is not None:
+            query = query.start_after({'__name__': after})
+        return [(doc.id, int(doc.id)) for doc in query.stream()]
+
+
+class FirestoreRegistrationRepository(RegistrationRepository):
+    """`registrations` collection in Firestore"""
+    backend = 'firestore'
+
+    def __init__(self, db):
+        self.db = db
+
+    def _register(self, registration_data, window):
+        course_id = registration_data['course_id']
+        now = time.time()
+        bucket = int(now // window)
+        registration_id = f"{registration_data['tg_id']}_{course_id}_{bucket}"
+        registration_ref = self.db.collection(self.collection).document(registration_id)
+        # A repeat just after a bucket boundary finds the registration in the previous bucket
+        previous_id = f"{registration_data['tg_id']}_{course_id}_{bucket - 1}"
+        previous_ref = self.db.collection(self.collection).document(previous_id)
+        cutoff = datetime.fromtimestamp(now - window, timezone.utc)
+        # Counter lives outside `courses` so enrolments don't wake the catalog listener
+        stats_ref = self.db.collection(self.stats_collection).document(course_id)
+        # Course list on the user document makes course audiences one indexed query
+        user_ref = self.db.collection(UserRepository.collection).document(str(registration_data['tg_id']))
+
+        @firestore.transactional
+        def register(transaction):
+            if registration_ref.get(transaction=transaction).exists:
+                return registration_id, False
+            previous = previous_ref.get(transaction=transaction)
+            if previous.exists and previous.get('created_at') > cutoff:
+                return previous_id, False
+            transaction.create(registration_ref, dict(registration_data, created_at=firestore.SERVER_TIMESTAMP))
+            transaction.set(stats_ref, {'enrolled': firestore.Increment(1)}, merge=True)
+            transaction.set(user_ref, {
+                'user_id': registration_data['tg_id'], 'courses': firestore.ArrayUnion([course_id]),
+            }, merge=True)
+            return registration_id, True
+
+        return register(self.db.transaction())
+
+    def _count(self):
+        return count_query(self.db.collection(self.collection))
+
+    def _page(self, field, value, since, until, after, limit, fields):
+        # Composite indexes in firestore.indexes.json
+        query = self.db.collection(self.collection)
+        if fields is not None:
+            query = query.select(sorted({*fields, 'created_at'}))
+        if field is not None:
+            query = query.where(filter=firestore.FieldFilter(field, '==', value))
+        if since is not None:
+            query = query.where(filter=firestore.FieldFilter('created_at', '>=', since))
+        if until is not None:
+            query = query.where(filter=firestore.FieldFilter('created_at', '<', until))
+        # Explicit __name__ order makes the cursor unique when timestamps tie
+        query = (
+            query.order_by('created_at', direction=firestore.Query.DESCENDING)
+            .order_by('__name__', direction=firestore.Query.DESCENDING)
+            .limit(limit)
+        )
+        if after is not None:
+            created_at, doc_id = after
+            query = query.start_after({'created_at': created_at, '__name__': doc_id})
+        return [(doc.id, doc.to_dict()) for doc in query.stream()]
+
+    def _scan(self, fields, after, limit):
+        query = self.db.collection(self.collection).select(fields).order_by('__name__').limit(limit)
+        if after is not None:
+            query = query.start_after({'__name__': after})
+        return [(doc.id, doc.to_dict()) for doc in query.stream()]
+
+    def _count_since(self, since):
+        query = self.db.collection(self.collection).where(filter=firestore.FieldFilter('created_at', '>', since))
+        return count_query(query)
+
+
+class FirestoreBroadcastRepository(BroadcastRepository):
+    """`broadcasts` collection in Firestore (broadcast job checkpoints)"""
+    backend = 'firestore'
+
+    def __init__(self, db):
+        self.db = db
+
+    def _create(self, job):
+        data = dict(job, created_at=firestore.SERVER_TIMESTAMP, updated_at=firestore.SERVER_TIMESTAMP)
+        _, doc_ref = self.db.collection(self.collection).add(data)
+        return doc_ref.id
+
+    def _update(self, job_id, fields):
+        data = dict(fields, updated_at=firestore.SERVER_TIMESTAMP)
+        self.db.collection(self.collection).document(job_id).update(data)
+
+    def _list_running(self):
+        query = self.db.collection(self.collection).where(filter=firestore.FieldFilter('status', '==', 'running'))
+        return [(doc.id, doc.to_dict()) for doc in query.stream()]
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Reply keyboard button routing.
+
+Menu buttons send their exact label, so routing is a dict lookup instead of
+trying one regex per handler. ButtonRouter serves all plain menu buttons with
+a single MessageHandler; conversation entry points use the same exact-label
+filter.
+"""
+
+from telegram.ext import MessageHandler, filters
+
+
+def button_text(message):
+    """Normalized text of a button press"""
+    return message.text.strip() if message.text else None
+
+
+class ButtonFilter(filters.MessageFilter):
+    """Matches messages whose text is exactly one of `labels` (set or dict)"""
+
+    __slots__ = ('labels',)
+
+    def __init__(self, labels, name=None):
+        super().__init__(name=name or 'ButtonFilter', data_filter=False)
+        self.labels = labels
+
+    def filter(self, message):
+        return button_text(message) in self.labels
+
+
+class ButtonRouter:
+    """Maps exact button labels to handler callbacks"""
+
+    def __init__(self):
+        self.routes = {}
+        self._entry_labels = set()
+
+    def add(self, label, callback):
+        """Route a button label to a callback"""
+        if label in self.routes or label in self._entry_labels:
+            raise ValueError(f"Button already routed: {label}")
+        self.routes[label] = callback
+
+    def entry_point(self, label, callback):
+        """MessageHandler for a ConversationHandler entry point button"""
+        if label in self.routes or label in self._entry_labels:
+            raise ValueError(f"Button already routed: {label}")
+        self._entry_labels.add(label)
+        return MessageHandler(ButtonFilter(frozenset([label]), name=f'Button({label})'), callback)
+
+    @property
+    def labels(self):
+        """All labels handled by the router or its entry points"""
+        return frozenset(self.routes) | self._entry_labels
+
+    def handler(self):
+        """Single MessageHandler serving every routed button"""
+        return MessageHandler(ButtonFilter(self.routes, name='ButtonRouter'), self.dispatch)
+
+    async def dispatch(self, update, context):
+        callback = self.routes[button_text(update.effective_message)]
+        return await callback(update, context)
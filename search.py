@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+In-memory course search.
+
+Course names, keys and descriptions are folded to one Latin spelling, so
+Uzbek Latin, Uzbek/Russian Cyrillic and English spellings of the same word
+match ("Python", "питон" and "piton" all become "piton"). Every prefix of
+every folded token is indexed, so a query matches while it is being typed.
+The index is updated per course on add, edit and delete.
+"""
+
+import re
+
+# Uzbek and Russian Cyrillic to Uzbek Latin
+CYRILLIC = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'yo', 'ж': 'j', 'з': 'z',
+    'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r',
+    'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'x', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'sh',
+    'ъ': '', 'ы': 'i', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+    'ў': 'o', 'қ': 'q', 'ғ': 'g', 'ҳ': 'h',
+}
+TRANSLITERATION = str.maketrans(CYRILLIC)
+
+# Spelling differences between the alphabets, in order; the first two run before transliteration
+FOLDS = (
+    (re.compile(r"[ʻʼ‘’'`]"), ''),  # o‘ / g‘ apostrophes
+    (re.compile(r'дж'), 'j'),
+    (re.compile(r'ph'), 'f'),
+    (re.compile(r'th'), 't'),
+    (re.compile(r'c(?=[ei])'), 's'),
+    (re.compile(r'c(?!h)'), 'k'),
+    (re.compile(r'q'), 'k'),
+    (re.compile(r'x'), 'ks'),
+    (re.compile(r'w'), 'v'),
+    (re.compile(r'y'), 'i'),
+    (re.compile(r'([a-z])\1+'), r'\1'),
+)
+TOKEN_RE = re.compile(r'[a-z0-9]+[+#]*')
+MAX_PREFIX = 20
+
+# Field weights for ranking
+FIELD_WEIGHTS = (('name', 3), ('key', 2), ('description', 1))
+
+
+def fold(text):
+    """Lowercase Latin spelling of text, the same for all supported alphabets"""
+    text = str(text).casefold()
+    for pattern, replacement in FOLDS[:2]:
+        text = pattern.sub(replacement, text)
+    text = text.translate(TRANSLITERATION)
+    for pattern, replacement in FOLDS[2:]:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def tokenize(text):
+    """Folded search tokens of text"""
+    return TOKEN_RE.findall(fold(text))
+
+
+class CourseSearchIndex:
+    """Prefix index over course names, keys and descriptions"""
+
+    def __init__(self):
+        self._prefixes = {}  # prefix -> course ids
+        self._tokens = {}    # course id -> {token: weight}
+        self._names = {}     # course id -> sort key
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def rebuild(self, courses):
+        """Index all courses from scratch"""
+        self._prefixes.clear()
+        self._tokens.clear()
+        self._names.clear()
+        for course in courses:
+            self.put(course)
+
+    def put(self, course):
+        """Index a new or changed course"""
+        course_id = course['id']
+        self.remove(course_id)
+        tokens = {}
+        for field, weight in FIELD_WEIGHTS:
+            for token in tokenize(course.get(field) or ''):
+                tokens[token] = max(weight, tokens.get(token, 0))
+        self._tokens[course_id] = tokens
+        self._names[course_id] = str(course.get('name', '')).casefold()
+        for prefix in self._prefixes_of(tokens):
+            self._prefixes.setdefault(prefix, set()).add(course_id)
+
+    def remove(self, course_id):
+        """Drop a course from the index"""
+        tokens = self._tokens.pop(course_id, None)
+        if tokens is None:
+            return
+        self._names.pop(course_id, None)
+        for prefix in self._prefixes_of(tokens):
+            ids = self._prefixes.get(prefix)
+            if ids is not None:
+                ids.discard(course_id)
+                if not ids:
+                    del self._prefixes[prefix]
+
+    @staticmethod
+    def _prefixes_of(tokens):
+        return {token[:length] for token in tokens for length in range(1, min(len(token), MAX_PREFIX) + 1)}
+
+    def _score(self, course_id, query_tokens):
+        tokens = self._tokens[course_id]
+        score = 0
+        for query_token in query_tokens:
+            # An exact token counts double, the best field wins
+            score += max(
+                weight * (2 if token == query_token else 1)
+                for token, weight in tokens.items() if token.startswith(query_token)
+            )
+        return score
+
+    def search(self, text):
+        """Ids of courses matching every query token, best first"""
+        query_tokens = [token[:MAX_PREFIX] for token in tokenize(text)]
+        if not query_tokens:
+            return sorted(self._tokens, key=lambda course_id: (self._names[course_id], course_id))
+
+        matches = None
+        for token in sorted(set(query_tokens), key=lambda token: len(self._prefixes.get(token, ()))):
+            ids = self._prefixes.get(token)
+            if not ids:
+                return []
+            matches = set(ids) if matches is None else matches & ids
+            if not matches:
+                return []
+
+        return sorted(
+            matches,
+            key=lambda course_id: (-self._score(course_id, query_tokens), self._names[course_id], course_id),
+        )
@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+SQLite storage backend for single-node deployments.
+
+All data lives in one local database file in WAL mode, so reads never wait
+for the writer and cost microseconds instead of a billed Firestore
+round-trip. Fields that are filtered or ordered on are indexed columns; the
+rest of each document is kept as JSON. SQL statements are constants with
+bound parameters, so sqlite3's statement cache compiles each of them once.
+Timestamps are stored as Unix seconds and returned as UTC datetimes, like
+Firestore returns them.
+"""
+
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timezone
+
+from validation import course_key
+from repository import CourseRepository, UserRepository, RegistrationRepository, BroadcastRepository
+
+logger = logging.getLogger(__name__)
+
+SQLITE_CACHED_STATEMENTS = 256
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS courses (
+    id TEXT PRIMARY KEY,
+    key TEXT,
+    data TEXT NOT NULL,
+    created_at REAL,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS courses_key ON courses (key);
+
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    subscribed INTEGER NOT NULL DEFAULT 0,
+    subscription_date REAL,
+    last_interaction REAL,
+    active INTEGER NOT NULL DEFAULT 1,
+    data TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS users_subscribed ON users (subscribed);
+CREATE INDEX IF NOT EXISTS users_audience ON users (active, subscribed, id);
+CREATE INDEX IF NOT EXISTS users_recent ON users (active, last_interaction);
+
+CREATE TABLE IF NOT EXISTS user_courses (
+    course_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    PRIMARY KEY (course_id, user_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS registrations (
+    id TEXT PRIMARY KEY,
+    course_id TEXT NOT NULL,
+    tg_id INTEGER NOT NULL,
+    phone TEXT,
+    created_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS registrations_created ON registrations (created_at, id);
+CREATE INDEX IF NOT EXISTS registrations_course ON registrations (course_id, created_at, id);
+CREATE INDEX IF NOT EXISTS registrations_tg_id ON registrations (tg_id, created_at, id);
+CREATE INDEX IF NOT EXISTS registrations_phone ON registrations (phone, created_at, id);
+
+CREATE TABLE IF NOT EXISTS course_stats (
+    course_id TEXT PRIMARY KEY,
+    enrolled INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS broadcasts (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    data TEXT NOT NULL,
+    created_at REAL,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS broadcasts_status ON broadcasts (status);
+'''
+
+# Registration fields that can be filtered on; each has an index
+REGISTRATION_QUERY_FIELDS = ('course_id', 'tg_id', 'phone')
+
+
+def new_id():
+    """Random 20 character document id, like Firestore auto ids"""
+    return uuid.uuid4().hex[:20]
+
+
+def now():
+    """Current Unix time at microsecond precision, so it round-trips through datetime cursors"""
+    return round(time.time(), 6)
+
+
+def to_timestamp(value):
+    """Timezone-aware datetime -> Unix seconds"""
+    return value.timestamp() if value is not None else None
+
+
+def from_timestamp(value):
+    """Unix seconds -> UTC datetime"""
+    return datetime.fromtimestamp(value, timezone.utc) if value is not None else None
+
+
+def dumps(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+class SQLiteDatabase:
+    """Shared connection to the database file; calls are serialized with a lock"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30,
+                                    cached_statements=SQLITE_CACHED_STATEMENTS)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        logger.info(f"SQLite storage opened: {path}")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class NoWatch:
+    """Listener handle for backends without change notifications"""
+
+    def unsubscribe(self):
+        pass
+
+
+class SQLiteCourseRepository(CourseRepository):
+    """`courses` table in SQLite"""
+    backend = 'sqlite'
+
+    def __init__(self, database):
+        self.database = database
+
+    def _list(self):
+        with self.database.lock:
+            rows = self.database.conn.execute('SELECT id, data FROM courses').fetchall()
+        return [dict(json.loads(data), id=course_id) for course_id, data in rows]
+
+    def _get(self, course_id):
+        with self.database.lock:
+            row = self.database.conn.execute('SELECT data FROM courses WHERE id = ?', (course_id,)).fetchone()
+        return dict(json.loads(row[0]), id=course_id) if row is not None else None
+
+    def _add(self, course_data):
+        course_id = new_id()
+        with self.database.lock, self.database.conn:
+            self.database.conn.execute(
+                'INSERT INTO courses (id, key, data, created_at) VALUES (?, ?, ?, ?)',
+                (course_id, course_data.get('key'), dumps(course_data), now()),
+            )
+        return course_id
+
+    def _update(self, course_id, fields):
+        with self.database.lock, self.database.conn:
+            row = self.database.conn.execute('SELECT data FROM courses WHERE id = ?', (course_id,)).fetchone()
+            if row is None:
+                raise KeyError(f"Course not found: {course_id}")
+            data = dict(json.loads(row[0]), **fields)
+            self.database.conn.execute(
+                'UPDATE courses SET key = ?, data = ?, updated_at = ? WHERE id = ?',
+                (data.get('key'), dumps(data), now(), course_id),
+            )
+
+    def _delete(self, course_id):
+        with self.database.lock, self.database.conn:
+            self.database.conn.execute('DELETE FROM courses WHERE id = ?', (course_id,))
+
+    def _key_index(self):
+        with self.database.lock:
+            rows = self.database.conn.execute('SELECT id, key, data FROM courses').fetchall()
+        return {
+            key or course_key(json.loads(data).get('name', '')): course_id
+            for course_id, key, data in rows
+        }
+
+    def _bulk_upsert(self, courses, key_index):
+        created = updated = 0
+        rows = []
+        timestamp = now()
+        # One transaction for the whole chunk
+        with self.database.lock, self.database.conn:
+            for course in courses:
+                key = course['key']
+                doc_id = key_index.get(key)
+                if doc_id is None:
+                    # Random id, like _add
+                    doc_id = key_index[key] = new_id()
+                    created += 1
+                else:
+                    updated += 1
+                # Merge into the stored course like Firestore's set(merge=True)
+                row = self.database.conn.execute('SELECT data FROM courses WHERE id = ?', (doc_id,)).fetchone()
+                data = dict(json.loads(row[0]), **course) if row is not None else course
+                rows.append((doc_id, key, dumps(data), timestamp, timestamp))
+            self.database.conn.executemany(
+                'INSERT INTO courses (id, key, data, created_at, updated_at) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (id) DO UPDATE SET key = excluded.key, data = excluded.data, '
+                'updated_at = excluded.updated_at',
+                rows,
+            )
+        return created, updated
+
+    def watch(self, on_change):
+        # Single process: admin handlers already write through to the catalog
+        return NoWatch()
+
+
+class SQLiteUserRepository(UserRepository):
+    """`users` table in SQLite"""
+    backend = 'sqlite'
+
+    def __init__(self, database):
+        self.database = database
+
+    def _save_interactions(self, entries):
+        timestamp = now()
+        rows = [(str(entry['user_id']), entry['user_id'], timestamp, dumps(entry)) for entry in entries]
+        with self.database.lock, self.database.conn:
+            self.database.conn.executemany(
+                'INSERT INTO users (id, user_id, last_interaction, data) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (id) DO UPDATE SET last_interaction = excluded.last_interaction, '
+                'active = 1, data = excluded.data',
+                rows,
+            )
+
+    def _mark_inactive(self, user_ids):
+        with self.database.lock, self.database.conn:
+            self.database.conn.executemany(
+                'UPDATE users SET active = 0 WHERE id = ?', [(str(user_id),) for user_id in user_ids]
+            )
+
+    def _set_subscribed(self, user_id):
+        with self.database.lock, self.database.conn:
+            self.database.conn.execute(
+                'INSERT INTO users (id, user_id, subscribed, subscription_date) VALUES (?, ?, 1, ?) '
+                'ON CONFLICT (id) DO UPDATE SET subscribed = 1, subscription_date = excluded.subscription_date',
+                (str(user_id), user_id, now()),
+            )
+
+    def _count(self):
+        with self.database.lock:
+            return self.database.conn.execute('SELECT COUNT(*) FROM users').fetchone()[0]
+
+    def _count_subscribed(self):
+        with self.database.lock:
+            return self.database.conn.execute('SELECT COUNT(*) FROM users WHERE subscribed = 1').fetchone()[0]
+
+    def _audience_filter(self, audience):
+        conditions = ['active = 1']
+        params = []
+        if audience.get('subscribed'):
+            conditions.append('subscribed = 1')
+        if audience.get('course_id') is not None:
+            conditions.append('id IN (SELECT user_id FROM user_courses WHERE course_id = ?)')
+            params.append(audience['course_id'])
+        if audience.get('active_since_day') is not None:
+            conditions.append('last_interaction >= ?')
+            params.append(audience['active_since_day'] * 86400)
+        return ' AND '.join(conditions), params
+
+    def _count_audience(self, audience):
+        where, params = self._audience_filter(audience)
+        with self.database.lock:
+            return self.database.conn.execute(f'SELECT COUNT(*) FROM users WHERE {where}', params).fetchone()[0]
+
+    def _page_ids(self, after, limit, audience):
+        where, params = self._audience_filter(audience)
+        with self.database.lock:
+            return self.database.conn.execute(
+                f'SELECT id, user_id FROM users WHERE {where} AND id > ? ORDER BY id LIMIT ?',
+                (*params, after or '', limit),
+            ).fetchall()
+
+
+class SQLiteRegistrationRepository(RegistrationRepository):
+    """`registrations`, `course_stats` and `user_courses` tables in SQLite"""
+    backend = 'sqlite'
+
+    def __init__(self, database):
+        self.database = database
+
+    def _register(self, registration_data, window):
+        course_id = registration_data['course_id']
+        timestamp = now()
+        bucket = int(timestamp // window)
+        registration_id = f"{registration_data['tg_id']}_{course_id}_{bucket}"
+        previous_id = f"{registration_data['tg_id']}_{course_id}_{bucket - 1}"
+        with self.database.lock, self.database.conn:
+            # A repeat just after a bucket boundary finds the registration in the previous bucket
+            recent = self.database.conn.execute(
+                'SELECT 1 FROM registrations WHERE id = ? AND created_at > ?', (previous_id, timestamp - window)
+            ).fetchone()
+            if recent is not None:
+                return previous_id, False
+            inserted = self.database.conn.execute(
+                'INSERT OR IGNORE INTO registrations (id, course_id, tg_id, phone, created_at, data) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (registration_id, course_id, registration_data['tg_id'], registration_data.get('phone'),
+                 timestamp, dumps(registration_data)),
+            ).rowcount
+            if inserted:
+                self.database.conn.execute(
+                    'INSERT INTO course_stats (course_id, enrolled) VALUES (?, 1) '
+                    'ON CONFLICT (course_id) DO UPDATE SET enrolled = enrolled + 1',
+                    (course_id,),
+                )
+                self.database.conn.execute(
+                    'INSERT OR IGNORE INTO user_courses (course_id, user_id) VALUES (?, ?)',
+                    (course_id, str(registration_data['tg_id'])),
+                )
+        return registration_id, bool(inserted)
+
+    def _count(self):
+        with self.database.lock:
+            return self.database.conn.execute('SELECT COUNT(*) FROM registrations').fetchone()[0]
+
+    def _count_since(self, since):
+        with self.database.lock:
+            return self.database.conn.execute(
+                'SELECT COUNT(*) FROM registrations WHERE created_at > ?', (to_timestamp(since),)
+            ).fetchone()[0]
+
+    def _page(self, field, value, since, until, after, limit, fields):
+        conditions = []
+        params = []
+        if field is not None:
+            if field not in REGISTRATION_QUERY_FIELDS:
+                raise ValueError(f"Registrations can't be filtered by {field}")
+            conditions.append(f'{field} = ?')
+            params.append(value)
+        if since is not None:
+            conditions.append('created_at >= ?')
+            params.append(to_timestamp(since))
+        if until is not None:
+            conditions.append('created_at < ?')
+            params.append(to_timestamp(until))
+        if after is not None:
+            created_at, registration_id = after
+            conditions.append('(created_at, id) < (?, ?)')
+            params += [to_timestamp(created_at), registration_id]
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ''
+        sql = f'SELECT id, created_at, data FROM registrations {where}ORDER BY created_at DESC, id DESC LIMIT ?'
+
+        with self.database.lock:
+            rows = self.database.conn.execute(sql, (*params, limit)).fetchall()
+        page = []
+        for registration_id, created_at, data in rows:
+            registration = json.loads(data)
+            if fields is not None:
+                registration = {field: registration[field] for field in fields if field in registration}
+            registration['created_at'] = from_timestamp(created_at)
+            page.append((registration_id, registration))
+        return page
+
+    def _scan(self, fields, after, limit):
+        with self.database.lock:
+            rows = self.database.conn.execute(
+                'SELECT id, created_at, data FROM registrations WHERE id > ? ORDER BY id LIMIT ?',
+                (after or '', limit),
+            ).fetchall()
+        page = []
+        for registration_id, created_at, data in rows:
+            registration = dict(json.loads(data), created_at=from_timestamp(created_at))
+            page.append((registration_id, {field: registration[field] for field in fields if field in registration}))
+        return page
+
+
+class SQLiteBroadcastRepository(BroadcastRepository):
+    """`broadcasts` table in SQLite"""
+    backend = 'sqlite'
+
+    def __init__(self, database):
+        self.database = database
+
+    def _create(self, job):
+        job_id = new_id()
+        timestamp = now()
+        with self.database.lock, self.database.conn:
+            self.database.conn.execute(
+                'INSERT INTO broadcasts (id, status, data, created_at, updated_at) VALUES (?, ?, ?, ?, ?)',
+                (job_id, job['status'], dumps(job), timestamp, timestamp),
+            )
+        return job_id
+
+    def _update(self, job_id, fields):
+        with self.database.lock, self.database.conn:
+            row = self.database.conn.execute('SELECT data FROM broadcasts WHERE id = ?', (job_id,)).fetchone()
+            if row is None:
+                raise KeyError(f"Broadcast not found: {job_id}")
+            data = dict(json.loads(row[0]), **fields)
+            self.database.conn.execute(
+                'UPDATE broadcasts SET status = ?, data = ?, updated_at = ? WHERE id = ?',
+                (data['status'], dumps(data), now(), job_id),
+            )
+
+    def _list_running(self):
+        with self.database.lock:
+            rows = self.database.conn.execute(
+                "SELECT id, data FROM broadcasts WHERE status = 'running'"
+            ).fetchall()
+        return [(job_id, json.loads(data)) for job_id, data in rows]
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Storage backend selection.
+
+The bot only talks to the repositories in repository.py. STORAGE picks their
+implementation: "firestore" (default) is shared between bot processes,
+"sqlite" keeps everything in one local file for single-node deployments and
+lets the bot run fully offline.
+"""
+
+import os
+
+from repository import (
+    LazyFirestore, FirestoreCourseRepository, FirestoreUserRepository,
+    FirestoreRegistrationRepository, FirestoreBroadcastRepository,
+)
+from sqlite_storage import (
+    SQLiteDatabase, SQLiteCourseRepository, SQLiteUserRepository,
+    SQLiteRegistrationRepository, SQLiteBroadcastRepository,
+)
+
+# "firestore" or "sqlite"
+STORAGE = os.getenv("STORAGE", "firestore")
+STORAGE_PATH = os.getenv("STORAGE_PATH", "bot_data.sqlite3")
+
+
+class Storage:
+    """Repositories of one backend"""
+
+    def __init__(self, courses, users, registrations, broadcasts, close=None):
+        self.courses = courses
+        self.users = users
+        self.registrations = registrations
+        self.broadcasts = broadcasts
+        self._close = close
+
+    def close(self):
+        """Release the backend's resources"""
+        if self._close is not None:
+            self._close()
+
+
+def firestore_storage(db):
+    """Repositories backed by a Firestore client"""
+    return Storage(
+        FirestoreCourseRepository(db), FirestoreUserRepository(db),
+        FirestoreRegistrationRepository(db), FirestoreBroadcastRepository(db),
+    )
+
+
+def sqlite_storage(path=STORAGE_PATH):
+    """Repositories backed by a local SQLite file"""
+    database = SQLiteDatabase(path)
+    return Storage(
+        SQLiteCourseRepository(database), SQLiteUserRepository(database),
+        SQLiteRegistrationRepository(database), SQLiteBroadcastRepository(database),
+        close=database.close,
+    )
+
+
+def create_storage(backend=STORAGE, db=None):
+    """Build the configured storage; `db` is the Firestore client to use, lazy by default"""
+    if backend == 'firestore':
+        return firestore_storage(db if db is not None else LazyFirestore())
+    if backend == 'sqlite':
+        return sqlite_storage()
+    raise ValueError(f"Unknown storage backend: {backend}")
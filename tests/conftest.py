@@ -0,0 +1,45 @@
+import os
+import sys
+import asyncio
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_firestore import FakeFirestore  # noqa: E402
+from storage import firestore_storage, sqlite_storage  # noqa: E402
+
+
+@pytest.fixture(params=['firestore', 'sqlite'])
+def storage(request, tmp_path):
+    """Repositories of each backend: in-memory Firestore and a SQLite file"""
+    if request.param == 'firestore':
+        storage = firestore_storage(FakeFirestore())
+    else:
+        storage = sqlite_storage(str(tmp_path / 'bot.sqlite3'))
+    yield storage
+    storage.close()
+
+
+class FakeClock:
+    """Monotonic clock that only moves when asyncio.sleep is awaited"""
+
+    def __init__(self):
+        self.now = 0.0
+        self._sleep = asyncio.sleep
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        # At least a microsecond, like real time passing between two checks
+        self.now += max(seconds, 1e-6)
+        await self._sleep(0)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake clock; asyncio.sleep advances it instead of waiting"""
+    clock = FakeClock()
+    monkeypatch.setattr(asyncio, 'sleep', clock.sleep)
+    return clock
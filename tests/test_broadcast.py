@@ -0,0 +1,158 @@
+import asyncio
+
+from telegram.error import RetryAfter, Forbidden, BadRequest
+
+from broadcast import BroadcastEngine, BROADCAST_MAX_RETRIES
+from ratelimit import TokenBucket
+
+ADMIN_ID = 1
+USERS = [101, 102, 103, 104, 105]
+PAYLOAD = {'kind': 'text', 'text': "Yangi kurs"}
+
+
+class FakeBot:
+    """Records sends and status edits; `errors` maps chat id -> exceptions raised in turn"""
+
+    def __init__(self, errors=None):
+        self.errors = errors or {}
+        self.sent = []
+        self.edits = []
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        if self.errors.get(chat_id):
+            raise self.errors[chat_id].pop(0)
+        self.sent.append(chat_id)
+
+    async def edit_message_text(self, chat_id, message_id, text, parse_mode=None):
+        self.edits.append(text)
+
+
+class FailingUsers:
+    """Users repository whose audience paging fails after `pages` pages"""
+
+    def __init__(self, users_repo, pages):
+        self.users_repo = users_repo
+        self.pages = pages
+
+    def __getattr__(self, name):
+        return getattr(self.users_repo, name)
+
+    async def page_ids(self, *args, **kwargs):
+        if self.pages == 0:
+            raise RuntimeError('storage unavailable')
+        self.pages -= 1
+        return await self.users_repo.page_ids(*args, **kwargs)
+
+
+async def save_users(storage):
+    await storage.users.save_interactions([{'user_id': user_id} for user_id in USERS])
+
+
+async def wait_for_jobs(engine):
+    await asyncio.gather(*list(engine._tasks.values()))
+
+
+def test_failed_broadcast_reports_to_the_admin(storage):
+    bot = FakeBot()
+    engine = BroadcastEngine(storage.broadcasts, FailingUsers(storage.users, pages=1), rate=1000, page_size=2)
+
+    async def scenario():
+        await save_users(storage)
+        await engine.start(bot, ADMIN_ID, 1, PAYLOAD, total=len(USERS))
+        await wait_for_jobs(engine)
+        return await storage.broadcasts.list_running()
+
+    assert asyncio.run(scenario()) == []
+    assert bot.sent == USERS[:2]
+    assert "to'xtadi" in bot.edits[-1]
+    assert 'Yuborildi: 2' in bot.edits[-1]
+
+
+def test_retry_after_pauses_and_retries(storage, clock):
+    bot = FakeBot(errors={102: [RetryAfter(3)], 104: [RetryAfter(1)] * (BROADCAST_MAX_RETRIES + 1)})
+    engine = BroadcastEngine(storage.broadcasts, storage.users, page_size=2)
+    engine.bucket = TokenBucket(1000, clock=clock)
+
+    async def scenario():
+        await save_users(storage)
+        await engine.start(bot, ADMIN_ID, 1, PAYLOAD, total=len(USERS))
+        await wait_for_jobs(engine)
+
+    asyncio.run(scenario())
+    assert sorted(bot.sent) == [101, 102, 103, 105]
+    assert clock.now >= 3
+    # 104 kept hitting flood control and gave up after the retries
+    assert 'Muvaffaqiyatli yuborildi: 4' in bot.edits[-1]
+    assert 'Xatolik: 1' in bot.edits[-1]
+
+
+def test_interrupted_broadcast_resumes_after_its_cursor(storage):
+    bot = FakeBot()
+    engine = BroadcastEngine(storage.broadcasts, storage.users, rate=1000, page_size=2)
+
+    async def scenario():
+        await save_users(storage)
+        # Checkpoint of a job stopped after the first page
+        await storage.broadcasts.create({
+            'admin_chat_id': ADMIN_ID, 'status_message_id': 1, 'payload': PAYLOAD, 'exclude_user_id': None,
+            'audience': {}, 'status': 'running', 'cursor': '102', 'total': len(USERS),
+            'sent': 2, 'failed': 0, 'inactive': 0,
+        })
+        await engine.resume_pending(bot)
+        await wait_for_jobs(engine)
+        return await storage.broadcasts.list_running()
+
+    assert asyncio.run(scenario()) == []
+    assert bot.sent == [103, 104, 105]
+    assert 'Muvaffaqiyatli yuborildi: 5' in bot.edits[-1]
+
+
+def test_stopped_broadcast_keeps_its_checkpoint(storage):
+    engine = BroadcastEngine(storage.broadcasts, storage.users, rate=1000, page_size=2)
+
+    class StuckBot(FakeBot):
+        """Sends of the second page never finish"""
+
+        async def send_message(self, chat_id, text, parse_mode=None):
+            if chat_id > 102:
+                await asyncio.Event().wait()
+            await super().send_message(chat_id, text, parse_mode)
+
+    async def scenario():
+        await save_users(storage)
+        await engine.start(StuckBot(), ADMIN_ID, 1, PAYLOAD, total=len(USERS))
+        # Wait for the first page's checkpoint
+        while [job['cursor'] for _, job in await storage.broadcasts.list_running()] != ['102']:
+            await asyncio.sleep(0.01)
+        await engine.stop()
+        return await storage.broadcasts.list_running()
+
+    running = asyncio.wait_for(scenario(), 10)
+    assert [(job['cursor'], job['sent']) for _, job in asyncio.run(running)] == [('102', 2)]
+
+
+def test_dead_recipients_are_left_out_of_later_broadcasts(storage):
+    bot = FakeBot(errors={
+        102: [Forbidden('Forbidden: bot was blocked by the user')],
+        104: [BadRequest('Bad Request: chat not found')],
+        105: [BadRequest('Bad Request: message is too long')],
+    })
+    engine = BroadcastEngine(storage.broadcasts, storage.users, rate=1000, page_size=2)
+
+    async def scenario():
+        await save_users(storage)
+        await engine.start(bot, ADMIN_ID, 1, PAYLOAD, total=len(USERS))
+        await wait_for_jobs(engine)
+        first_report = bot.edits[-1]
+        active = await storage.users.count_audience()
+
+        await engine.start(bot, ADMIN_ID, 2, PAYLOAD, total=active)
+        await wait_for_jobs(engine)
+        return first_report, active
+
+    first_report, active = asyncio.run(scenario())
+    assert 'Botni bloklagan: 2' in first_report
+    assert 'Xatolik: 3' in first_report
+    # Only the other failure is tried again
+    assert active == 3
+    assert bot.sent == [101, 103, 101, 103, 105]
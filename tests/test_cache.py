@@ -0,0 +1,55 @@
+from cache import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_their_own_ttl():
+    clock = Clock()
+    cache = TTLCache(clock=clock)
+    cache.set('member', True, ttl=60)
+    cache.set('left', False, ttl=10)
+    clock.now = 30
+    assert cache.get('member') is True
+    assert cache.get('left', 'missing') == 'missing'
+    assert len(cache) == 1
+    clock.now = 60
+    assert cache.get('member') is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2, clock=Clock())
+    cache.set('a', 1, ttl=60)
+    cache.set('b', 2, ttl=60)
+    assert cache.get('a') == 1
+    cache.set('c', 3, ttl=60)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+
+
+def test_set_refreshes_an_entry():
+    clock = Clock()
+    cache = TTLCache(maxsize=2, clock=clock)
+    cache.set('a', 1, ttl=10)
+    cache.set('b', 2, ttl=10)
+    cache.set('a', 10, ttl=100)
+    cache.set('c', 3, ttl=10)
+    clock.now = 50
+    assert cache.get('a') == 10
+    assert cache.get('b') is None
+
+
+def test_invalidate_and_clear():
+    cache = TTLCache(clock=Clock())
+    cache.set('a', 1, ttl=60)
+    cache.set('b', 2, ttl=60)
+    cache.invalidate('a')
+    cache.invalidate('missing')
+    assert cache.get('a') is None and cache.get('b') == 2
+    cache.clear()
+    assert len(cache) == 0
@@ -0,0 +1,25 @@
+from catalog import CourseCatalog
+
+
+def build_catalog():
+    catalog = CourseCatalog(repo=None)
+    catalog.put({'id': 'a1', 'name': 'Python dasturlash', 'key': 'python-dasturlash'})
+    catalog.put({'id': 'b2', 'name': 'C++ asoslari', 'key': 'c-plus-plus-asoslari'})
+    return catalog
+
+
+def test_find_by_id_key_or_name():
+    catalog = build_catalog()
+    assert catalog.find('a1')['id'] == 'a1'
+    assert catalog.find('python-dasturlash')['id'] == 'a1'
+    assert catalog.find('C++ Asoslari')['id'] == 'b2'
+    assert catalog.find('C# asoslari') is None
+    assert catalog.find('---') is None
+
+
+def test_renamed_course_is_found_by_its_new_name():
+    catalog = build_catalog()
+    # edit_course_value only changes the name, the import key stays
+    catalog.put(dict(catalog.get('a1'), name='Python backend'))
+    assert catalog.find('Python backend')['id'] == 'a1'
+    assert catalog.find('python-dasturlash')['id'] == 'a1'
@@ -0,0 +1,45 @@
+import asyncio
+
+from import_courses import validated, chunks
+from render import build_course_keyboard, build_audience_keyboard, build_inline_result, COURSE_KEYBOARDS
+
+# Telegram limit for callback_data and inline result ids
+MAX_CALLBACK_BYTES = 64
+
+LONG_NAMES = [
+    "Kompyuter savodxonligi va ofis dasturlari (Word, Excel, PowerPoint)",
+    "Компьютерная грамотность и офисные программы для начинающих",
+]
+
+
+async def import_rows(storage, rows):
+    key_index = await storage.courses.key_index()
+    courses, stats = validated(iter(rows), key_index)
+    for chunk in chunks(courses, 100):
+        await storage.courses.bulk_upsert(chunk, key_index)
+    return stats
+
+
+def test_long_course_names_fit_in_callback_data(storage):
+    rows = [{'name': name, 'duration_weeks': '3', 'price': '100000'} for name in LONG_NAMES]
+    asyncio.run(import_rows(storage, rows))
+    courses = asyncio.run(storage.courses.list())
+    assert len(courses) == len(LONG_NAMES)
+
+    keyboards = [build_course_keyboard(courses, kind) for kind in COURSE_KEYBOARDS]
+    keyboards.append(build_audience_keyboard(courses))
+    callback_data = [
+        button.callback_data for keyboard in keyboards for row in keyboard.inline_keyboard for button in row
+    ]
+    callback_data += [build_inline_result(course, 'bot').id for course in courses]
+    assert all(len(data.encode()) <= MAX_CALLBACK_BYTES for data in callback_data)
+
+
+def test_reimport_updates_courses_with_auto_ids(storage):
+    rows = [{'name': name, 'duration_weeks': '3', 'price': '100000'} for name in LONG_NAMES]
+    asyncio.run(import_rows(storage, rows))
+    asyncio.run(import_rows(storage, [{'name': LONG_NAMES[1], 'price': '150000'}]))
+    courses = {course['name']: course for course in asyncio.run(storage.courses.list())}
+    assert len(courses) == len(LONG_NAMES)
+    assert courses[LONG_NAMES[1]]['price'] == 150000
+    assert courses[LONG_NAMES[1]]['duration_weeks'] == 3
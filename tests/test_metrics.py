@@ -0,0 +1,12 @@
+import asyncio
+
+from metrics import REGISTRY
+
+
+def test_storage_calls_are_labelled_with_their_backend(storage):
+    backend = storage.courses.backend
+    asyncio.run(storage.courses.list())
+
+    text = REGISTRY.render()
+    assert 'firestore_operation' not in text
+    assert f'storage_operation_duration_seconds_count{{backend="{backend}",collection="courses",operation="list"}}' in text
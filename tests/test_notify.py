@@ -0,0 +1,75 @@
+import asyncio
+from types import SimpleNamespace
+
+import notify
+from notify import AdminNotifier, MESSAGE_LIMIT, digest_messages
+
+
+def header(count):
+    return f"<b>{count} ta yangi ro'yxatdan o'tish</b>\n\n"
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append(text)
+
+
+async def wait_for(bot, count):
+    while len(bot.sent) < count:
+        await asyncio.sleep(0)
+
+
+def test_notifier_switches_to_digests_and_back(clock, monkeypatch):
+    monkeypatch.setattr(notify, 'time', SimpleNamespace(monotonic=clock))
+    bot = FakeBot()
+    notifier = AdminNotifier(-100, header, min_interval=1, digest_threshold=3, digest_interval=15)
+
+    async def scenario():
+        notifier.start(bot)
+        notifier.notify('first')
+        await wait_for(bot, 1)
+
+        for i in range(5):
+            notifier.notify(f'text {i}', f'summary {i}')
+        assert notifier.digest_mode
+        await wait_for(bot, 2)
+
+        await asyncio.sleep(61)
+        notifier.notify('quiet again')
+        assert not notifier.digest_mode
+        await wait_for(bot, 3)
+        await notifier.stop()
+
+    asyncio.run(scenario())
+    first, digest, last = bot.sent
+    assert first == 'first' and last == 'quiet again'
+    assert digest.startswith(header(5))
+    assert all(f'summary {i}' in digest for i in range(5))
+    assert 'text 0' not in digest
+
+
+def test_stop_delivers_what_is_still_queued():
+    bot = FakeBot()
+    notifier = AdminNotifier(-100, header)
+
+    async def scenario():
+        notifier._bot = bot
+        notifier.notify('a', 'sa')
+        notifier.notify('b', 'sb')
+        await notifier.stop()
+
+    asyncio.run(scenario())
+    assert bot.sent == [header(2) + 'sa\n\nsb\n\n']
+    assert len(notifier) == 0
+
+
+def test_long_digests_are_split_below_the_message_limit():
+    summaries = [f'{i}: ' + 'x' * 500 for i in range(30)]
+    messages = digest_messages(summaries, header)
+    assert len(messages) > 1
+    assert all(len(message) <= MESSAGE_LIMIT for message in messages)
+    assert messages[0].startswith(header(30))
+    assert ''.join(messages).count('x' * 500) == 30
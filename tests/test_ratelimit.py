@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from ratelimit import TokenBucket, PriorityTokenBucket, SlidingWindowLimiter
+
+
+def test_token_bucket_bursts_then_paces(clock):
+    bucket = TokenBucket(rate=10, capacity=10, clock=clock)
+
+    async def take(count):
+        for _ in range(count):
+            await bucket.acquire()
+
+    asyncio.run(take(10))
+    assert clock.now == 0
+    asyncio.run(take(5))
+    assert clock.now == pytest.approx(0.5, abs=1e-3)
+
+
+def test_token_bucket_pause(clock):
+    bucket = TokenBucket(rate=10, clock=clock)
+    bucket.pause(2)
+    asyncio.run(bucket.acquire())
+    assert clock.now == pytest.approx(2, abs=1e-3)
+
+
+def test_priority_bucket_keeps_a_reserve_for_priority_zero(clock):
+    bucket = PriorityTokenBucket(rate=10, capacity=10, reserve=5, clock=clock)
+
+    async def take(count, priority):
+        for _ in range(count):
+            await bucket.acquire(priority)
+
+    asyncio.run(take(5, priority=1))
+    assert clock.now == 0
+    asyncio.run(take(5, priority=0))
+    assert clock.now == 0
+
+
+def test_priority_bucket_serves_lower_numbers_first():
+    # Real time: the order depends on which waiter wakes up first
+    bucket = PriorityTokenBucket(rate=100, capacity=1)
+    order = []
+
+    async def take(name, priority):
+        await bucket.acquire(priority)
+        order.append(name)
+
+    async def main():
+        await bucket.acquire(0)
+        await asyncio.gather(take('bulk', 1), take('bulk', 1), take('reply', 0))
+
+    asyncio.run(main())
+    assert order == ['reply', 'bulk', 'bulk']
+
+
+def test_sliding_window_limits_each_key():
+    now = [0.0]
+    limiter = SlidingWindowLimiter(limit=3, window=60, clock=lambda: now[0])
+    assert [limiter.hit('a') for _ in range(4)] == [True, True, True, False]
+    assert limiter.hit('b')
+
+    # Halfway through the next window the previous window still counts half
+    now[0] = 90
+    assert [limiter.hit('a') for _ in range(3)] == [True, True, False]
+
+    # Two windows later the old counts are gone
+    now[0] = 200
+    assert [limiter.hit('a') for _ in range(4)] == [True, True, True, False]
+
+
+def test_sliding_window_drops_least_recent_keys():
+    limiter = SlidingWindowLimiter(limit=1, window=60, maxsize=2, clock=lambda: 0)
+    assert limiter.hit('a') and limiter.hit('b')
+    assert not limiter.hit('a')
+    assert limiter.hit('c')
+    assert len(limiter) == 2
+    # 'b' was the least recently seen key, so it starts over
+    assert limiter.hit('b')
+    assert not limiter.hit('c')
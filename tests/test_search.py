@@ -0,0 +1,59 @@
+from search import CourseSearchIndex, fold, tokenize
+
+COURSES = [
+    {'id': 'python', 'name': 'Python dasturlash', 'description': "Boshlang'ich kurs"},
+    {'id': 'frontend', 'name': 'Frontend (JavaScript)', 'description': 'HTML, CSS va Python asoslari'},
+    {'id': 'savodxonlik', 'name': "Kompyuter savodxonligi", 'description': 'Word va Excel'},
+    {'id': 'cpp', 'name': 'C++ asoslari', 'key': 'c-plus-plus-asoslari'},
+    {'id': 'csharp', 'name': 'C# va .NET', 'key': 'c-sharp-va-dot-net'},
+]
+
+
+def build_index():
+    index = CourseSearchIndex()
+    index.rebuild(COURSES)
+    return index
+
+
+def test_alphabets_fold_to_one_spelling():
+    assert tokenize('Python') == tokenize('питон') == tokenize('piton')
+    assert fold("savodxonligi") == fold('саводхонлиги')
+    assert tokenize("o‘zbek") == tokenize("o'zbek") == tokenize('ozbek')
+
+
+def test_prefix_search_while_typing():
+    index = build_index()
+    assert index.search('pyth')[0] == 'python'
+    assert index.search('питон')[0] == 'python'
+    assert index.search('savodx') == ['savodxonlik']
+
+
+def test_every_query_token_must_match():
+    index = build_index()
+    assert index.search('python html') == ['frontend']
+    assert index.search('python go') == []
+
+
+def test_name_matches_rank_above_description_matches():
+    assert build_index().search('python') == ['python', 'frontend']
+
+
+def test_symbols_keep_courses_apart():
+    index = build_index()
+    assert index.search('c++') == ['cpp']
+    assert index.search('c#') == ['csharp']
+    assert set(index.search('c')) >= {'cpp', 'csharp'}
+
+
+def test_empty_query_lists_all_courses_by_name():
+    assert build_index().search('') == ['csharp', 'cpp', 'frontend', 'savodxonlik', 'python']
+
+
+def test_incremental_updates():
+    index = build_index()
+    index.put({'id': 'python', 'name': 'Data Science'})
+    assert index.search('pyth') == ['frontend']
+    assert index.search('data') == ['python']
+    index.remove('frontend')
+    assert index.search('pyth') == []
+    assert len(index) == len(COURSES) - 1
@@ -0,0 +1,230 @@
+"""The Firestore and SQLite backends give the same results for the same repository calls"""
+
+import time
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from fake_firestore import FakeFirestore
+from storage import firestore_storage, sqlite_storage
+
+TIMESTAMPS = {'created_at', 'updated_at', 'last_interaction', 'last_seen_day', 'subscription_date', 'deactivated_at'}
+
+
+def without_timestamps(data):
+    return {field: value for field, value in data.items() if field not in TIMESTAMPS}
+
+
+def on_both_backends(tmp_path, scenario):
+    """Run `scenario(storage)` on Firestore (in-memory fake) and SQLite and return the common result"""
+    backends = {
+        'firestore': lambda: firestore_storage(FakeFirestore()),
+        'sqlite': lambda: sqlite_storage(str(tmp_path / 'bot.sqlite3')),
+    }
+    results = {}
+    for name, create in backends.items():
+        storage = create()
+        try:
+            results[name] = asyncio.run(scenario(storage))
+        finally:
+            storage.close()
+    assert results['firestore'] == results['sqlite']
+    return results['sqlite']
+
+
+def test_course_crud(tmp_path):
+    async def scenario(storage):
+        python_id = await storage.courses.add({'name': 'Python', 'key': 'python', 'price': 100, 'created_by': 1})
+        frontend_id = await storage.courses.add({'name': 'Frontend', 'key': 'frontend', 'price': 200})
+        await storage.courses.update(python_id, {'price': 150, 'updated_by': 2})
+        python = await storage.courses.get(python_id)
+        await storage.courses.delete(frontend_id)
+        return {
+            'python': without_timestamps(dict(python, id=python['id'] == python_id)),
+            'deleted': await storage.courses.get(frontend_id),
+            'names': sorted(course['name'] for course in await storage.courses.list()),
+            'keys': sorted(await storage.courses.key_index()),
+        }
+
+    result = on_both_backends(tmp_path, scenario)
+    assert result['python'] == {
+        'name': 'Python', 'key': 'python', 'price': 150, 'created_by': 1, 'updated_by': 2, 'id': True,
+    }
+    assert result['deleted'] is None
+    assert result['names'] == ['Python']
+    assert result['keys'] == ['python']
+
+
+def test_key_index_falls_back_to_the_name(tmp_path):
+    async def scenario(storage):
+        await storage.courses.add({'name': 'C++ asoslari'})
+        return sorted(await storage.courses.key_index())
+
+    assert on_both_backends(tmp_path, scenario) == ['c-plus-plus-asoslari']
+
+
+def test_bulk_upsert_merges_into_existing_courses(tmp_path):
+    async def scenario(storage):
+        key_index = await storage.courses.key_index()
+        first = await storage.courses.bulk_upsert([
+            {'key': 'python', 'name': 'Python', 'price': 100, 'duration_weeks': 3, 'description': ''},
+            {'key': 'go', 'name': 'Golang', 'price': 200, 'duration_weeks': 4, 'description': ''},
+        ], key_index)
+        await storage.courses.update(key_index['python'], {'description': 'Admin matni', 'updated_by': 7})
+        # A price-only refresh keeps every other field
+        second = await storage.courses.bulk_upsert(
+            [{'key': 'python', 'name': 'Python', 'price': 150}], await storage.courses.key_index()
+        )
+        courses = sorted(await storage.courses.list(), key=lambda course: course['key'])
+        ids_match = [course['id'] == key_index[course['key']] for course in courses]
+        # Ids are random, compare the documents without them
+        return first, second, ids_match, [without_timestamps(dict(course, id=None)) for course in courses]
+
+    first, second, ids_match, courses = on_both_backends(tmp_path, scenario)
+    assert first == (2, 0)
+    assert second == (0, 1)
+    assert ids_match == [True, True]
+    assert courses[1] == {
+        'id': None, 'key': 'python', 'name': 'Python', 'price': 150, 'duration_weeks': 3,
+        'description': 'Admin matni', 'updated_by': 7,
+    }
+
+
+def test_registrations(tmp_path):
+    since = datetime.now(timezone.utc) - timedelta(minutes=1)
+
+    async def scenario(storage):
+        await storage.users.save_interactions([{'user_id': user_id} for user_id in (101, 102, 103)])
+        created = []
+        for user_id, course_id in ((101, 'python'), (102, 'python'), (103, 'go'), (101, 'python')):
+            registration = {'tg_id': user_id, 'course_id': course_id, 'phone': f'+998{user_id}', 'name': 'Ali'}
+            created.append((await storage.registrations.register(registration))[1])
+
+        first = await storage.registrations.page(limit=2)
+        rest = await storage.registrations.page(after=(first[-1][1]['created_at'], first[-1][0]), limit=2)
+        python = await storage.registrations.page(field='course_id', value='python', fields=['tg_id'])
+        scan = await storage.registrations.scan(['tg_id', 'course_id'])
+        return {
+            'created': created,
+            'count': await storage.registrations.count(),
+            'count_since': await storage.registrations.count_since(since),
+            'pages': [[registration_id for registration_id, _ in page] for page in (first, rest)],
+            'python': [without_timestamps(registration) for _, registration in python],
+            'scan': scan,
+            'python_audience': await storage.users.count_audience({'course_id': 'python'}),
+        }
+
+    result = on_both_backends(tmp_path, scenario)
+    assert result['created'] == [True, True, True, False]
+    assert result['count'] == result['count_since'] == 3
+    assert [tg_id.split('_')[0] for page in result['pages'] for tg_id in page] == ['103', '102', '101']
+    assert result['python'] == [{'tg_id': 102}, {'tg_id': 101}]
+    assert [registration for _, registration in result['scan']] == [
+        {'tg_id': 101, 'course_id': 'python'}, {'tg_id': 102, 'course_id': 'python'}, {'tg_id': 103, 'course_id': 'go'},
+    ]
+    assert result['python_audience'] == 2
+
+
+def test_user_audiences(tmp_path):
+    async def scenario(storage):
+        await storage.users.save_interactions([{'user_id': user_id, 'first_name': 'Ali'} for user_id in range(101, 106)])
+        await storage.users.set_subscribed(102)
+        await storage.users.set_subscribed(103)
+        await storage.users.mark_inactive([103, 104])
+
+        first = await storage.users.page_ids(limit=2)
+        rest = await storage.users.page_ids(after=first[-1][0], limit=2)
+        return {
+            'count': await storage.users.count(),
+            'subscribed': await storage.users.count_subscribed(),
+            'active': await storage.users.count_audience(),
+            'active_subscribed': await storage.users.count_audience({'subscribed': True}),
+            'pages': [list(page) for page in (first, rest)],
+        }
+
+    assert on_both_backends(tmp_path, scenario) == {
+        'count': 5,
+        'subscribed': 2,
+        'active': 3,
+        'active_subscribed': 1,
+        'pages': [[('101', 101), ('102', 102)], [('105', 105)]],
+    }
+
+
+def test_broadcast_checkpoints(tmp_path):
+    async def scenario(storage):
+        job_id = await storage.broadcasts.create({'status': 'running', 'audience': {}, 'sent': 0})
+        await storage.broadcasts.update(job_id, {'cursor': '105', 'sent': 5})
+        running = [(found == job_id, without_timestamps(job)) for found, job in await storage.broadcasts.list_running()]
+        await storage.broadcasts.update(job_id, {'status': 'done'})
+        return running, await storage.broadcasts.list_running()
+
+    running, after_done = on_both_backends(tmp_path, scenario)
+    assert running == [(True, {'status': 'running', 'audience': {}, 'sent': 5, 'cursor': '105'})]
+    assert after_done == []
+
+
+
+def test_repeat_registration_across_a_bucket_boundary(tmp_path, monkeypatch):
+    window = 3600
+    real_now = time.time()
+    boundary = real_now // window * window
+    clock = [boundary - 1]
+    monkeypatch.setattr(time, 'time', lambda: clock[0])
+    registration = {'tg_id': 101, 'course_id': 'python', 'phone': '+998101', 'name': 'Ali'}
+
+    async def scenario(storage):
+        clock[0] = boundary - 1
+        first = await storage.registrations.register(registration, window)
+        # Double tap two seconds later, in the next bucket
+        clock[0] = boundary + 1
+        repeat = await storage.registrations.register(registration, window)
+        clock[0] = real_now + window + 5
+        later = await storage.registrations.register(registration, window)
+        return first, repeat, later[1], await storage.registrations.count()
+
+    first, repeat, later_created, count = on_both_backends(tmp_path, scenario)
+    assert first[1] is True
+    assert repeat == (first[0], False)
+    assert later_created is True
+    assert count == 2
+
+
+def test_paging_walks_every_registration_once_with_tied_timestamps(tmp_path, monkeypatch):
+    import fake_firestore
+
+    frozen = datetime.now(timezone.utc).replace(microsecond=0)
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return frozen
+
+    # Every registration gets the same created_at, so only the id breaks ties
+    monkeypatch.setattr(time, 'time', lambda: frozen.timestamp())
+    monkeypatch.setattr(fake_firestore, 'datetime', FrozenDatetime)
+
+    async def scenario(storage):
+        for user_id in range(101, 108):
+            registration = {'tg_id': user_id, 'course_id': 'python', 'phone': f'+998{user_id}', 'name': 'Ali'}
+            await storage.registrations.register(registration)
+
+        # Same walk as the /registrations browser: one extra row detects the next page
+        cursors, pages = [None], []
+        while True:
+            cursor = cursors[-1]
+            rows = await storage.registrations.page(
+                field='course_id', value='python', limit=3,
+                after=(cursor['created_at'], cursor['id']) if cursor else None, fields=['tg_id'],
+            )
+            pages.append([registration['tg_id'] for _, registration in rows[:2]])
+            if len(rows) <= 2:
+                return pages, cursors
+            last_id, last = rows[1]
+            cursors.append({'created_at': last['created_at'], 'id': last_id})
+
+    pages, cursors = on_both_backends(tmp_path, scenario)
+    walked = [tg_id for page in pages for tg_id in page]
+    assert sorted(walked) == list(range(101, 108))
+    assert [len(page) for page in pages] == [2, 2, 2, 1]
+    # Cursors are persisted in user_data, which must not hold nested arrays
+    assert all(isinstance(cursor, dict) for cursor in cursors[1:])
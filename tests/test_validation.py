@@ -0,0 +1,42 @@
+import pytest
+
+from validation import course_key, parse_course, parse_course_name
+from import_courses import validated
+
+
+def test_course_keys_keep_symbols_apart():
+    names = ['C++', 'C#', 'C', '.NET', 'NET', 'Node.js', 'Node JS']
+    assert len({course_key(name) for name in names}) == len(names)
+    assert course_key('C++') == 'c-plus-plus'
+    assert course_key('Mobil Dasturlash (Flutter)') == 'mobil-dasturlash-flutter'
+    assert course_key('Frontend.') == course_key('frontend')
+
+
+def test_names_without_letters_or_digits_are_rejected():
+    with pytest.raises(ValueError):
+        parse_course_name('---')
+
+
+def test_parse_course_returns_only_present_fields():
+    assert parse_course({'name': ' Python ', 'price': '150', 'description': ''}) == {'name': 'Python', 'price': 150}
+    with pytest.raises(ValueError):
+        parse_course({'price': '150'})
+    with pytest.raises(ValueError):
+        parse_course({'name': 'Python', 'price': '-1'})
+
+
+def test_import_rows_validation():
+    rows = [
+        {'name': 'C++', 'duration_weeks': '3', 'price': '100'},
+        {'name': 'C# asoslari', 'duration_weeks': '3', 'price': '100'},
+        {'name': 'Python', 'price': '150'},             # existing course, price refresh
+        {'name': 'Golang', 'price': '200'},             # new course without a duration
+        {'name': 'c++', 'price': '120'},                # same course again
+        {'name': 'Other C++', 'key': 'C++', 'duration_weeks': '3', 'price': '100'},  # key already taken
+        {'name': 'Kotlin', 'key': '--', 'duration_weeks': '3', 'price': '100'},
+    ]
+    courses, stats = validated(iter(rows), key_index={'python': 'python'})
+    assert [(course['key'], course.get('description')) for course in courses] == [
+        ('c-plus-plus', ''), ('c-sharp-asoslari', ''), ('python', None), ('c-plus-plus', None),
+    ]
+    assert stats['invalid'] == 3
@@ -0,0 +1,81 @@
+import json
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from telegram import Bot
+
+from webserver import WebServer, webhook_handler, MAX_BODY_SIZE
+
+SECRET = 'sekret'
+
+
+async def request(port, raw):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(raw)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return int(response.split(b' ', 2)[1])
+
+
+def post(body, secret=SECRET, length=None):
+    headers = f'X-Telegram-Bot-Api-Secret-Token: {secret}\r\n' if secret is not None else ''
+    length = len(body) if length is None else length
+    return f'POST /webhook HTTP/1.1\r\n{headers}Content-Length: {length}\r\n\r\n'.encode() + body
+
+
+def serve(*requests):
+    """Status codes of raw requests sent to a server with the webhook route; and the queued updates"""
+    application = SimpleNamespace(bot=Bot('123456:TEST'), update_queue=asyncio.Queue())
+
+    async def main():
+        server = WebServer('127.0.0.1', 0)
+        server.route('POST', '/webhook', webhook_handler(application, SECRET))
+        await server.start()
+        port = server._server.sockets[0].getsockname()[1]
+        try:
+            return [await request(port, raw) for raw in requests]
+        finally:
+            await server.stop()
+
+    statuses = asyncio.run(main())
+    queued = []
+    while not application.update_queue.empty():
+        queued.append(application.update_queue.get_nowait())
+    return statuses, queued
+
+
+def test_webhook_queues_updates_with_the_secret():
+    statuses, queued = serve(post(json.dumps({'update_id': 7}).encode()))
+    assert statuses == [200]
+    assert [update.update_id for update in queued] == [7]
+
+
+def test_webhook_rejects_a_wrong_or_missing_secret():
+    body = json.dumps({'update_id': 7}).encode()
+    statuses, queued = serve(post(body, secret='wrong'), post(body, secret=None))
+    assert statuses == [403, 403]
+    assert queued == []
+
+
+def test_webhook_requires_a_secret():
+    with pytest.raises(ValueError):
+        webhook_handler(SimpleNamespace(), '')
+
+
+def test_bad_requests():
+    statuses, _ = serve(
+        post(b'not json'),
+        b'GARBAGE\r\n\r\n',
+        b'POST /webhook HTTP/1.1\r\nContent-Length: ten\r\n\r\n',
+        b'POST /webhook HTTP/1.1\r\nContent-Length: -1\r\n\r\n',
+        b'GET /missing HTTP/1.1\r\n\r\n',
+    )
+    assert statuses == [400, 400, 400, 400, 404]
+
+
+def test_oversized_body_is_refused_unread():
+    statuses, queued = serve(post(b'', length=MAX_BODY_SIZE + 1))
+    assert statuses == [413]
+    assert queued == []
@@ -0,0 +1,58 @@
+import asyncio
+from collections import Counter
+
+from telegram import Bot, Update
+
+from workers import HashRing, WorkerPool, shard_of
+
+USERS = range(100000, 110000)
+
+
+def test_shard_is_stable_and_in_range():
+    assert all(0 <= shard_of(user_id, 4) < 4 for user_id in USERS)
+    ring = HashRing(range(4))
+    assert [shard_of(user_id, 4) for user_id in USERS] == [ring.get(user_id) for user_id in USERS]
+
+
+def test_users_are_spread_over_workers():
+    counts = Counter(shard_of(user_id, 4) for user_id in USERS)
+    assert sorted(counts) == [0, 1, 2, 3]
+    assert all(0.15 < count / len(USERS) < 0.35 for count in counts.values())
+
+
+def test_adding_a_worker_moves_only_its_share():
+    moved = [user_id for user_id in USERS if shard_of(user_id, 4) != shard_of(user_id, 5)]
+    assert all(shard_of(user_id, 5) == 4 for user_id in moved)
+    assert 0.1 < len(moved) / len(USERS) < 0.3
+
+
+def test_single_worker_gets_everything():
+    assert {shard_of(user_id, 1) for user_id in USERS} == {0}
+
+
+class FakeProcess:
+    def __init__(self, alive):
+        self.alive = alive
+        self.exitcode = None if alive else 1
+
+    def is_alive(self):
+        return self.alive
+
+
+def test_dispatch_restarts_a_dead_worker():
+    pool = WorkerPool(target=None, workers=2)
+    pool.processes = [FakeProcess(alive=True), FakeProcess(alive=False)]
+    spawned = []
+    pool._spawn = lambda index: spawned.append(index) or pool.processes.__setitem__(index, FakeProcess(alive=True))
+
+    bot = Bot('123456:TEST')
+    user_ids = {shard_of(user_id, 2): user_id for user_id in USERS}
+    for index in (0, 1, 1):
+        update = Update.de_json({'update_id': index, 'message': {
+            'message_id': 1, 'date': 0, 'chat': {'id': user_ids[index], 'type': 'private'},
+            'from': {'id': user_ids[index], 'is_bot': False, 'first_name': 'Ali'}, 'text': '/start',
+        }}, bot)
+        asyncio.run(pool.dispatch(update))
+
+    assert spawned == [1]
+    assert pool.queues[1].get(timeout=5)['update_id'] == 1
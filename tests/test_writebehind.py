@@ -0,0 +1,70 @@
+import asyncio
+
+from telegram import Bot, Update
+
+from repository import current_day
+from writebehind import InteractionBuffer
+
+USER = {'id': 101, 'is_bot': False, 'first_name': 'Ali', 'username': 'ali'}
+
+
+def callback_update(user=USER):
+    return Update.de_json({'update_id': 1, 'callback_query': {
+        'id': '1', 'from': user, 'chat_instance': '1', 'data': 'regs:next',
+    }}, Bot('123456:TEST'))
+
+
+def test_any_update_moves_the_user_into_the_recent_audience(storage):
+    buffer = InteractionBuffer(storage.users)
+    recent = {'active_since_day': current_day() - 7}
+
+    async def scenario():
+        before = await storage.users.count_audience(recent)
+        await buffer.record(callback_update(), None)
+        await buffer.flush()
+        return before, await storage.users.count_audience(recent)
+
+    assert asyncio.run(scenario()) == (0, 1)
+
+
+def test_membership_updates_are_not_activity(storage):
+    buffer = InteractionBuffer(storage.users)
+    update = Update.de_json({'update_id': 1, 'chat_member': {
+        'chat': {'id': -100, 'type': 'channel'}, 'from': USER, 'date': 0,
+        'old_chat_member': {'status': 'member', 'user': USER},
+        'new_chat_member': {'status': 'left', 'user': USER},
+    }}, Bot('123456:TEST'))
+    asyncio.run(buffer.record(update, None))
+    assert len(buffer) == 0
+
+
+class FlakyUsers:
+    """Fails the first save; the user taps again while it is in flight"""
+
+    def __init__(self):
+        self.buffer = None
+        self.saved = []
+        self.calls = 0
+
+    async def save_interactions(self, entries):
+        self.calls += 1
+        if self.calls == 1:
+            self.buffer.add(101, 'ali_new', 'Ali')
+            raise RuntimeError('deadline exceeded')
+        self.saved.extend(entries)
+
+
+def test_failed_flush_is_retried_and_newer_entries_win():
+    users = FlakyUsers()
+    buffer = InteractionBuffer(users)
+    users.buffer = buffer
+    buffer.add(101, 'ali', 'Ali')
+    buffer.add(102, 'vali', 'Vali')
+
+    asyncio.run(buffer.flush())
+    assert len(buffer) == 2 and users.saved == []
+
+    asyncio.run(buffer.flush())
+    assert len(buffer) == 0
+    assert sorted((e['user_id'], e['username']) for e in users.saved) == [
+        (101, 'ali_new'), (102, 'vali')]
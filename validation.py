@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Course field validation shared by the admin handlers and import_courses.py.
+
+Parsers return the cleaned value or raise ValueError with a message that can
+be shown to the admin.
+"""
+
+import re
+
+MIN_COURSE_NAME_LENGTH = 3
+MIN_DURATION, MAX_DURATION = 1, 24
+
+# Symbols that tell course names apart ("C++", "C#", ".NET"), kept in the key
+KEY_SYMBOLS = {'+': ' plus ', '#': ' sharp ', '.': ' dot '}
+KEY_SYMBOL_RE = re.compile(r'[+#]|\.(?=\w)')
+
+
+def parse_course_name(value):
+    """Validate course name"""
+    name = str(value).strip()
+    if len(name) < MIN_COURSE_NAME_LENGTH:
+        raise ValueError("Kurs nomi juda qisqa! Kamida 3 ta harf bo'lishi kerak.")
+    if not course_key(name):
+        raise ValueError("Kurs nomida harf yoki raqam bo'lishi kerak!")
+    return name
+
+
+def parse_course_duration(value):
+    """Validate course duration (months)"""
+    try:
+        duration = int(str(value).strip())
+    except ValueError:
+        raise ValueError("Iltimos, faqat raqam kiriting!")
+    if duration < MIN_DURATION or duration > MAX_DURATION:
+        raise ValueError("Davomiylik 1 dan 24 oygacha bo'lishi kerak!")
+    return duration
+
+
+def parse_course_price(value):
+    """Validate course price (so'm)"""
+    try:
+        price = int(str(value).strip())
+    except ValueError:
+        raise ValueError("Iltimos, faqat raqam kiriting!")
+    if price < 0:
+        raise ValueError("Narx manfiy bo'lishi mumkin emas!")
+    return price
+
+
+def parse_course_description(value):
+    """Normalize course description"""
+    description = str(value or '').strip()
+    if description.lower() == "yo'q":
+        return ""
+    return description
+
+
+REQUIRED_COURSE_FIELDS = ('duration_weeks', 'price')
+
+COURSE_FIELD_PARSERS = {
+    'name': parse_course_name,
+    'duration_weeks': parse_course_duration,
+    'price': parse_course_price,
+    'description': parse_course_description,
+}
+
+
+def course_key(name):
+    """Stable course key used for idempotent imports"""
+    text = KEY_SYMBOL_RE.sub(lambda match: KEY_SYMBOLS[match.group()], str(name).casefold())
+    return re.sub(r'\W+', '-', text).strip('-')
+
+
+def parse_course(row):
+    """Validate the fields present in a course record (e.g. an import row); the name is required"""
+    course = {'name': parse_course_name(row.get('name', ''))}
+    for field, parser in COURSE_FIELD_PARSERS.items():
+        value = row.get(field)
+        if field != 'name' and value is not None and str(value).strip():
+            course[field] = parser(value)
+    return course
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Minimal asyncio HTTP server for webhook mode.
+
+Serves the Telegram webhook endpoint (with secret token check) and a health
+endpoint, and feeds updates straight into the Application update queue.
+"""
+
+import json
+import hmac
+import signal
+import asyncio
+import logging
+
+from telegram import Update
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_SIZE = 1024 * 1024
+READ_TIMEOUT = 10
+
+REASONS = {200: 'OK', 400: 'Bad Request', 403: 'Forbidden', 404: 'Not Found',
+           413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+class PayloadTooLarge(Exception):
+    """Request body over MAX_BODY_SIZE"""
+
+
+class Request:
+    """Parsed HTTP request"""
+
+    def __init__(self, method, path, headers, body):
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.body = body
+
+
+def json_response(status, data):
+    """Build a JSON response tuple"""
+    return status, 'application/json', json.dumps(data).encode()
+
+
+class WebServer:
+    """Tiny HTTP/1.1 server, one request per connection"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.routes = {}
+        self._server = None
+
+    def route(self, method, path, handler):
+        """Register `async handler(request) -> (status, content_type, body)`"""
+        self.routes[(method, path)] = handler
+
+    async def start(self):
+        """Start listening"""
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info(f"HTTP server listening on {self.host}:{self.port}")
+
+    async def stop(self):
+        """Stop listening and wait for open connections"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _read_request(self, reader):
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        method, target, _ = request_line.decode('latin-1').split(' ', 2)
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get('content-length', '0'))
+        if length < 0:
+            raise ValueError('negative content length')
+        if length > MAX_BODY_SIZE:
+            raise PayloadTooLarge
+        body = await reader.readexactly(length) if length else b''
+        return Request(method, target.split('?', 1)[0], headers, body)
+
+    async def _handle(self, reader, writer):
+        try:
+            try:
+                request = await asyncio.wait_for(self._read_request(reader), READ_TIMEOUT)
+            except PayloadTooLarge:
+                request = None
+                response = (413, 'text/plain', b'')
+            except ValueError:
+                # Malformed request line or Content-Length
+                request = None
+                response = (400, 'text/plain', b'')
+            else:
+                if request is None:
+                    return
+                handler = self.routes.get((request.method, request.path))
+                if handler is None:
+                    response = (404, 'text/plain', b'')
+                else:
+                    try:
+                        response = await handler(request)
+                    except Exception as e:
+                        logger.error(f"HTTP handler error: {e}")
+                        response = (500, 'text/plain', b'')
+
+            status, content_type, body = response
+            writer.write(
+                f'HTTP/1.1 {status} {REASONS.get(status, "")}\r\n'
+                f'Content-Type: {content_type}\r\n'
+                f'Content-Length: {len(body)}\r\n'
+                f'Connection: close\r\n\r\n'.encode('latin-1') + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def webhook_handler(application, secret_token):
+    """Route that validates the secret token and queues the update"""
+    if not secret_token:
+        raise ValueError('A webhook secret token is required')
+
+    async def handle(request):
+        received = request.headers.get('x-telegram-bot-api-secret-token', '')
+        if not hmac.compare_digest(received.encode('latin-1'), secret_token.encode()):
+            return 403, 'text/plain', b''
+        try:
+            update = Update.de_json(json.loads(request.body), application.bot)
+        except Exception as e:
+            logger.error(f"Invalid webhook payload: {e}")
+            return 400, 'text/plain', b''
+        await application.update_queue.put(update)
+        return 200, 'text/plain', b''
+
+    return handle
+
+
+def health_handler(application):
+    """Route reporting whether the bot is running"""
+    async def handle(request):
+        status = 200 if application.running else 503
+        return json_response(status, {
+            'status': 'ok' if application.running else 'stopped',
+            'pending_updates': application.update_queue.qsize(),
+        })
+
+    return handle
+
+
+async def run_webhook(application, server, webhook_url, secret_token, allowed_updates):
+    """Run the application behind our HTTP server until SIGINT/SIGTERM"""
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            pass
+
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+
+        # Pending updates are kept, Telegram delivers them once the webhook is set
+        await application.bot.set_webhook(
+            url=webhook_url,
+            secret_token=secret_token,
+            allowed_updates=allowed_updates,
+            drop_pending_updates=False,
+        )
+        await application.start()
+        await server.start()
+        logger.info(f"Webhook mode: {webhook_url}")
+
+        await stop_event.wait()
+    finally:
+        await server.stop()
+        if application.running:
+            await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Multi-process update processing.
+
+With WORKERS > 1 the main process only receives updates (long polling or the
+webhook) and hands each one to a worker process, chosen by a consistent hash
+of the user id. A user's updates always reach the same worker, in order, so
+ConversationHandler state and per-user ordering work as in one process.
+Changing WORKERS moves only about 1/WORKERS of the users to another worker.
+
+Each worker runs the full Application and reads its updates from a
+multiprocessing queue. Workers are started with `spawn`, so none of them
+inherits the front process's network clients or threads.
+"""
+
+import os
+import bisect
+import signal
+import asyncio
+import hashlib
+import logging
+import functools
+import multiprocessing
+from queue import Empty, Full
+
+from telegram import Update
+
+from update_processor import update_key
+
+logger = logging.getLogger(__name__)
+
+WORKERS = int(os.getenv("WORKERS", "1"))
+WORKER_QUEUE_SIZE = int(os.getenv("WORKER_QUEUE_SIZE", "1000"))
+WORKER_START_TIMEOUT = float(os.getenv("WORKER_START_TIMEOUT", "60"))
+WORKER_STOP_TIMEOUT = 30
+HASH_RING_REPLICAS = 100
+QUEUE_POLL_INTERVAL = 1.0
+QUEUE_DRAIN_BATCH = 100
+
+
+def _hash(text):
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """Consistent hash ring of worker indexes"""
+
+    def __init__(self, nodes, replicas=HASH_RING_REPLICAS):
+        points = sorted((_hash(f'{node}:{replica}'), node) for node in nodes for replica in range(replicas))
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def get(self, key):
+        """Node owning `key`"""
+        index = bisect.bisect(self._hashes, _hash(str(key))) % len(self._hashes)
+        return self._nodes[index]
+
+
+@functools.lru_cache(maxsize=8)
+def hash_ring(workers):
+    return HashRing(range(workers))
+
+
+def shard_of(key, workers):
+    """Worker index for a user (or chat) id"""
+    return hash_ring(workers).get(key)
+
+
+class WorkerPool:
+    """Worker processes and the queues feeding them
+
+    `target(index, workers, queue, ready)` runs in each worker process; it
+    processes updates from `queue` until it reads None and sets `ready` once
+    it is serving.
+    """
+
+    def __init__(self, target, workers=WORKERS, queue_size=WORKER_QUEUE_SIZE, args=()):
+        self.target = target
+        self.workers = workers
+        self.args = args
+        self._context = multiprocessing.get_context('spawn')
+        self.queues = [self._context.Queue(queue_size) for _ in range(workers)]
+        self.ready = [self._context.Event() for _ in range(workers)]
+        self.processes = [None] * workers
+
+    def _spawn(self, index):
+        self.ready[index].clear()
+        process = self._context.Process(
+            target=self.target,
+            args=(index, self.workers, self.queues[index], self.ready[index], *self.args),
+            name=f'bot-worker-{index}',
+        )
+        process.start()
+        self.processes[index] = process
+
+    def start(self, timeout=WORKER_START_TIMEOUT):
+        """Start the workers and wait until they serve"""
+        for index in range(self.workers):
+            self._spawn(index)
+        for index, ready in enumerate(self.ready):
+            if not ready.wait(timeout):
+                logger.warning(f"Worker {index} not ready after {timeout}s, its updates are queued")
+        logger.info(f"Started {self.workers} update workers")
+
+    def worker_for(self, update):
+        """Worker index of an update: by user, then chat"""
+        key = update_key(update)
+        return shard_of(key if key is not None else 0, self.workers)
+
+    async def dispatch(self, update, context=None):
+        """Queue an update for its worker (usable as a handler callback)"""
+        index = self.worker_for(update)
+        data = update.to_dict()
+        # The queue survives the process, a restarted worker picks it up
+        process = self.processes[index]
+        if process is not None and not process.is_alive():
+            logger.error(f"Worker {index} exited with {process.exitcode}, restarting")
+            self._spawn(index)
+        try:
+            self.queues[index].put_nowait(data)
+        except Full:
+            await asyncio.to_thread(self.queues[index].put, data)
+
+    def stop(self, timeout=WORKER_STOP_TIMEOUT):
+        """Let the workers finish queued updates and exit"""
+        for index, queue in enumerate(self.queues):
+            if self.processes[index] is not None:
+                queue.put(None)
+        for index, process in enumerate(self.processes):
+            if process is None:
+                continue
+            process.join(timeout)
+            if process.is_alive():
+                logger.error(f"Worker {index} did not stop in {timeout}s, terminating")
+                process.terminate()
+                process.join()
+
+
+async def serve_queue(application, queue, ready=None):
+    """Run the application on updates from `queue` until None or SIGTERM"""
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    # Ctrl+C reaches the whole process group; the front process stops the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        loop.add_signal_handler(signal.SIGTERM, stop_event.set)
+    except NotImplementedError:
+        pass
+
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        if ready is not None:
+            ready.set()
+
+        while not stop_event.is_set():
+            # Backpressure: leave updates in the bounded queue while busy
+            if application.update_queue.qsize() >= QUEUE_DRAIN_BATCH:
+                await asyncio.sleep(0.01)
+                continue
+            try:
+                data = await asyncio.to_thread(queue.get, True, QUEUE_POLL_INTERVAL)
+            except Empty:
+                continue
+
+            # Take what is already queued without a thread hop per update
+            batch = [data]
+            while data is not None and len(batch) < QUEUE_DRAIN_BATCH:
+                try:
+                    data = queue.get_nowait()
+                except Empty:
+                    break
+                batch.append(data)
+
+            for data in batch:
+                if data is None:
+                    stop_event.set()
+                    break
+                await application.update_queue.put(Update.de_json(data, application.bot))
+
+        # Application.stop() only waits for updates it is already processing
+        await application.update_queue.join()
+    finally:
+        if application.running:
+            await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Write-behind buffer for user interaction updates.
+
+Every update from a user bumps `last_interaction` (activity audiences of
+broadcasts depend on it), so the write is taken off the reply path: updates are coalesced per user in memory and flushed in batches
+every INTERACTION_FLUSH_INTERVAL_MS or once INTERACTION_FLUSH_SIZE users are
+pending.
+"""
+
+import os
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+INTERACTION_FLUSH_INTERVAL_MS = int(os.getenv("INTERACTION_FLUSH_INTERVAL_MS", "2000"))
+INTERACTION_FLUSH_SIZE = int(os.getenv("INTERACTION_FLUSH_SIZE", "200"))
+
+
+class InteractionBuffer:
+    """Coalesces per-user interaction updates and writes them in batches"""
+
+    def __init__(self, users_repo, interval_ms=INTERACTION_FLUSH_INTERVAL_MS, max_entries=INTERACTION_FLUSH_SIZE):
+        self.users_repo = users_repo
+        self.interval = interval_ms / 1000
+        self.max_entries = max_entries
+        self._pending = {}
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def add(self, user_id, username, first_name):
+        """Queue an interaction; the latest profile data per user wins"""
+        self._pending[user_id] = {
+            'user_id': user_id,
+            'username': username or '',
+            'first_name': first_name or '',
+        }
+        if len(self._pending) >= self.max_entries:
+            self._wakeup.set()
+
+    async def record(self, update, context):
+        """Update handler: queue the interaction of the update's user"""
+        user = update.effective_user
+        # Membership updates come from Telegram, not from the user
+        if user is None or update.chat_member or update.my_chat_member:
+            return
+        self.add(user.id, user.username, user.first_name)
+
+    def __len__(self):
+        return len(self._pending)
+
+    def start(self):
+        """Start the periodic flush task"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name='interaction-buffer')
+
+    async def stop(self):
+        """Stop the flush task and write everything still pending"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    async def flush(self):
+        """Write pending interactions now"""
+        entries, self._pending = self._pending, {}
+        if not entries:
+            return
+
+        try:
+            await self.users_repo.save_interactions(list(entries.values()))
+        except Exception as e:
+            logger.error(f"Error saving user interactions: {e}")
+            # Retry on next flush unless the user interacted again meanwhile
+            for user_id, entry in entries.items():
+                self._pending.setdefault(user_id, entry)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()